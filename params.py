@@ -26,3 +26,62 @@ propeller_max_surf_ref = 10
 refinement_regions_mode = 'inside'
 refinement_regions_distance = '1.0'
 refinement_values = [4, 3, 2, 1]
+
+# the size of the cells of blockMesh. If not None the number of cells of the
+# block (`blocks` in blockMeshDict) is computed from it, and the number of
+# segments of each cylinder is chosen such that the chord error is below
+# max_chord_error times the size of the cells inside the cylinder (see
+# refinement_values), otherwise the block is left untouched and all the
+# cylinders are obtained from res/cylinder.obj
+base_cell_size = None
+# the same, in terms of propeller diameters (used if base_cell_size is None)
+base_cell_size_diameters = None
+max_chord_error = 0.1
+# simpleGrading of the block, used only with base_cell_size
+block_mesh_grading = [1, 1, 1]
+
+# if True locationInMesh is checked against the surfaces of the propellers and,
+# if it is not in the fluid (outside of the propellers and not too close to
+# any surface), moved to the closest valid point between the cylinders
+correct_location_in_mesh = False
+# the minimum distance between a propeller and the walls of its inner
+# cylinders (in terms of propeller diameters) accepted by --dry-run, None
+# accepts any propeller which does not cross the walls
+min_cylinder_clearance = None
+
+# if not None the inner cylinders are stepped cylinders which follow the radial
+# profile of the propeller (the wake downstream of each section is as wide as
+# the section) plus a margin, instead of its diameter: one margin for each
+# inner cylinder, in terms of propeller diameters. The radius of the cylinders
+# is still limited by cylinder_scales
+cylinder_profile_margins = None
+# the maximum number of steps of each stepped cylinder
+cylinder_profile_steps = 4
+# if not None the cylinders are wake cones: one value for each cylinder (the
+# outermost one included), the ratio between the radius at the bottom of the
+# cylinder and its full radius. The radius decreases linearly downstream of
+# the propeller, 1 means a straight cylinder
+cylinder_taper = None
+# if True the inner cylinders are written in snappyHexMeshDict as analytic
+# searchableCylinder surfaces, and only outerCylinder.obj is generated
+analytic_cylinders = False
+
+# if not None, the vertices of the propeller closer than this along each axis
+# (in terms of propeller diameters) are welded, and the degenerate and duplicated triangles
+# are dropped before the propeller is copied into the case
+propeller_weld_tolerance = None
+
+# decimated level-of-detail copies of the propeller (propellerLod<i>.obj), the
+# i-th item is the maximum distance between the copy and the propeller in
+# terms of propeller diameters. Leave empty to use only the original propeller
+propeller_lod_errors = []
+# refinementRegions (mode distance) of the LODs, one [distance, level] pair
+# for each item of propeller_lod_errors
+propeller_lod_refinement = []
+# the index of the LOD used for feature extraction, None means the original
+# propeller
+propeller_features_lod = None
+
+# feature edges of the propeller (written to <name>.eMesh), edges whose
+# included angle is smaller than this value (in degrees) are features
+feature_included_angle = 150
@@ -1,29 +1,23 @@
-from smithers.io.stlhandler import STLHandler
-from src.read_spatial_info import (
-    dimension,
-    diameter,
-    min_max,
-    DataWrapper,
-    boundary,
-)
-from src.generate_cylinders import (
-    generate_cylinders_obj,
-    compute_cylinder_dimensions,
-    compute_cylinder_anchors,
-    adjust_dimensions,
-)
-from src.openfoam_parametrizer import generate_openfoam_configuration_dicts
-from pathlib import Path
+from src.archive import archive_case, archive_formats
+from src.case import params_from_module
+from src.config import iter_specs
+from src.dataset import DatasetWriter, case_record
+from src.pipeline import generate_case_pipelined
+from src.surface_store import SurfaceStore, generate_case_with_store
+from src.validate import validate_case
+from src.watch import CaseWatcher
+import argparse
+import json
+import os
 import sys
-from shutil import copyfile
-import numpy as np
+import time
 import params
-# we use some parameters from params in the following code
-from params import *
 
 """PARAMETERS
 # 1: the path to the OpenFOAM folder (with the subfolders system, constant, etc)
-# 2: the path to the propeller.obj
+# 2: the path to the propeller.obj (or several paths, one for each propeller)
+# or, instead of 1 and 2, --config with a TOML (single case) or JSON Lines
+# (many cases) file, see src/config.py
 
 O     x------I
 ======= Y axis ========>
@@ -35,87 +29,169 @@ x    : blades
 
 """
 
-openfoam_folder = sys.argv[1]
-openfoam_path = Path(openfoam_folder)
-
-propeller_path = sys.argv[2]
-
-# -------------------------------  CONFIG -------------------------------------
-
-cylinder_names = ["cylinder{}".format(i) for i in range(N_of_cylinders - 1)]
-cylinder_names.append("outerCylinder")
-
-if (
-    len(take_available_y) != N_of_cylinders - 1
-    or len(cylinder_scales) != N_of_cylinders
-):
-    raise ValueError("Unexpected number of cylinders.")
-
-# -------------------------------  SCRIPT -------------------------------------
-
-# first of all we read the dimension of the propeller
-data = DataWrapper(propeller_path)
-propeller_dimension = dimension(data)
-propeller_boundary = boundary(data)
-propeller_diameter = diameter(data)
-
-propeller_newpath = str(
-    openfoam_path / "constant" / "triSurface" / "propeller.obj"
+parser = argparse.ArgumentParser()
+parser.add_argument("openfoam_folder", nargs="?")
+parser.add_argument("propeller_path", nargs="*")
+parser.add_argument(
+    "--config",
+    help="a TOML (single case) or JSON Lines (one case per line) file which "
+    "contains the cases and the parameters which override params.py",
 )
-
-# we copy the propeller file into the OpenFOAM folder
-copyfile(propeller_path, propeller_newpath)
-
-# then we generate the cylinders according to the dimensions specified by the
-# user
-cylinder_dimensions = compute_cylinder_dimensions(
-    scales=cylinder_scales,
-    propeller_diameter=propeller_diameter,
+parser.add_argument(
+    "--watch",
+    action="store_true",
+    help="keep running, and regenerate the affected files when params.py, "
+    "the propeller or the template dictionaries change",
 )
-cylinder_anchors = compute_cylinder_anchors(
-    take_available_y=take_available_y,
-    # the length of the outermost cylinder
-    outer_cylinder_y_dimension=cylinder_dimensions[-1, 1],
-    propeller_boundary=propeller_boundary,
+parser.add_argument(
+    "--dry-run",
+    action="store_true",
+    help="validate the parameters and the templates, print a report and "
+    "write nothing",
 )
-adjust_dimensions(cylinder_dimensions, cylinder_anchors)
-
-miny, maxy = generate_cylinders_obj(
-    dimensions=cylinder_dimensions,
-    anchors=cylinder_anchors,
-    base_folder=str(openfoam_path / "constant" / "triSurface"),
-    names=cylinder_names,
+parser.add_argument(
+    "--archive",
+    choices=sorted({format for format in archive_formats.values()}),
+    help="write each case into a single archive of this type next to its "
+    "directory (e.g. case.tar.gz), instead of writing into the directory",
 )
-
-# we take half of the diameter of the outer cylinder, plus an epsilon
-maxx, maxz = cylinder_dimensions[-1][[0, 2]] / 2 + 0.1
-minx, minz = (-maxx, -maxz)
-
-# y is the length
-yfactor = (0.21 + 0.81) * cylinder_dimensions[-1][1]
-
-location_in_mesh_xz = cylinder_anchors[[0, 1], [0, 2]] + np.median(
-    cylinder_dimensions[[0, 1], [0, 2]], axis=0
+parser.add_argument(
+    "--store",
+    help="a directory shared by many cases: each distinct surface is stored "
+    "once and the files of constant/triSurface are links to it",
 )
-location_in_mesh_y = np.median(cylinder_anchors[[0, 1], 1])
-
-# ------------------------------ CONFIG DICT----------------------------------
-
-# generate the configuration dictionary for the script
-opfoam_config_dict = dict(
-    destination=openfoam_folder,
-    block_mesh_point_x=[minx, maxx, maxx, minx, minx, maxx, maxx, minx],
-    block_mesh_point_y=[miny, miny, maxy, maxy, miny, miny, maxy, maxy],
-    block_mesh_point_z=[minz, minz, minz, minz, maxz, maxz, maxz, maxz],
-    location_in_mesh="{} {} {}".format(
-        location_in_mesh_xz[0], location_in_mesh_y, location_in_mesh_xz[1]
-    ),
-    cylinder_names=cylinder_names
+parser.add_argument(
+    "--link",
+    choices=["symlink", "hardlink"],
+    default="symlink",
+    help="the type of the links to the files of --store. The objects of the "
+    "store are shared: with hard links, a tool which modifies a file of "
+    "constant/triSurface in place modifies it for every case",
 )
-
-# append the values from params
-for key in filter(lambda s: not s[0] == '_', dir(params)):
-    opfoam_config_dict[key] = getattr(params, key)
-
-# then we run the parameterizer
-generate_openfoam_configuration_dicts(**opfoam_config_dict)
+parser.add_argument(
+    "--dataset",
+    help="a directory where a record of each case (parameters, derived "
+    "geometry, size of the output, time) is appended, see src/dataset.py",
+)
+args = parser.parse_args()
+if args.store and args.archive:
+    parser.error("--store cannot be used with --archive")
+store = SurfaceStore(args.store, args.link) if args.store else None
+dataset = DatasetWriter(args.dataset) if args.dataset else None
+
+
+def generate(case, propeller_path, case_params):
+    start = time.perf_counter()
+    if args.archive:
+        archive_path = "{}.{}".format(case.rstrip("/\\"), args.archive)
+        geometry = archive_case(archive_path, case, propeller_path, case_params)
+        outputs = [archive_path]
+    else:
+        # only the files written for this case, not the stale ones of
+        # previous runs
+        written = []
+        if store is not None:
+            geometry, _ = generate_case_with_store(
+                case, propeller_path, case_params, store, written=written
+            )
+        else:
+            # the independent stages are executed concurrently
+            geometry = generate_case_pipelined(
+                case, propeller_path, case_params, written=written
+            )
+        outputs = [os.path.join(case, path) for path in written]
+
+    # how much the welding shrank the propellers
+    for body, report in geometry["propeller_welding"].items():
+        print(
+            "{}: {}: welded {} -> {} vertices, {} -> {} faces".format(
+                case, body, *report["vertices"], *report["faces"]
+            )
+        )
+
+    if dataset is not None:
+        dataset.append(
+            case_record(
+                case,
+                propeller_path,
+                case_params,
+                geometry,
+                elapsed=time.perf_counter() - start,
+                output_sizes=[os.path.getsize(path) for path in outputs],
+            )
+        )
+
+
+if args.config:
+    if args.openfoam_folder or args.watch:
+        parser.error("--config cannot be used with a case or with --watch")
+
+    valid = True
+    # a dry run reports the invalid specifications and checks the others
+    errors = "report" if args.dry_run else "raise"
+    # the records of the cases generated before a failure are kept
+    try:
+        for spec in iter_specs(args.config, errors):
+            if "error" in spec:
+                print(
+                    json.dumps(
+                        dict(
+                            case=None,
+                            line=spec["line"],
+                            valid=False,
+                            errors=[
+                                dict(
+                                    stage="config",
+                                    file=args.config,
+                                    message=spec["error"],
+                                )
+                            ],
+                        )
+                    )
+                )
+                valid = False
+                continue
+            case_params = params_from_module(params)
+            case_params.update(spec["params"])
+            if args.dry_run:
+                report = validate_case(
+                    spec["case"], spec["propeller"], case_params
+                )
+                print(json.dumps(dict(case=spec["case"], **report)))
+                valid = valid and report["valid"]
+            else:
+                generate(spec["case"], spec["propeller"], case_params)
+    finally:
+        if dataset is not None:
+            dataset.close()
+    sys.exit(0 if valid else 1)
+elif not args.openfoam_folder or not args.propeller_path:
+    parser.error("the case and the propeller are required without --config")
+
+if args.dry_run:
+    report = validate_case(
+        args.openfoam_folder, args.propeller_path, params_from_module(params)
+    )
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["valid"] else 1)
+elif args.watch:
+    if args.archive or args.store or args.dataset:
+        parser.error(
+            "--archive, --store and --dataset cannot be used with --watch"
+        )
+    try:
+        CaseWatcher(
+            args.openfoam_folder, args.propeller_path, params.__file__
+        ).run()
+    except KeyboardInterrupt:
+        pass
+else:
+    try:
+        generate(
+            args.openfoam_folder,
+            args.propeller_path,
+            params_from_module(params),
+        )
+    finally:
+        if dataset is not None:
+            dataset.close()
@@ -0,0 +1,302 @@
+"""A whole OpenFOAM case written into a single archive.
+
+Staging thousands of cases onto a parallel filesystem is dominated by the
+metadata operations of many small files. :func:`write_case_archive` streams
+the generated files (see :func:`src.case.render_case`), the files of the case
+directory which are not generated (e.g. the templates which do not need
+parameters, copied in chunks without being read fully in memory) and a
+manifest into one archive, with a single sequential write.
+
+The format is chosen from the extension of the archive: `.tar`, `.tar.gz`
+(or `.tgz`), `.tar.zst` (requires `zstandard`) or `.zip`.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import stat
+import tarfile
+import time
+import zipfile
+from pathlib import Path
+
+from src.case import render_case
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+archive_formats = {
+    ".tar": "tar",
+    ".tar.gz": "tar.gz",
+    ".tgz": "tar.gz",
+    ".tar.zst": "tar.zst",
+    ".zip": "zip",
+}
+
+manifest_name = "manifest.json"
+
+# the surfaces produced by the generator, only the ones generated with the
+# archive are included (the others are left over by earlier runs)
+generated_surfaces = ("constant/triSurface/", (".obj", ".eMesh"))
+
+_chunk_size = 1 << 20
+
+
+def archive_format(path):
+    """The format of an archive (a value of `archive_formats`) from the
+    extension of its path."""
+    name = str(path).lower()
+    for extension, format in archive_formats.items():
+        if name.endswith(extension):
+            return format
+    raise ValueError(
+        "Unknown archive format {}, expected one of {}".format(
+            path, sorted(archive_formats)
+        )
+    )
+
+
+class _HashingReader:
+    """A file-like object which computes the SHA-256 digest of what is read
+    from the underlying file."""
+
+    def __init__(self, f):
+        self._f = f
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.digest.update(data)
+        return data
+
+
+def _member_mode(stat_result):
+    # the members do not depend on the permissions of the files of the case,
+    # only on whether they are executable (e.g. the `Allrun` scripts)
+    return 0o755 if stat_result.st_mode & 0o111 else 0o644
+
+
+class _TarWriter:
+    def __init__(self, f, format, mtime):
+        self._compressor = None
+        if format == "tar.zst":
+            if zstandard is None:
+                raise ImportError("Writing .tar.zst archives requires zstandard")
+            self._compressor = zstandard.ZstdCompressor().stream_writer(
+                f, closefd=False
+            )
+            f = self._compressor
+        elif format == "tar.gz":
+            # the header of gzip contains a timestamp, fixed as the members
+            self._compressor = gzip.GzipFile(
+                filename="", mode="wb", fileobj=f, mtime=mtime
+            )
+            f = self._compressor
+        # stream mode: the archive is written sequentially, without seeking
+        self._tar = tarfile.open(fileobj=f, mode="w|", format=tarfile.PAX_FORMAT)
+        self._mtime = mtime
+
+    def _info(self, name, size, mode=0o644):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = self._mtime
+        info.mode = mode
+        return info
+
+    def add_bytes(self, name, content):
+        self._tar.addfile(self._info(name, len(content)), io.BytesIO(content))
+
+    def add_file(self, name, path):
+        file_stat = os.stat(path)
+        with open(path, "rb") as f:
+            reader = _HashingReader(f)
+            self._tar.addfile(
+                self._info(name, file_stat.st_size, _member_mode(file_stat)),
+                reader,
+            )
+        return file_stat.st_size, reader.digest.hexdigest()
+
+    def close(self):
+        self._tar.close()
+        if self._compressor is not None:
+            self._compressor.close()
+
+
+class _ZipWriter:
+    def __init__(self, f, mtime):
+        self._zip = zipfile.ZipFile(f, "w", compression=zipfile.ZIP_DEFLATED)
+        # zip does not support dates before 1980
+        self._date_time = time.gmtime(max(mtime, 315532800))[:6]
+
+    def _info(self, name, mode=0o644):
+        info = zipfile.ZipInfo(name, self._date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        # the permissions of a regular file, in the high bytes as unzip
+        # expects
+        info.external_attr = (stat.S_IFREG | mode) << 16
+        return info
+
+    def add_bytes(self, name, content):
+        self._zip.writestr(self._info(name), content)
+
+    def add_file(self, name, path):
+        info = self._info(name, _member_mode(os.stat(path)))
+        digest = hashlib.sha256()
+        size = 0
+        # the size is not known in advance by zipfile
+        large = os.path.getsize(path) > zipfile.ZIP64_LIMIT
+        with open(path, "rb") as source, self._zip.open(
+            info, "w", force_zip64=large
+        ) as target:
+            for chunk in iter(lambda: source.read(_chunk_size), b""):
+                digest.update(chunk)
+                target.write(chunk)
+                size += len(chunk)
+        return size, digest.hexdigest()
+
+    def close(self):
+        self._zip.close()
+
+
+def write_case_archive(
+    archive_path,
+    openfoam_folder,
+    files,
+    prefix=None,
+    include_case_files=True,
+    metadata=None,
+    mtime=None,
+):
+    """Write an OpenFOAM case into a single archive: the generated files, the
+    other files of the case directory and a manifest (`manifest.json`, the
+    last member) which lists the path, the size, the SHA-256 digest and the
+    origin (`"generated"` or `"case"`) of every member.
+
+    :param archive_path: The path of the archive, the format is chosen from
+        its extension (see :func:`archive_format`).
+    :type archive_path: str
+    :param openfoam_folder: The root directory of the OpenFOAM case, which
+        contains the templates.
+    :type openfoam_folder: str
+    :param files: An iterable of 2-tuples (relative path, content), e.g. the
+        files produced by :func:`src.case.render_case`. It is consumed while
+        the archive is written.
+    :type files: iterable
+    :param prefix: The directory of the members in the archive, defaults to
+        the name of `openfoam_folder`. Use `""` for no directory.
+    :type prefix: str, optional
+    :param include_case_files: If `True` (default) the files of
+        `openfoam_folder` which are not generated are copied into the
+        archive too, in chunks. The surfaces of `constant/triSurface` which
+        the generator produces (see :func:`is_generated_surface`) are
+        skipped: the ones which are not in `files` were left over by earlier
+        runs with other parameters.
+    :type include_case_files: bool, optional
+    :param metadata: Additional JSON-serializable items of the manifest.
+    :type metadata: dict, optional
+    :param mtime: The modification time of every member, defaults to the
+        environment variable `SOURCE_DATE_EPOCH` or 0. The members are
+        readable by everyone, and executable if the file of the case is,
+        therefore the archives of the same case are identical.
+    :type mtime: int, optional
+    :return: The manifest.
+    :rtype: dict
+    """
+    format = archive_format(archive_path)
+    if prefix is None:
+        prefix = Path(openfoam_folder).resolve().name
+    if mtime is None:
+        mtime = int(os.environ.get("SOURCE_DATE_EPOCH", 0))
+
+    def member(path):
+        return prefix + "/" + path if prefix else path
+
+    entries = []
+    with open(archive_path, "wb") as f:
+        if format == "zip":
+            writer = _ZipWriter(f, mtime)
+        else:
+            writer = _TarWriter(f, format, mtime)
+        try:
+            for path, content in files:
+                writer.add_bytes(member(path), content)
+                entries.append(
+                    dict(
+                        path=path,
+                        size=len(content),
+                        sha256=hashlib.sha256(content).hexdigest(),
+                        origin="generated",
+                    )
+                )
+
+            if include_case_files:
+                generated = {entry["path"] for entry in entries}
+                archive = Path(archive_path).resolve()
+                for path in case_directory_files(openfoam_folder):
+                    full_path = Path(openfoam_folder) / path
+                    if (
+                        path in generated
+                        or is_generated_surface(path)
+                        or full_path.resolve() == archive
+                    ):
+                        continue
+                    size, digest = writer.add_file(member(path), full_path)
+                    entries.append(
+                        dict(path=path, size=size, sha256=digest, origin="case")
+                    )
+
+            manifest = dict(metadata or {})
+            manifest["files"] = entries
+            writer.add_bytes(
+                member(manifest_name),
+                (json.dumps(manifest, indent=2, sort_keys=True) + "\n").encode(),
+            )
+        finally:
+            writer.close()
+    return manifest
+
+
+def archive_case(archive_path, openfoam_folder, propeller_path, params, **kwargs):
+    """Generate an OpenFOAM case (see :func:`src.case.generate_case`) into an
+    archive instead of `openfoam_folder`, which is only read. The other
+    keyword arguments are passed to :func:`write_case_archive`.
+
+    :return: The geometry of the case (see
+        :func:`src.case.compute_case_geometry`).
+    :rtype: dict
+    """
+    geometry, files = render_case(openfoam_folder, propeller_path, params)
+    if isinstance(propeller_path, (str, Path)):
+        propeller_path = [propeller_path]
+    metadata = dict(
+        propeller=[str(path) for path in propeller_path],
+        body_names=geometry["body_names"],
+        cylinder_names=geometry["cylinder_names"],
+        location_in_mesh=geometry["location_in_mesh"],
+    )
+    write_case_archive(
+        archive_path, openfoam_folder, files, metadata=metadata, **kwargs
+    )
+    return geometry
+
+
+def is_generated_surface(path):
+    """Check if the given path (relative to the case directory) is a surface
+    of the kind produced by the generator (see `generated_surfaces`)."""
+    directory, suffixes = generated_surfaces
+    return path.startswith(directory) and path.endswith(suffixes)
+
+
+def case_directory_files(openfoam_folder):
+    """The paths (relative to `openfoam_folder`, with `/` as separator) of
+    the regular files of a case directory, sorted."""
+    root = Path(openfoam_folder)
+    return sorted(
+        path.relative_to(root).as_posix()
+        for path in root.rglob("*")
+        if path.is_file()
+    )
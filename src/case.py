@@ -0,0 +1,961 @@
+import os
+from functools import lru_cache
+from pathlib import Path
+from types import ModuleType
+
+import numpy as np
+
+from src.read_spatial_info import (
+    DataWrapper,
+    boundary,
+    diameter,
+    dimension,
+    radial_profile,
+    surface_quality,
+)
+from src.clearance import find_location_in_mesh
+from src.generate_cylinders import (
+    cylinder_files,
+    compute_cylinder_dimensions,
+    compute_cylinder_anchors,
+    compute_cylinder_segments,
+    adjust_dimensions,
+    compress_profile,
+    profile_radii,
+    searchable_cylinders,
+    step_polyline,
+    taper_polyline,
+)
+from src.simplify import simplify_obj, weld_obj
+from src.features import emesh_bytes, obj_feature_edges
+from src.mesh import TriMesh, format_floats, obj_bytes
+from src.spatial_index import AABBIndex, TriangleGrid
+from src.openfoam_parametrizer import (
+    render_openfoam_configuration_dicts,
+    parametrized_files,
+)
+
+# everything that `generate_case` writes into the OpenFOAM case
+case_outputs = [
+    "propeller",
+    "propeller_lods",
+    "cylinders",
+    "feature_edges",
+] + parametrized_files
+
+
+def params_from_module(module):
+    """Collect the public attributes of a parameters module (e.g. `params`)
+    into a dictionary which can be passed to :func:`generate_case`.
+
+    :param module: The module which contains the parameters.
+    :type module: module
+    :return: The parameters, keyed by name.
+    :rtype: dict
+    """
+    return params_from_namespace(vars(module))
+
+
+def params_from_namespace(namespace):
+    """Same as :func:`params_from_module`, for the globals of a script (e.g.
+    the output of :func:`runpy.run_path`).
+    """
+    dc = {}
+    for key in filter(lambda s: not s[0] == "_", sorted(namespace)):
+        value = namespace[key]
+        if not isinstance(value, ModuleType):
+            dc[key] = value
+    return dc
+
+
+# the number of bins along Y of the radial profile of the propellers
+radial_profile_bins = 64
+
+
+@lru_cache(maxsize=32)
+def _read_propeller_info(path, mtime_ns, size):
+    data = DataWrapper(path)
+    info = dict(
+        dimension=dimension(data),
+        boundary=boundary(data),
+        diameter=diameter(data),
+        radial_profile=radial_profile(data, radial_profile_bins),
+    )
+    # the same arrays are shared by every case which uses this propeller
+    info["dimension"].setflags(write=False)
+    info["boundary"].setflags(write=False)
+    for array in info["radial_profile"]:
+        array.setflags(write=False)
+    return info
+
+
+def read_propeller_info(propeller_path):
+    """Evaluate the dimension, the boundary and the diameter of the propeller
+    stored at the given path.
+
+    The result is cached (keyed by path, modification time and size of the
+    file), therefore a long-running process does not parse the same propeller
+    twice.
+
+    :param propeller_path: The path to the propeller file (OBJ or STL).
+    :type propeller_path: str
+    :return: A dictionary with the keys `dimension`, `boundary`, `diameter`
+        and `radial_profile` (see
+        :func:`src.read_spatial_info.radial_profile`).
+    :rtype: dict
+    """
+    path = os.path.realpath(str(propeller_path))
+    stat = os.stat(path)
+    return _read_propeller_info(path, stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=4)
+def _read_propeller_grid(path, mtime_ns, size):
+    mesh = TriMesh.read(path, dtype=np.float64)
+    return TriangleGrid(mesh.vertices, mesh.faces)
+
+
+def read_propeller_grid(propeller_path):
+    """Build a :class:`src.spatial_index.TriangleGrid` over the triangles of
+    the propeller stored at the given path. Cached like
+    :func:`read_propeller_info`.
+    """
+    path = os.path.realpath(str(propeller_path))
+    stat = os.stat(path)
+    return _read_propeller_grid(path, stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=4)
+def _read_propeller_data(path, mtime_ns, size):
+    return DataWrapper(path, dtype=np.float64)
+
+
+@lru_cache(maxsize=32)
+def _read_propeller_quality(path, mtime_ns, size, base_cell_size):
+    return surface_quality(
+        _read_propeller_data(path, mtime_ns, size), base_cell_size
+    )
+
+
+def read_propeller_quality(propeller_path, base_cell_size=None):
+    """Check the quality of the surface of the propeller stored at the given
+    path (see :func:`src.read_spatial_info.surface_quality`). Cached like
+    :func:`read_propeller_info`, the parsed propeller is shared by the
+    reports for different values of `base_cell_size`.
+
+    :return: A copy of the cached report.
+    :rtype: dict
+    """
+    path = os.path.realpath(str(propeller_path))
+    stat = os.stat(path)
+    if base_cell_size is not None:
+        base_cell_size = float(base_cell_size)
+    return dict(
+        _read_propeller_quality(
+            path, stat.st_mtime_ns, stat.st_size, base_cell_size
+        )
+    )
+
+
+def location_in_mesh_margin(propeller_info):
+    """The minimum distance between `locationInMesh` and the surfaces of the
+    case: 1% of the diameter of the largest propeller."""
+    return 1e-2 * max(info["diameter"] for info in propeller_info)
+
+
+def correct_location_in_mesh(geometry, propeller_path, propeller_info, params):
+    """If `correct_location_in_mesh` is set in the parameters, check that
+    `locationInMesh` lies in the fluid (outside of the propellers, inside
+    `outerCylinder` and not too close to any surface) and move it to a valid
+    point if needed (see :func:`src.clearance.find_location_in_mesh`). The
+    geometry is updated in place.
+    """
+    if not params.get("correct_location_in_mesh", False):
+        return
+    location = find_location_in_mesh(
+        [read_propeller_grid(path) for path in propeller_path],
+        geometry,
+        location_in_mesh_margin(propeller_info),
+    )
+    geometry["location_in_mesh"] = format_floats(location)
+
+
+def body_names(n_of_bodies):
+    """The names of the propellers in a case with `n_of_bodies` propellers:
+    `propeller` if there is only one, `propeller0`, `propeller1`, ...
+    otherwise."""
+    if n_of_bodies == 1:
+        return ["propeller"]
+    return ["propeller{}".format(i) for i in range(n_of_bodies)]
+
+
+def propeller_lod_names(params, body="propeller"):
+    """The names of the levels of detail of the propeller `body` requested
+    in `params` (see `propeller_lod_errors` in `params.py`)."""
+    return [
+        "{}Lod{}".format(body, i)
+        for i in range(len(params.get("propeller_lod_errors", [])))
+    ]
+
+
+def propeller_features_name(params, body="propeller"):
+    """The name of the surface (the propeller `body` or one of its levels of
+    detail) whose feature edges are used by snappy."""
+    features_lod = params.get("propeller_features_lod")
+    if features_lod is None:
+        return body
+    return propeller_lod_names(params, body)[features_lod]
+
+
+def check_cylinder_stacks(cylinder_dimensions, cylinder_anchors, bodies):
+    """Verify that the cylinders of different propellers do not overlap, and
+    that every cylinder lies inside the outermost one (the last).
+
+    The overlaps are found with a sort and sweep index of the bounding boxes
+    of the stacks of cylinders (see :class:`src.spatial_index.AABBIndex`).
+
+    :param cylinder_dimensions: The dimensions of all the cylinders.
+    :type cylinder_dimensions: np.ndarray
+    :param cylinder_anchors: The anchors of all the cylinders.
+    :type cylinder_anchors: np.ndarray
+    :param bodies: The index of the propeller of each cylinder but the last.
+    :type bodies: np.ndarray
+    """
+    inner_dimensions = cylinder_dimensions[:-1]
+    inner_anchors = cylinder_anchors[:-1]
+
+    lower = inner_anchors - inner_dimensions / 2
+    upper = inner_anchors + inner_dimensions / 2
+    lower[:, 1] = inner_anchors[:, 1]
+    upper[:, 1] = inner_anchors[:, 1] + inner_dimensions[:, 1]
+
+    # the radial distance from the axis of the outermost cylinder
+    outer_radius = np.min(cylinder_dimensions[-1, [0, 2]]) / 2
+    radial_extent = np.linalg.norm(
+        inner_anchors[:, [0, 2]] - cylinder_anchors[-1, [0, 2]], axis=1
+    ) + np.max(inner_dimensions[:, [0, 2]], axis=1) / 2
+    if np.any(radial_extent > outer_radius):
+        raise ValueError(
+            "The outer cylinder does not enclose the internal cylinders"
+        )
+
+    n_of_bodies = np.max(bodies) + 1
+    if n_of_bodies > 1:
+        stack_lower = np.stack(
+            [np.min(lower[bodies == b], axis=0) for b in range(n_of_bodies)]
+        )
+        stack_upper = np.stack(
+            [np.max(upper[bodies == b], axis=0) for b in range(n_of_bodies)]
+        )
+        pairs = AABBIndex(stack_lower, stack_upper).overlapping_pairs()
+        if pairs:
+            raise ValueError(
+                "The cylinders of the propellers {} overlap".format(pairs)
+            )
+
+
+def compute_cylinder_profiles(
+    propeller_info, dimensions, anchors, margins, max_steps
+):
+    """Compute the stepped profiles of the inner cylinders of a propeller,
+    which follow its radial profile instead of its diameter (e.g. they are
+    narrow along a long stem).
+
+    The flow goes towards -Y, therefore the wake downstream of each section
+    of the propeller is as wide as the section: the envelope at a given Y is
+    the largest radius of the propeller above it. The radius of the i-th
+    cylinder is the envelope plus `margins[i]` propeller diameters, limited
+    by its dimension along X and Z, and at least the radius of the previous
+    cylinder. Each profile is simplified to at most `max_steps` steps (see
+    :func:`src.generate_cylinders.compress_profile`).
+
+    :param propeller_info: The output of :func:`read_propeller_info`.
+    :type propeller_info: dict
+    :param dimensions: The dimensions of the inner cylinders.
+    :type dimensions: np.ndarray
+    :param anchors: The anchors of the inner cylinders.
+    :type anchors: np.ndarray
+    :param margins: The margin of each inner cylinder, in terms of propeller
+        diameters.
+    :type margins: list
+    :param max_steps: The maximum number of steps of each cylinder.
+    :type max_steps: int
+    :return: A 2-tuple `(breaks, radii)` for each inner cylinder.
+    :rtype: list
+    """
+    if len(margins) != len(dimensions):
+        raise ValueError("Expected a margin for each inner cylinder.")
+
+    edges, envelope = propeller_info["radial_profile"]
+    envelope = np.maximum.accumulate(envelope[::-1])[::-1]
+
+    y_low = anchors[:, 1]
+    y_high = anchors[:, 1] + dimensions[:, 1]
+    breaks = np.unique(np.concatenate([edges, y_low, y_high]))
+    breaks = breaks[(breaks >= y_low.min()) & (breaks <= y_high.max())]
+    middle = (breaks[1:] + breaks[:-1]) / 2
+
+    # the widest section below the propeller, nothing above it
+    bins = np.searchsorted(edges, middle, side="right") - 1
+    section = np.where(
+        bins < len(envelope),
+        envelope[np.clip(bins, 0, len(envelope) - 1)],
+        0,
+    )
+
+    profiles = []
+    previous = np.zeros(len(middle))
+    for idx, margin in enumerate(margins):
+        inside = np.flatnonzero((middle > y_low[idx]) & (middle < y_high[idx]))
+        radii = np.minimum(
+            section + margin * propeller_info["diameter"],
+            np.min(dimensions[idx, [0, 2]]) / 2,
+        )
+        radii = np.maximum(radii, previous)
+        steps = compress_profile(
+            breaks[inside[0] : inside[-1] + 2], radii[inside], max_steps
+        )
+        profiles.append(steps)
+
+        step_of_interval = np.searchsorted(steps[0], middle, side="right") - 1
+        previous = np.zeros(len(middle))
+        previous[inside] = steps[1][step_of_interval[inside]]
+    return profiles
+
+
+def compute_lateral_profiles(
+    dimensions, anchors, step_profiles=None, tapers=None, taper_from=None
+):
+    """Compute the lateral polyline (see
+    :func:`src.generate_cylinders.revolved_cylinder`) of each cylinder which
+    is not a straight cylinder: the stepped cylinders (see
+    :func:`compute_cylinder_profiles`) and the wake cones, whose radius
+    decreases linearly downstream of the propeller (towards -Y) from the full
+    radius at `taper_from` to `tapers[i]` times the full radius at the bottom
+    of the cylinder. Stepped cylinders are tapered too.
+
+    :param dimensions: The dimensions of the cylinders.
+    :type dimensions: np.ndarray
+    :param anchors: The anchors of the cylinders (the outermost cylinder is
+        the last one).
+    :type anchors: np.ndarray
+    :param step_profiles: A 2-tuple `(breaks, radii)` or `None` for each
+        cylinder.
+    :type step_profiles: list, optional
+    :param tapers: The taper of each cylinder, 1 for no taper.
+    :type tapers: list, optional
+    :param taper_from: The Y coordinate where the taper of each cylinder
+        ends (the lowest point of its propeller).
+    :type taper_from: list, optional
+    :return: A 2-tuple `(ys, radii)` or `None` (a straight cylinder) for each
+        cylinder, `None` if all the cylinders are straight.
+    :rtype: list
+    """
+    profiles = []
+    for idx, (dimension, anchor) in enumerate(zip(dimensions, anchors)):
+        step_profile = None if step_profiles is None else step_profiles[idx]
+        taper = 1 if tapers is None else tapers[idx]
+        if step_profile is None and taper == 1:
+            profiles.append(None)
+            continue
+
+        if step_profile is not None:
+            ys, radii = step_polyline(*step_profile)
+        else:
+            if not np.isclose(dimension[0], dimension[2]):
+                raise ValueError(
+                    "Tapered cylinders must have the same dimension along X "
+                    "and Z"
+                )
+            # the outermost cylinder is anchored to its biggest Y coordinate
+            y_low = anchor[1] - (dimension[1] if idx == len(anchors) - 1 else 0)
+            ys = np.array([y_low, y_low + dimension[1]])
+            radii = np.full(2, dimension[0] / 2)
+
+        if taper != 1:
+            ys, radii = taper_polyline(ys, radii, taper, taper_from[idx])
+        profiles.append((ys, radii))
+
+    if all(profile is None for profile in profiles):
+        return None
+    return profiles
+
+
+def check_profiles_nested(profiles, dimensions, anchors, bodies):
+    """Check that each cylinder of a stack lies inside the next one, and the
+    last one inside the outermost cylinder, when some of them are not
+    straight cylinders (see :func:`compute_lateral_profiles`).
+
+    :raises ValueError: If a cylinder pokes out of the next one.
+    """
+    if profiles is None:
+        return
+
+    def polyline(idx):
+        if profiles[idx] is not None:
+            return profiles[idx]
+        dimension, anchor = dimensions[idx], anchors[idx]
+        y_low = anchor[1] - (dimension[1] if idx == len(anchors) - 1 else 0)
+        # inscribed (outer) or circumscribed (inner) circle, conservative
+        radius = (
+            np.min(dimension[[0, 2]]) if idx == len(anchors) - 1
+            else np.max(dimension[[0, 2]])
+        ) / 2
+        return np.array([y_low, y_low + dimension[1]]), np.full(2, radius)
+
+    outer = len(anchors) - 1
+    for body in np.unique(bodies):
+        stack = list(np.flatnonzero(bodies == body)) + [outer]
+        for inner, container in zip(stack[:-1], stack[1:]):
+            inner_ys, inner_radii = polyline(inner)
+            ys, radii = polyline(container)
+            offset = np.linalg.norm(
+                anchors[inner, [0, 2]] - anchors[container, [0, 2]]
+            )
+
+            samples = np.union1d(inner_ys, ys)
+            samples = samples[
+                (samples >= inner_ys[0]) & (samples <= inner_ys[-1])
+            ]
+            samples = np.concatenate(
+                [samples, (samples[1:] + samples[:-1]) / 2]
+            )
+            tolerance = 1e-9 * max(radii.max(), inner_radii.max())
+            for side in "left", "right":
+                excess = (
+                    profile_radii(inner_ys, inner_radii, samples, side)
+                    + offset
+                    - profile_radii(ys, radii, samples, side)
+                )
+                if np.any(excess > tolerance):
+                    raise ValueError(
+                        "The cylinder {} is not inside the cylinder {}".format(
+                            inner, container
+                        )
+                    )
+
+
+def compute_base_cell_size(params, propeller_diameter):
+    """The size of the cells of blockMesh: `base_cell_size` if given,
+    otherwise `base_cell_size_diameters` times the diameter of the
+    propeller. `None` if neither is given.
+    """
+    if params.get("base_cell_size") is not None:
+        return params["base_cell_size"]
+    if params.get("base_cell_size_diameters") is not None:
+        return params["base_cell_size_diameters"] * propeller_diameter
+    return None
+
+
+def compute_block_mesh(outer_dimension, outer_anchor, base_cell_size=None):
+    """Compute the vertices of the blockMesh box which encloses the outermost
+    cylinder and, if `base_cell_size` is given, the number of cells along
+    each axis.
+
+    Along X and Z the box is larger than the outermost cylinder by (at least)
+    0.1 on each side. If `base_cell_size` is given the box is enlarged such
+    that its X and Z dimensions are multiples of `base_cell_size`, therefore
+    the cells have exactly that size along X and Z, and the size of the cells
+    in the refinement regions is `base_cell_size / 2**level`. Along Y the box
+    matches the outermost cylinder, the cells are at most `base_cell_size`
+    long.
+
+    :param outer_dimension: The dimension of the outermost cylinder.
+    :type outer_dimension: np.ndarray
+    :param outer_anchor: The anchor of the outermost cylinder.
+    :type outer_anchor: np.ndarray
+    :param base_cell_size: The size of the cells of blockMesh.
+    :type base_cell_size: float, optional
+    :return: A 2-tuple: the vertices of the box (the lowest corner in the
+        first row, the biggest one in the second) and the number of cells
+        along X, Y and Z (`None` if `base_cell_size` is not given).
+    :rtype: tuple
+    """
+    # the outermost cylinder is anchored to its biggest Y coordinate
+    maxy = outer_anchor[1]
+    miny = maxy - outer_dimension[1]
+
+    # we take half of the diameter of the outer cylinder, plus an epsilon
+    half_xz = outer_dimension[[0, 2]] / 2 + 0.1
+
+    cells = None
+    if base_cell_size is not None:
+        cells_xz = np.ceil(2 * half_xz / base_cell_size - 1e-9).astype(int)
+        half_xz = cells_xz * base_cell_size / 2
+        cells_y = max(int(np.ceil((maxy - miny) / base_cell_size - 1e-9)), 1)
+        cells = [int(cells_xz[0]), cells_y, int(cells_xz[1])]
+
+    center_xz = outer_anchor[[0, 2]]
+    box = np.array(
+        [
+            [center_xz[0] - half_xz[0], miny, center_xz[1] - half_xz[1]],
+            [center_xz[0] + half_xz[0], maxy, center_xz[1] + half_xz[1]],
+        ]
+    )
+    return box, cells
+
+
+def compute_case_geometry(propeller_info, params):
+    """Compute the names, dimensions and anchors of the cylinders, the
+    vertices of the blockMesh box and the location in mesh for a case. Nothing
+    is written to disk.
+
+    Each propeller gets its own nested stack of cylinders (anchored as
+    described in
+    :func:`src.generate_cylinders.compute_cylinder_anchors`), while the
+    outermost cylinder is shared and encloses all the propellers.
+
+    :param propeller_info: The output of :func:`read_propeller_info`, or a
+        list of them (one for each propeller).
+    :type propeller_info: dict
+    :param params: The parameters of the case (see `params.py`).
+    :type params: dict
+    :return: A dictionary which contains the computed geometry.
+    :rtype: dict
+    """
+    if isinstance(propeller_info, dict):
+        propeller_info = [propeller_info]
+
+    N_of_cylinders = params["N_of_cylinders"]
+    cylinder_scales = params["cylinder_scales"]
+    take_available_y = params["take_available_y"]
+    refinement_values = params["refinement_values"]
+
+    if (
+        len(take_available_y) != N_of_cylinders - 1
+        or len(cylinder_scales) != N_of_cylinders
+    ):
+        raise ValueError("Unexpected number of cylinders.")
+
+    bodies = body_names(len(propeller_info))
+
+    # the outermost cylinder encloses all the propellers
+    union_boundary = np.stack(
+        [
+            np.min([info["boundary"][0] for info in propeller_info], axis=0),
+            np.max([info["boundary"][1] for info in propeller_info], axis=0),
+        ]
+    )
+    union_dimension = union_boundary[1] - union_boundary[0]
+    union_middle = np.median(union_boundary, axis=0)
+    outer_dimension = compute_cylinder_dimensions(
+        scales=[cylinder_scales[-1]],
+        propeller_diameter=max(union_dimension[0], union_dimension[2]),
+    )[0]
+    outer_anchor = np.array(
+        [union_middle[0], union_boundary[1, 1], union_middle[2]]
+    )
+
+    profile_margins = params.get("cylinder_profile_margins")
+    if profile_margins is not None and params.get("analytic_cylinders", False):
+        raise ValueError(
+            "Stepped cylinders cannot be written as searchableCylinder"
+        )
+    tapers = params.get("cylinder_taper")
+    if tapers is not None:
+        if len(tapers) != N_of_cylinders:
+            raise ValueError("Expected a taper for each cylinder.")
+        if params.get("analytic_cylinders", False) and any(
+            taper != 1 for taper in tapers[:-1]
+        ):
+            raise ValueError(
+                "Tapered cylinders cannot be written as searchableCylinder"
+            )
+
+    cylinder_names = []
+    inner_dimensions = []
+    inner_anchors = []
+    inner_profiles = []
+    for body, info in zip(bodies, propeller_info):
+        body_dimensions = compute_cylinder_dimensions(
+            scales=cylinder_scales,
+            propeller_diameter=info["diameter"],
+        )
+        body_dimensions[-1] = outer_dimension
+        body_anchors = compute_cylinder_anchors(
+            take_available_y=take_available_y,
+            # the length of the outermost cylinder
+            outer_cylinder_y_dimension=outer_dimension[1],
+            propeller_boundary=info["boundary"],
+            outer_anchor=outer_anchor,
+        )
+        adjust_dimensions(body_dimensions, body_anchors)
+
+        if profile_margins is not None:
+            profiles = compute_cylinder_profiles(
+                info,
+                body_dimensions[:-1],
+                body_anchors[:-1],
+                profile_margins,
+                params.get("cylinder_profile_steps", 4),
+            )
+            # the bounding box of the stepped cylinders
+            for idx, (_, radii) in enumerate(profiles):
+                body_dimensions[idx, [0, 2]] = 2 * radii.max()
+            inner_profiles.extend(profiles)
+
+        if len(bodies) == 1:
+            cylinder_names.extend(
+                "cylinder{}".format(i) for i in range(N_of_cylinders - 1)
+            )
+        else:
+            cylinder_names.extend(
+                "{}Cylinder{}".format(body, i)
+                for i in range(N_of_cylinders - 1)
+            )
+        inner_dimensions.append(body_dimensions[:-1])
+        inner_anchors.append(body_anchors[:-1])
+
+        if body == bodies[0]:
+            # the location in mesh is taken from the first propeller
+            location_in_mesh_xz = body_anchors[[0, 1], [0, 2]] + np.median(
+                body_dimensions[[0, 1], [0, 2]], axis=0
+            )
+            location_in_mesh_y = np.median(body_anchors[[0, 1], 1])
+
+    cylinder_names.append("outerCylinder")
+    cylinder_dimensions = np.concatenate(
+        inner_dimensions + [outer_dimension[None, :]]
+    )
+    cylinder_anchors = np.concatenate(inner_anchors + [outer_anchor[None, :]])
+    cylinder_bodies = np.repeat(np.arange(len(bodies)), N_of_cylinders - 1)
+
+    check_cylinder_stacks(cylinder_dimensions, cylinder_anchors, cylinder_bodies)
+
+    # the position of each cylinder in its stack, the outermost cylinder is
+    # the last of every stack
+    stack_positions = list(range(N_of_cylinders - 1)) * len(bodies)
+    stack_positions.append(N_of_cylinders - 1)
+
+    cylinder_profiles = compute_lateral_profiles(
+        cylinder_dimensions,
+        cylinder_anchors,
+        step_profiles=inner_profiles + [None]
+        if profile_margins is not None
+        else None,
+        tapers=None
+        if tapers is None
+        else [tapers[position] for position in stack_positions],
+        # the wake cones start at the lowest point of the propellers
+        taper_from=[
+            info["boundary"][0, 1]
+            for info in propeller_info
+            for _ in range(N_of_cylinders - 1)
+        ]
+        + [union_boundary[0, 1]],
+    )
+    check_profiles_nested(
+        cylinder_profiles, cylinder_dimensions, cylinder_anchors, cylinder_bodies
+    )
+    # only the first `len(refinement_values)` cylinders of each stack are
+    # refinement regions
+    refined = [
+        (name, refinement_values[position])
+        for name, position in zip(cylinder_names, stack_positions)
+        if position < len(refinement_values)
+    ]
+
+    base_cell_size = compute_base_cell_size(
+        params, max(info["diameter"] for info in propeller_info)
+    )
+    if base_cell_size is None:
+        cylinder_segments = None
+    else:
+        cylinder_segments = compute_cylinder_segments(
+            cylinder_dimensions,
+            refinement_levels=[
+                refinement_values[position]
+                if position < len(refinement_values)
+                else 0
+                for position in stack_positions
+            ],
+            base_cell_size=base_cell_size,
+            max_chord_error=params.get("max_chord_error", 0.1),
+        )
+
+    box, block_mesh_cells = compute_block_mesh(
+        cylinder_dimensions[-1], cylinder_anchors[-1], base_cell_size
+    )
+    # Python floats, formatted like in the OBJ files
+    (minx, miny, minz), (maxx, maxy, maxz) = box.tolist()
+
+    return dict(
+        body_names=bodies,
+        cylinder_names=cylinder_names,
+        cylinder_dimensions=cylinder_dimensions,
+        cylinder_anchors=cylinder_anchors,
+        cylinder_bodies=cylinder_bodies,
+        cylinder_segments=cylinder_segments,
+        # the lateral polyline of each cylinder, None for straight cylinders
+        cylinder_profiles=cylinder_profiles,
+        # the innermost cylinder of each propeller defines a cellZone
+        cellzone_cylinder_names=cylinder_names[: -1 : N_of_cylinders - 1]
+        if N_of_cylinders > 1
+        else [],
+        refinement_region_names=[name for name, _ in refined],
+        refinement_region_values=[value for _, value in refined],
+        base_cell_size=base_cell_size,
+        block_mesh_cells=block_mesh_cells,
+        block_mesh_point_x=[minx, maxx, maxx, minx, minx, maxx, maxx, minx],
+        block_mesh_point_y=[miny, miny, maxy, maxy, miny, miny, maxy, maxy],
+        block_mesh_point_z=[minz, minz, minz, minz, maxz, maxz, maxz, maxz],
+        location_in_mesh=format_floats(
+            [location_in_mesh_xz[0], location_in_mesh_y, location_in_mesh_xz[1]]
+        ),
+    )
+
+
+def openfoam_config_dict(openfoam_folder, geometry, params):
+    """Build the keyword arguments of
+    :func:`src.openfoam_parametrizer.generate_openfoam_configuration_dicts`
+    from the output of :func:`compute_case_geometry` and the parameters.
+    """
+    opfoam_config_dict = dict(
+        destination=openfoam_folder,
+        block_mesh_point_x=geometry["block_mesh_point_x"],
+        block_mesh_point_y=geometry["block_mesh_point_y"],
+        block_mesh_point_z=geometry["block_mesh_point_z"],
+        location_in_mesh=geometry["location_in_mesh"],
+        cylinder_names=geometry["cylinder_names"],
+        cellzone_cylinder_names=geometry["cellzone_cylinder_names"],
+        refinement_region_names=geometry["refinement_region_names"],
+        refinement_region_values=geometry["refinement_region_values"],
+    )
+
+    # the `blocks` section of the template is kept when there are no cells
+    cells = geometry["block_mesh_cells"]
+    opfoam_config_dict.update(
+        block_mesh_cells=None if cells is None else "{} {} {}".format(*cells),
+        block_mesh_simple_grading="{} {} {}".format(
+            *params.get("block_mesh_grading", [1, 1, 1])
+        ),
+    )
+
+    bodies = geometry["body_names"]
+    lod_refinement = params.get("propeller_lod_refinement", [])
+    opfoam_config_dict.update(
+        propeller_names=bodies,
+        propeller_features_names=[
+            propeller_features_name(params, body) for body in bodies
+        ],
+        propeller_lod_names=[
+            name for body in bodies for name in propeller_lod_names(params, body)
+        ],
+        propeller_lod_distances=[item[0] for item in lod_refinement]
+        * len(bodies),
+        propeller_lod_levels=[item[1] for item in lod_refinement]
+        * len(bodies),
+    )
+
+    opfoam_config_dict["analytic_cylinders"] = params.get(
+        "analytic_cylinders", False
+    )
+    if opfoam_config_dict["analytic_cylinders"]:
+        opfoam_config_dict.update(
+            searchable_cylinders(
+                geometry["cylinder_dimensions"][:-1],
+                geometry["cylinder_anchors"][:-1],
+            )
+        )
+
+    # append the values from params
+    opfoam_config_dict.update(params)
+    return opfoam_config_dict
+
+
+def render_case(openfoam_folder, propeller_path, params, outputs=None):
+    """Render an OpenFOAM case in memory: the propellers, the cylinders and
+    the configuration dictionaries (see :func:`generate_case`). Nothing is
+    written, the templates are read from `openfoam_folder`.
+
+    The geometry is computed (and checked) immediately, the files are
+    produced lazily while iterating.
+
+    :param openfoam_folder: The root directory of the OpenFOAM case, which
+        contains the templates.
+    :type openfoam_folder: str
+    :param propeller_path: The path to the OBJ file of the propeller, or a
+        list of paths for a case with several propellers.
+    :type propeller_path: str
+    :param params: The parameters of the case.
+    :type params: dict
+    :param outputs: The subset of `case_outputs` which should be rendered,
+        defaults to all of them.
+    :type outputs: list, optional
+    :return: A 2-tuple: the geometry of the case (see
+        :func:`compute_case_geometry`) and a generator of 2-tuples, the path
+        of a file (relative to `openfoam_folder`) and its content (bytes).
+        If `propeller_weld_tolerance` is given, the reports of the welding
+        of each propeller (see :func:`src.simplify.weld_obj`) are added to
+        `geometry["propeller_welding"]` while the files are produced.
+    :rtype: tuple
+    """
+    if outputs is None:
+        outputs = case_outputs
+    if isinstance(propeller_path, (str, Path)):
+        propeller_path = [propeller_path]
+    propeller_path = [str(path) for path in propeller_path]
+
+    # first of all we read the dimension of the propellers
+    propeller_info = [read_propeller_info(path) for path in propeller_path]
+    geometry = compute_case_geometry(propeller_info, params)
+    correct_location_in_mesh(geometry, propeller_path, propeller_info, params)
+    geometry["propeller_welding"] = {}
+
+    files = render_outputs(
+        openfoam_folder, propeller_path, propeller_info, geometry, params, outputs
+    )
+    return geometry, files
+
+
+def render_outputs(
+    openfoam_folder,
+    propeller_path,
+    propeller_info,
+    geometry,
+    params,
+    outputs,
+    templates=None,
+):
+    """The files of the given outputs (a subset of `case_outputs`) of a case
+    whose geometry is already computed (see :func:`render_case`), e.g. to
+    render the outputs separately.
+
+    :param templates: The texts of the parametrized files, if they were
+        already read (see
+        :func:`src.openfoam_parametrizer.load_templates`).
+    :type templates: dict, optional
+
+    :return: A generator of 2-tuples, the path of a file (relative to
+        `openfoam_folder`) and its content (bytes).
+    :rtype: generator
+    """
+    tri_surface = "constant/triSurface/"
+    weld_tolerance = params.get("propeller_weld_tolerance")
+
+    for body, path, info in zip(
+        geometry["body_names"], propeller_path, propeller_info
+    ):
+        if "propeller" in outputs and weld_tolerance is None:
+            # the propeller file is copied into the OpenFOAM folder
+            with open(path, "rb") as f:
+                yield tri_surface + body + ".obj", f.read()
+
+        lod_names = propeller_lod_names(params, body)
+        features_name = propeller_features_name(params, body)
+        needs_lods = "propeller_lods" in outputs or (
+            "feature_edges" in outputs and features_name != body
+        )
+        if (
+            not (needs_lods and lod_names)
+            and "feature_edges" not in outputs
+            and not ("propeller" in outputs and weld_tolerance is not None)
+        ):
+            continue
+
+        # OBJ or STL (without regions)
+        obj = TriMesh.read(str(path), dtype=np.float64).to_obj()
+        if weld_tolerance is not None:
+            # the levels of detail and the feature edges are computed on the
+            # welded propeller too
+            obj, report = weld_obj(obj, weld_tolerance * info["diameter"])
+            geometry["propeller_welding"][body] = report
+            if "propeller" in outputs:
+                yield tri_surface + body + ".obj", obj_bytes(obj)
+
+        surfaces = {body: obj}
+        if needs_lods and lod_names:
+            for name, error in zip(lod_names, params["propeller_lod_errors"]):
+                surfaces[name], _ = simplify_obj(obj, error * info["diameter"])
+                if "propeller_lods" in outputs:
+                    yield tri_surface + name + ".obj", obj_bytes(
+                        surfaces[name]
+                    )
+
+        if "feature_edges" in outputs:
+            # the feature edges of the cylinders are written together with
+            # the cylinders, here we extract the ones of the propellers
+            surface = surfaces[features_name]
+            edges = obj_feature_edges(
+                surface, params.get("feature_included_angle", 150)
+            )
+            yield tri_surface + features_name + ".eMesh", emesh_bytes(
+                features_name + ".eMesh", surface.vertices, edges
+            )
+
+    if "cylinders" in outputs:
+        # then we generate the cylinders according to the dimensions
+        # specified by the user
+        for name, content in cylinder_files(
+            dimensions=geometry["cylinder_dimensions"],
+            anchors=geometry["cylinder_anchors"],
+            names=geometry["cylinder_names"],
+            feature_edges=True,
+            segments=geometry["cylinder_segments"],
+            profiles=geometry["cylinder_profiles"],
+            # analytic cylinders are written in snappyHexMeshDict
+            inner_cylinders=not params.get("analytic_cylinders", False),
+        ):
+            yield tri_surface + name, content
+
+    files = [path for path in parametrized_files if path in outputs]
+    if files:
+        # then we run the parameterizer
+        yield from render_openfoam_configuration_dicts(
+            files=files,
+            templates=templates,
+            **openfoam_config_dict(str(openfoam_folder), geometry, params)
+        )
+
+
+def write_case_files(openfoam_folder, files):
+    """Write the files produced by :func:`render_case` into
+    `openfoam_folder`.
+
+    :param openfoam_folder: The root directory of the OpenFOAM case.
+    :type openfoam_folder: str
+    :param files: An iterable of 2-tuples (relative path, content).
+    :type files: iterable
+    :return: The relative paths of the files written.
+    :rtype: list
+    """
+    written = []
+    for path, content in files:
+        full_path = Path(openfoam_folder) / path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        if full_path.is_symlink() or (
+            full_path.exists() and full_path.stat().st_nlink > 1
+        ):
+            # a link to a shared file (see src.surface_store), which must
+            # not be modified
+            full_path.unlink()
+        full_path.write_bytes(content)
+        written.append(path)
+    return written
+
+
+def generate_case(openfoam_folder, propeller_path, params, outputs=None):
+    """Generate the cylinders and the configuration dictionaries of an
+    OpenFOAM case, and copy the propellers into `constant/triSurface`.
+
+    :param openfoam_folder: The root directory of the OpenFOAM case (the one
+        which contains `constant`, `system`, etc).
+    :type openfoam_folder: str
+    :param propeller_path: The path to the OBJ file of the propeller, or a
+        list of paths for a case with several propellers (see
+        :func:`body_names`).
+    :type propeller_path: str
+    :param params: The parameters of the case (see `params.py` and
+        :func:`params_from_module`).
+    :type params: dict
+    :param outputs: The subset of `case_outputs` which should be written,
+        defaults to all of them.
+    :type outputs: list, optional
+    :return: The geometry of the case (see :func:`compute_case_geometry`).
+    :rtype: dict
+    """
+    geometry, files = render_case(
+        openfoam_folder, propeller_path, params, outputs
+    )
+    write_case_files(openfoam_folder, files)
+    return geometry
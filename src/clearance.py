@@ -0,0 +1,343 @@
+"""Checks of the position of the propellers with respect to the cylinders
+and to `locationInMesh`, based on the exact surfaces of the propellers (see
+:class:`src.spatial_index.TriangleGrid`) instead of their bounding boxes.
+
+`locationInMesh` must lie in the fluid: outside of every propeller, inside
+`outerCylinder`, and not too close to any surface, otherwise `snappy` keeps
+the wrong region of the mesh.
+"""
+
+import numpy as np
+
+from src.generate_cylinders import default_profile_segments, profile_radii
+
+
+def cylinder_bounds(geometry, idx):
+    """The center of the base (on the XZ plane), the radius and the range of
+    Y of the idx-th cylinder of the case. The inner cylinders are anchored at
+    their minimum Y, the outermost cylinder at its maximum Y. The radius is
+    the smallest half-dimension along X and Z.
+    """
+    dimension = geometry["cylinder_dimensions"][idx]
+    anchor = geometry["cylinder_anchors"][idx]
+    if idx == len(geometry["cylinder_names"]) - 1:
+        y_range = (anchor[1] - dimension[1], anchor[1])
+    else:
+        y_range = (anchor[1], anchor[1] + dimension[1])
+    return anchor[[0, 2]], np.min(dimension[[0, 2]]) / 2, y_range
+
+
+def cylinder_polyline(geometry, idx):
+    """The lateral polyline `(ys, radii)` (see
+    :func:`src.generate_cylinders.revolved_cylinder`) of the idx-th cylinder
+    of the case: the profile of stepped cylinders and wake cones (see
+    :func:`src.case.compute_lateral_profiles`), a vertical segment for
+    straight cylinders. Consecutive duplicated points are dropped.
+    """
+    profiles = geometry.get("cylinder_profiles")
+    if profiles is None or profiles[idx] is None:
+        _, radius, y_range = cylinder_bounds(geometry, idx)
+        return np.array(y_range, dtype=float), np.full(2, radius)
+
+    ys, radii = (np.asarray(array, dtype=float) for array in profiles[idx])
+    keep = np.ones(len(ys), dtype=bool)
+    keep[1:] = (ys[1:] != ys[:-1]) | (radii[1:] != radii[:-1])
+    return ys[keep], radii[keep]
+
+
+def segment_distances(points, starts, ends):
+    """The distance between each 2D point and the closest of the given
+    segments.
+
+    :param points: A 2D array of points.
+    :type points: np.ndarray
+    :param starts: The first end of each segment.
+    :type starts: np.ndarray
+    :param ends: The second end of each segment.
+    :type ends: np.ndarray
+    :rtype: np.ndarray
+    """
+    distances = np.full(len(points), np.inf)
+    for start, end in zip(starts, ends):
+        direction = end - start
+        length = direction @ direction
+        if length > 0:
+            t = np.clip((points - start) @ direction / length, 0, 1)
+        else:
+            t = np.zeros(len(points))
+        distances = np.minimum(
+            distances,
+            np.linalg.norm(points - start - t[:, None] * direction, axis=1),
+        )
+    return distances
+
+
+def cylinder_signed_distances(points, geometry, idx, top=True):
+    """The distance between each point and the surface of the idx-th
+    cylinder of the case, negative outside of the cylinder. The distance is
+    measured from the exact surface of revolution of stepped cylinders and
+    wake cones (see :func:`cylinder_polyline`), on the half plane through
+    the axis and the point.
+
+    :param points: A 2D array of points.
+    :type points: np.ndarray
+    :param geometry: The output of :func:`src.case.compute_case_geometry`.
+    :type geometry: dict
+    :param idx: The index of the cylinder.
+    :type idx: int
+    :param top: If `False` the top cap is not a wall: only the bottom cap
+        and the lateral surface are considered, and the points above the
+        cylinder are inside it. Defaults to `True`.
+    :type top: bool, optional
+    :rtype: np.ndarray
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    center = cylinder_bounds(geometry, idx)[0]
+    ys, radii = cylinder_polyline(geometry, idx)
+
+    # the coordinates on the half plane (radius, y)
+    section = np.stack(
+        [np.linalg.norm(points[:, [0, 2]] - center, axis=1), points[:, 1]],
+        axis=1,
+    )
+    walls = np.concatenate(
+        [[[0, ys[0]]], np.stack([radii, ys], axis=1), [[0, ys[-1]]]]
+    )
+    if not top:
+        walls = walls[:-1]
+    distances = segment_distances(section, walls[:-1], walls[1:])
+
+    inside = (
+        (section[:, 1] > ys[0])
+        & ((section[:, 1] < ys[-1]) | (not top))
+        & (section[:, 0] < profile_radii(ys, radii, section[:, 1]))
+    )
+    return np.where(inside, distances, -distances)
+
+
+def reentrant_rims(geometry, idx):
+    """The circles where the walls of the idx-th cylinder turn towards its
+    inside, e.g. the inner edge of the steps of a stepped cylinder which
+    widens: the distance from the walls of a surface inside the cylinder
+    is not always minimum at one of its vertices there.
+
+    :return: A 2D array which contains the radius and the Y coordinate of
+        each circle.
+    :rtype: np.ndarray
+    """
+    ys, radii = cylinder_polyline(geometry, idx)
+    polygon = np.concatenate(
+        [[[0, ys[0]]], np.stack([radii, ys], axis=1), [[0, ys[-1]]]]
+    )
+    # the polygon is counterclockwise on the half plane (radius, y)
+    incoming = polygon[1:-1] - polygon[:-2]
+    outgoing = polygon[2:] - polygon[1:-1]
+    turn = incoming[:, 0] * outgoing[:, 1] - incoming[:, 1] * outgoing[:, 0]
+    return polygon[1:-1][turn < 0]
+
+
+def rim_clearance(grid, center, radius, y, max_distance, tolerance):
+    """The distance between a closed surface and a horizontal circle,
+    negative if the circle enters the surface.
+
+    The circle is sampled, then only the arcs which may be closer than the
+    closest sample are sampled again, four times more densely, until the
+    distance is known within `tolerance`.
+
+    :param grid: A :class:`src.spatial_index.TriangleGrid` over the
+        triangles of the surface.
+    :type grid: src.spatial_index.TriangleGrid
+    :param center: The X and Z coordinates of the center of the circle.
+    :type center: np.ndarray
+    :param radius: The radius of the circle.
+    :type radius: float
+    :param y: The Y coordinate of the circle.
+    :type y: float
+    :param max_distance: Bigger distances are not computed, `max_distance`
+        is returned instead.
+    :type max_distance: float
+    :param tolerance: The accuracy of the distance.
+    :type tolerance: float
+    :rtype: float
+    """
+    step = 2 * np.pi / default_profile_segments
+    angles = step * np.arange(default_profile_segments)
+    best = max_distance
+    while len(angles):
+        points = np.stack(
+            [
+                center[0] + radius * np.cos(angles),
+                np.full(len(angles), y),
+                center[1] + radius * np.sin(angles),
+            ],
+            axis=1,
+        )
+        inside = grid.contains(points)
+        if np.any(inside):
+            return -float(grid.distance(points[inside]).max())
+
+        # the points of the arc around each sample are closer to it than
+        # half of the length of the arc, only the arcs which may improve the
+        # distance by more than `tolerance` are refined
+        half = radius * step / 2
+        distances = grid.distance(points, best + half)
+        best = min(best, float(distances.min()))
+        if half <= tolerance:
+            break
+        step /= 4
+        angles = (
+            angles[distances - half < best - tolerance, None]
+            + step * np.array([-1.5, -0.5, 0.5, 1.5])
+        ).ravel()
+    return best
+
+
+def cylinder_clearances(grids, geometry, tolerance=None):
+    """The minimum distance between each propeller and the walls of the
+    inner cylinders of its stack. Negative values mean that the propeller
+    crosses the wall. The top of the cylinders which reach the top of
+    `outerCylinder` is the boundary of the domain, not a wall.
+
+    The walls are the exact surfaces of revolution of stepped cylinders and
+    wake cones (see :func:`cylinder_signed_distances`). The minimum is
+    attained either at a vertex of the propeller, or where a reentrant rim
+    of the walls (see :func:`reentrant_rims`) is closest to the surface of
+    the propeller, which is computed within `tolerance` (see
+    :func:`rim_clearance`).
+
+    :param grids: A :class:`src.spatial_index.TriangleGrid` for each
+        propeller.
+    :type grids: list
+    :param geometry: The output of :func:`src.case.compute_case_geometry`.
+    :type geometry: dict
+    :param tolerance: The accuracy of the distances from the rims, defaults
+        to 1e-3 times the size of the propeller.
+    :type tolerance: float, optional
+    :return: The clearance of each inner cylinder, keyed by name.
+    :rtype: dict
+    """
+    top = cylinder_bounds(geometry, len(geometry["cylinder_names"]) - 1)[2][1]
+    # the cylinders which reach the top are computed with a roundoff error
+    top_tolerance = 1e-9 * geometry["cylinder_dimensions"][-1, 1]
+
+    clearances = {}
+    for idx, body in enumerate(geometry["cylinder_bodies"]):
+        grid = grids[body]
+        center, _, (_, y_max) = cylinder_bounds(geometry, idx)
+        clearance = float(
+            cylinder_signed_distances(
+                grid.vertices, geometry, idx, top=y_max < top - top_tolerance
+            ).min()
+        )
+
+        rim_tolerance = tolerance
+        if rim_tolerance is None:
+            rim_tolerance = 1e-3 * np.ptp(grid.vertices, axis=0).max()
+        for radius, y in reentrant_rims(geometry, idx):
+            clearance = min(
+                clearance,
+                rim_clearance(
+                    grid, center, radius, y, max(clearance, 0), rim_tolerance
+                ),
+            )
+        clearances[geometry["cylinder_names"][idx]] = clearance
+    return clearances
+
+
+def location_in_mesh_errors(location, grids, geometry, margin):
+    """Check that `locationInMesh` lies in the fluid.
+
+    :param location: The point.
+    :type location: np.ndarray
+    :param grids: A :class:`src.spatial_index.TriangleGrid` for each
+        propeller.
+    :type grids: list
+    :param geometry: The output of :func:`src.case.compute_case_geometry`.
+    :type geometry: dict
+    :param margin: The minimum distance between the point and the surfaces
+        of the propellers and of the cylinders.
+    :type margin: float
+    :return: The list of the problems found.
+    :rtype: list
+    """
+    location = np.asarray(location, dtype=np.float64)
+    errors = []
+    for body, grid in zip(geometry["body_names"], grids):
+        if grid.contains(location)[0]:
+            errors.append("locationInMesh is inside {}".format(body))
+        elif grid.distance(location, margin)[0] < margin:
+            errors.append("locationInMesh is too close to {}".format(body))
+
+    for idx, name in enumerate(geometry["cylinder_names"]):
+        distance = cylinder_signed_distances(location, geometry, idx)[0]
+        if name == "outerCylinder" and distance < 0:
+            errors.append("locationInMesh is outside of outerCylinder")
+        elif abs(distance) < margin:
+            errors.append("locationInMesh is too close to {}".format(name))
+    return errors
+
+
+def location_candidates(geometry, default):
+    """Candidates for `locationInMesh`, sorted by distance from `default`:
+    points halfway between the walls of the cylinders of the first
+    propeller (radially and along Y), in 16 directions around its axis.
+    """
+    names = geometry["cylinder_names"]
+    stack = [
+        idx
+        for idx, body in enumerate(geometry["cylinder_bodies"])
+        if body == 0
+    ]
+    stack.append(len(names) - 1)
+    bounds = [cylinder_bounds(geometry, idx) for idx in stack]
+    center = bounds[0][0]
+
+    radii = np.array([0] + sorted(radius for _, radius, _ in bounds))
+    radii = (radii[1:] + radii[:-1]) / 2
+    walls = np.unique([y for _, _, y_range in bounds for y in y_range])
+    ys = np.append((walls[1:] + walls[:-1]) / 2, default[1])
+
+    angles = np.linspace(0, 2 * np.pi, 16, endpoint=False) + np.pi / 4
+    r, angle, y = np.meshgrid(radii, angles, ys, indexing="ij")
+    r, angle, y = r.ravel(), angle.ravel(), y.ravel()
+    candidates = np.stack(
+        [
+            center[0] + r * np.cos(angle),
+            y,
+            center[1] + r * np.sin(angle),
+        ],
+        axis=1,
+    )
+    order = np.argsort(
+        np.linalg.norm(candidates - default, axis=1), kind="stable"
+    )
+    return np.concatenate([[default], candidates[order]])
+
+
+def find_location_in_mesh(grids, geometry, margin):
+    """Return `locationInMesh` (see `geometry["location_in_mesh"]`) if it is
+    valid (see :func:`location_in_mesh_errors`), otherwise the closest valid
+    point among :func:`location_candidates`.
+
+    :raises ValueError: If no candidate is valid.
+    :rtype: np.ndarray
+    """
+    default = np.array(geometry["location_in_mesh"].split(), dtype=float)
+    candidates = location_candidates(geometry, default)
+
+    # the cheap checks first
+    valid = np.ones(len(candidates), dtype=bool)
+    for idx, name in enumerate(geometry["cylinder_names"]):
+        distances = cylinder_signed_distances(candidates, geometry, idx)
+        valid &= np.abs(distances) >= margin
+        if name == "outerCylinder":
+            valid &= distances > 0
+    for grid in grids:
+        valid[valid] &= ~grid.contains(candidates[valid])
+
+    for candidate in candidates[valid]:
+        if all(
+            grid.distance(candidate, margin)[0] >= margin for grid in grids
+        ):
+            return candidate
+    raise ValueError("Cannot find a valid locationInMesh")
@@ -0,0 +1,253 @@
+"""Case specifications read from configuration files instead of `params.py`.
+
+A specification contains the root directory of the case (`case`), the path
+to the propeller or a list of paths (`propeller`) and the parameters which
+override the defaults of `params.py` (`params`). Two formats are supported:
+
++ TOML, for a single case::
+
+    case = "cases/case0"
+    propeller = "propeller.obj"
+
+    [params]
+    N_of_cylinders = 3
+    cylinder_scales = [[1.1, nan, 1.1], [2, nan, 2], [5, 9, 5]]
+
++ JSON Lines, one specification per line, for many cases. JSON has no NaN,
+  `null` is used instead in `cylinder_scales`::
+
+    {"case": "cases/case0", "propeller": "propeller.obj", "params": {}}
+
+Relative paths are relative to the directory of the configuration file. The
+parameters are validated against the fields of `params.py`.
+"""
+
+import json
+import os
+
+import numpy as np
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value):
+    return _is_int(value) or isinstance(value, float)
+
+
+def _optional(check):
+    return lambda value: value is None or check(value)
+
+
+def _list_of(check, length=None):
+    return lambda value: (
+        isinstance(value, list)
+        and (length is None or len(value) == length)
+        and all(check(item) for item in value)
+    )
+
+
+# the fields of `params.py`: a check and a description of the expected value
+params_schema = {
+    "N_of_cylinders": (_is_int, "an integer"),
+    "cylinder_scales": (
+        _list_of(_list_of(_optional(_is_number), 3)),
+        "a list of [x, y, z] scales (null or nan for y)",
+    ),
+    "take_available_y": (_list_of(_is_number), "a list of numbers"),
+    "refinement_values": (_list_of(_is_int), "a list of integers"),
+    "outer_cylinder_min_surf_ref": (_is_int, "an integer"),
+    "outer_cylinder_max_surf_ref": (_is_int, "an integer"),
+    "propeller_min_surf_ref": (_is_int, "an integer"),
+    "propeller_max_surf_ref": (_is_int, "an integer"),
+    "refinement_regions_mode": (
+        lambda value: isinstance(value, str),
+        "a string",
+    ),
+    "refinement_regions_distance": (
+        lambda value: isinstance(value, str) or _is_number(value),
+        "a string or a number",
+    ),
+    "analytic_cylinders": (
+        lambda value: isinstance(value, bool),
+        "a boolean",
+    ),
+    "base_cell_size": (_optional(_is_number), "a number or null"),
+    "base_cell_size_diameters": (_optional(_is_number), "a number or null"),
+    "max_chord_error": (_is_number, "a number"),
+    "block_mesh_grading": (
+        _list_of(_is_number, 3),
+        "a list of three numbers",
+    ),
+    "correct_location_in_mesh": (
+        lambda value: isinstance(value, bool),
+        "a boolean",
+    ),
+    "min_cylinder_clearance": (_optional(_is_number), "a number or null"),
+    "cylinder_profile_margins": (
+        _optional(_list_of(_is_number)),
+        "a list of numbers or null",
+    ),
+    "cylinder_profile_steps": (_is_int, "an integer"),
+    "cylinder_taper": (
+        _optional(_list_of(_is_number)),
+        "a list of numbers or null",
+    ),
+    "propeller_weld_tolerance": (_optional(_is_number), "a number or null"),
+    "propeller_lod_errors": (_list_of(_is_number), "a list of numbers"),
+    "propeller_lod_refinement": (
+        _list_of(_list_of(_is_number, 2)),
+        "a list of [distance, level] pairs",
+    ),
+    "propeller_features_lod": (_optional(_is_int), "an integer or null"),
+    "feature_included_angle": (_is_number, "a number"),
+}
+
+
+def validate_params(params):
+    """Check the given parameters against `params_schema`.
+
+    :param params: The parameters (a subset of the fields of `params.py`).
+    :type params: dict
+    :return: A copy of the parameters, where `null` in `cylinder_scales` is
+        replaced by `np.nan`.
+    :rtype: dict
+    """
+    if not isinstance(params, dict):
+        raise ValueError("params must be a table/object")
+
+    for key, value in params.items():
+        if key not in params_schema:
+            raise ValueError("Unknown parameter {}".format(key))
+        check, description = params_schema[key]
+        if not check(value):
+            raise ValueError(
+                "{} must be {}, got {!r}".format(key, description, value)
+            )
+
+    params = dict(params)
+    if "cylinder_scales" in params:
+        params["cylinder_scales"] = [
+            [np.nan if item is None else item for item in scale]
+            for scale in params["cylinder_scales"]
+        ]
+    return params
+
+
+def validate_spec(spec, base_folder="."):
+    """Check a case specification and normalize it.
+
+    :param spec: The specification, with the keys `case`, `propeller` and
+        optionally `params`.
+    :type spec: dict
+    :param base_folder: The folder to which relative paths are relative.
+    :type base_folder: str, optional
+    :return: The specification: `case` (str), `propeller` (list of str) and
+        `params` (dict, see :func:`validate_params`).
+    :rtype: dict
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("A specification must be a table/object")
+    unknown = set(spec) - {"case", "propeller", "params"}
+    if unknown:
+        raise ValueError("Unknown keys {}".format(sorted(unknown)))
+    if not isinstance(spec.get("case"), str):
+        raise ValueError("case must be a string")
+
+    propeller = spec.get("propeller")
+    if isinstance(propeller, str):
+        propeller = [propeller]
+    if not (
+        isinstance(propeller, list)
+        and propeller
+        and all(isinstance(path, str) for path in propeller)
+    ):
+        raise ValueError("propeller must be a string or a list of strings")
+
+    return dict(
+        case=os.path.join(base_folder, spec["case"]),
+        propeller=[os.path.join(base_folder, path) for path in propeller],
+        params=validate_params(spec.get("params", {})),
+    )
+
+
+def read_toml_spec(path):
+    """Read and validate the specification of a single case from a TOML
+    file (see :func:`validate_spec`)."""
+    if tomllib is None:
+        raise ImportError("Reading TOML files requires Python 3.11 or tomli")
+    with open(path, "rb") as f:
+        try:
+            spec = tomllib.load(f)
+        except tomllib.TOMLDecodeError as e:
+            raise ValueError("{}: {}".format(path, e))
+    try:
+        return validate_spec(spec, os.path.dirname(path))
+    except ValueError as e:
+        raise ValueError("{}: {}".format(path, e))
+
+
+def _check_errors(errors):
+    if errors not in ("raise", "report"):
+        raise ValueError("Unknown error handling {}".format(errors))
+
+
+def iter_jsonl_specs(path, errors="raise"):
+    """Read and validate lazily the specifications in a JSON Lines file, one
+    for each line (blank lines are skipped). Only one line at a time is kept
+    in memory.
+
+    :param errors: What happens when a line is not a valid specification:
+        `"raise"` (default) raises a `ValueError`, `"report"` yields a
+        dictionary with the keys `line` (the number of the line) and `error`
+        (the description of the problem) instead of the specification, and
+        the next lines are read.
+    :type errors: str, optional
+    :return: A generator of specifications (see :func:`validate_spec`).
+    :rtype: generator
+    """
+    _check_errors(errors)
+    base_folder = os.path.dirname(path)
+    with open(path, "r") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                spec = validate_spec(json.loads(line), base_folder)
+            except ValueError as e:
+                # json.JSONDecodeError is a ValueError
+                message = "{}:{}: {}".format(path, number, e)
+                if errors == "raise":
+                    raise ValueError(message)
+                yield dict(line=number, error=message)
+            else:
+                yield spec
+
+
+def iter_specs(path, errors="raise"):
+    """The specifications in a TOML (`.toml`, a single case) or JSON Lines
+    (`.jsonl`) file. See :func:`iter_jsonl_specs` for `errors`, the line of
+    an invalid TOML file is `None`."""
+    _check_errors(errors)
+    extension = path.split(".")[-1]
+    if extension == "toml":
+        try:
+            return iter([read_toml_spec(path)])
+        except ValueError as e:
+            if errors == "raise":
+                raise
+            return iter([dict(line=None, error=str(e))])
+    elif extension == "jsonl":
+        return iter_jsonl_specs(path, errors)
+    raise ValueError(
+        "Files of type {} are not supported at the moment".format(extension)
+    )
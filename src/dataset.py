@@ -0,0 +1,401 @@
+"""A columnar dataset of the cases generated by a sweep.
+
+Each case is described by a record: the parameters, the derived geometry
+(the boundary and the diameter of the propellers, the blockMesh box,
+`locationInMesh`, an estimate of the number of cells) and the size of the
+output and the time taken. The cylinders are in a second table, one row for
+each cylinder (with the index of its case), since the number of cylinders
+changes from case to case.
+
+:class:`DatasetWriter` buffers the records and writes them in shards (one
+file for each batch of records): NumPy `.npz` files, or Parquet files when
+`pyarrow` is available. :func:`read_dataset` loads all the shards of a
+dataset into one array for each column.
+"""
+
+import json
+import math
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+from src.case import read_propeller_info
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+dataset_formats = ("npz", "parquet")
+
+_shard_pattern = re.compile(r"^part-(\d+)\.(npz|cases\.parquet)$")
+
+
+def cylinder_volumes(geometry):
+    """The volume of each cylinder of a case, along its lateral polyline
+    (a sum of truncated cones) for stepped cylinders and wake cones, of an
+    elliptic cylinder otherwise."""
+    profiles = geometry["cylinder_profiles"]
+    volumes = []
+    for idx, dimension in enumerate(geometry["cylinder_dimensions"]):
+        if profiles is not None and profiles[idx] is not None:
+            ys, radii = (np.asarray(item) for item in profiles[idx])
+            r1, r2 = radii[:-1], radii[1:]
+            volumes.append(
+                np.sum(np.pi * np.diff(ys) / 3 * (r1**2 + r1 * r2 + r2**2))
+            )
+        else:
+            volumes.append(np.pi * dimension[0] * dimension[2] / 4 * dimension[1])
+    return np.array(volumes, dtype=float)
+
+
+def estimated_cells(geometry, refinement_values):
+    """A rough estimate of the number of cells of the castellated mesh: the
+    cells of blockMesh, refined to the level of each cylinder inside it (the
+    refinement of the surfaces is not taken into account). `nan` if the
+    size of the cells is not known.
+
+    :param geometry: The geometry of the case (see
+        :func:`src.case.compute_case_geometry`).
+    :type geometry: dict
+    :param refinement_values: The refinement level of the cylinders of each
+        stack (see `params.py`).
+    :type refinement_values: list
+    :rtype: float
+    """
+    base_cell_size = geometry["base_cell_size"]
+    if base_cell_size is None:
+        return math.nan
+
+    box = [
+        max(geometry["block_mesh_point_" + axis])
+        - min(geometry["block_mesh_point_" + axis])
+        for axis in "xyz"
+    ]
+    cells = np.prod(box) / base_cell_size**3
+
+    def level(position):
+        if position < len(refinement_values):
+            return refinement_values[position]
+        return 0
+
+    # each cylinder replaces the cells of the cylinder (or of the box) which
+    # encloses it
+    volumes = cylinder_volumes(geometry)
+    bodies = np.asarray(geometry["cylinder_bodies"])
+    stacks = [np.flatnonzero(bodies == body) for body in np.unique(bodies)]
+    for stack in stacks:
+        for position, idx in enumerate(stack):
+            cells += (
+                volumes[idx]
+                * (8.0 ** level(position) - 8.0 ** level(position + 1))
+                / base_cell_size**3
+            )
+    # the outermost cylinder comes after the inner cylinders of every stack
+    outer_position = max((len(stack) for stack in stacks), default=0)
+    cells += (
+        volumes[-1] * (8.0 ** level(outer_position) - 1) / base_cell_size**3
+    )
+    return float(cells)
+
+
+def case_record(
+    case, propeller_path, params, geometry, elapsed=math.nan, output_sizes=None
+):
+    """The record of a case: a dictionary with the columns of the `cases`
+    table (`"cases"`) and of the `cylinders` table (`"cylinders"`, one item
+    for each cylinder). Vectors are lists of 3 numbers, missing values are
+    `nan` (or -1 for integers).
+
+    The parameters are stored as JSON (`params`), the scalar ones also as
+    `param_<name>` columns. `welded_vertices` and `welded_faces` are the
+    numbers removed by welding the propellers (see
+    `propeller_weld_tolerance`).
+
+    :param case: The root directory of the case.
+    :type case: str
+    :param propeller_path: The path to the propeller, or a list of paths.
+    :type propeller_path: str
+    :param params: The parameters of the case.
+    :type params: dict
+    :param geometry: The geometry of the case (see
+        :func:`src.case.compute_case_geometry`).
+    :type geometry: dict
+    :param elapsed: The time taken to generate the case, in seconds.
+    :type elapsed: float, optional
+    :param output_sizes: The size in bytes of each output file.
+    :type output_sizes: list, optional
+    :rtype: dict
+    """
+    if isinstance(propeller_path, (str, Path)):
+        propeller_path = [propeller_path]
+    info = [read_propeller_info(str(path)) for path in propeller_path]
+    cells = geometry["block_mesh_cells"]
+    sizes = [] if output_sizes is None else list(output_sizes)
+
+    record = dict(
+        case=str(case),
+        propeller=json.dumps([str(path) for path in propeller_path]),
+        n_propellers=len(propeller_path),
+        diameter=max(item["diameter"] for item in info),
+        boundary_min=np.min([item["boundary"][0] for item in info], axis=0),
+        boundary_max=np.max([item["boundary"][1] for item in info], axis=0),
+        n_cylinders=len(geometry["cylinder_names"]),
+        base_cell_size=math.nan
+        if geometry["base_cell_size"] is None
+        else geometry["base_cell_size"],
+        block_mesh_min=[
+            min(geometry["block_mesh_point_" + axis]) for axis in "xyz"
+        ],
+        block_mesh_max=[
+            max(geometry["block_mesh_point_" + axis]) for axis in "xyz"
+        ],
+        block_mesh_cells=[-1, -1, -1] if cells is None else cells,
+        location_in_mesh=[
+            float(value) for value in geometry["location_in_mesh"].split()
+        ],
+        estimated_cells=estimated_cells(geometry, params["refinement_values"]),
+        n_files=len(sizes) if output_sizes is not None else -1,
+        output_bytes=sum(sizes) if output_sizes is not None else -1,
+        elapsed=elapsed,
+        params=json.dumps(params, sort_keys=True, default=str),
+    )
+    # the vertices and the triangles removed by the welding of the
+    # propellers, -1 if they are not welded
+    welding = geometry.get("propeller_welding") or {}
+    for key in "vertices", "faces":
+        record["welded_" + key] = (
+            sum(report[key][0] - report[key][1] for report in welding.values())
+            if welding
+            else -1
+        )
+
+    for key, value in sorted(params.items()):
+        if value is None or isinstance(value, (bool, int, float)):
+            record["param_" + key] = math.nan if value is None else value
+
+    segments = geometry["cylinder_segments"]
+    cylinders = dict(
+        name=list(geometry["cylinder_names"]),
+        body=[int(body) for body in geometry["cylinder_bodies"]] + [-1],
+        dimension=np.asarray(geometry["cylinder_dimensions"]).tolist(),
+        anchor=np.asarray(geometry["cylinder_anchors"]).tolist(),
+        segments=[-1] * len(geometry["cylinder_names"])
+        if segments is None
+        else list(segments),
+        volume=cylinder_volumes(geometry).tolist(),
+    )
+    return dict(cases=record, cylinders=cylinders)
+
+
+def _column(values, missing):
+    # a column of a batch, the records without the value get `missing`
+    present = [value for value in values if value is not None]
+    if any(isinstance(value, str) for value in present):
+        return np.array(["" if value is None else value for value in values])
+    shape = np.shape(present[0])
+    return np.array(
+        [np.full(shape, missing) if value is None else value for value in values]
+    )
+
+
+def _columns(rows):
+    names = sorted({name for row in rows for name in row})
+    columns = {}
+    for name in names:
+        values = [row.get(name) for row in rows]
+        columns[name] = _column(values, np.nan)
+    return columns
+
+
+class DatasetWriter:
+    """Append the records of the cases (see :func:`case_record`) to a
+    dataset in `folder`, in batches: a shard is written every `batch_size`
+    records and when the writer is closed. The shards already in `folder`
+    are kept, the new ones are numbered after them.
+    """
+
+    def __init__(self, folder, batch_size=1000, format=None):
+        """
+        :param folder: The folder of the dataset, created if needed.
+        :type folder: str
+        :param batch_size: The number of records of each shard.
+        :type batch_size: int, optional
+        :param format: `"npz"` or `"parquet"` (which requires `pyarrow`),
+            defaults to Parquet if `pyarrow` is available.
+        :type format: str, optional
+        """
+        if format is None:
+            format = "npz" if pyarrow is None else "parquet"
+        if format not in dataset_formats:
+            raise ValueError("Unknown format {}".format(format))
+        if format == "parquet" and pyarrow is None:
+            raise ImportError("Writing Parquet files requires pyarrow")
+
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.format = format
+        self._records = []
+        self._next_shard = 1 + max(
+            [-1]
+            + [
+                int(match.group(1))
+                for match in map(_shard_pattern.match, os.listdir(self.folder))
+                if match
+            ]
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def append(self, record):
+        """Add the record of a case (see :func:`case_record`)."""
+        self._records.append(record)
+        if len(self._records) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records into a new shard."""
+        if not self._records:
+            return
+        cases = _columns([record["cases"] for record in self._records])
+        cylinders = _columns(
+            [
+                dict(zip(record["cylinders"], values))
+                for record in self._records
+                for values in zip(*record["cylinders"].values())
+            ]
+        )
+        # the index of the case of each cylinder, in the shard
+        cylinders["case"] = np.repeat(
+            np.arange(len(self._records)),
+            [len(record["cylinders"]["name"]) for record in self._records],
+        )
+
+        stem = "part-{:05d}".format(self._next_shard)
+        if self.format == "npz":
+            arrays = {"cases/" + name: array for name, array in cases.items()}
+            arrays.update(
+                ("cylinders/" + name, array) for name, array in cylinders.items()
+            )
+            _write_npz(self.folder / (stem + ".npz"), arrays)
+        else:
+            for table, columns in ("cases", cases), ("cylinders", cylinders):
+                _write_parquet(
+                    self.folder / "{}.{}.parquet".format(stem, table), columns
+                )
+        self._next_shard += 1
+        self._records = []
+
+    def close(self):
+        self.flush()
+
+
+def _write_npz(path, arrays):
+    # written under a temporary name, a reader never sees a partial shard
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _write_parquet(path, columns):
+    arrays = {}
+    for name, array in columns.items():
+        if array.ndim == 2:
+            # a vector for each row
+            arrays[name] = pyarrow.FixedSizeListArray.from_arrays(
+                pyarrow.array(array.ravel()), array.shape[1]
+            )
+        else:
+            arrays[name] = pyarrow.array(array)
+    tmp_path = path.with_name(path.name + ".tmp")
+    pyarrow.parquet.write_table(pyarrow.table(arrays), str(tmp_path))
+    os.replace(tmp_path, path)
+
+
+def _read_parquet(path):
+    table = pyarrow.parquet.read_table(str(path))
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name).combine_chunks()
+        if isinstance(column.type, pyarrow.FixedSizeListType):
+            columns[name] = column.flatten().to_numpy(
+                zero_copy_only=False
+            ).reshape(-1, column.type.list_size)
+        else:
+            columns[name] = column.to_numpy(zero_copy_only=False)
+    return columns
+
+
+def _read_shard(folder, name):
+    if name.endswith(".npz"):
+        with np.load(folder / name) as data:
+            tables = dict(cases={}, cylinders={})
+            for key in data.files:
+                table, column = key.split("/", 1)
+                tables[table][column] = data[key]
+        return tables["cases"], tables["cylinders"]
+
+    if pyarrow is None:
+        raise ImportError("Reading Parquet files requires pyarrow")
+    stem = name[: -len(".cases.parquet")]
+    return (
+        _read_parquet(folder / name),
+        _read_parquet(folder / (stem + ".cylinders.parquet")),
+    )
+
+
+def _concatenate(tables):
+    # the columns missing in some of the shards are filled with nan (or "")
+    names = sorted({name for table in tables for name in table})
+    lengths = [len(next(iter(table.values()))) for table in tables]
+    columns = {}
+    for name in names:
+        sample = next(table[name] for table in tables if name in table)
+        parts = []
+        for table, length in zip(tables, lengths):
+            if name in table:
+                parts.append(table[name])
+            elif sample.dtype.kind in "US":
+                parts.append(np.full((length,) + sample.shape[1:], ""))
+            else:
+                parts.append(np.full((length,) + sample.shape[1:], np.nan))
+        columns[name] = np.concatenate(parts)
+    return columns
+
+
+def read_dataset(folder):
+    """Read all the shards of a dataset written by :class:`DatasetWriter`.
+
+    :param folder: The folder of the dataset.
+    :type folder: str
+    :return: A 2-tuple of dictionaries (one array for each column): the
+        cases and the cylinders. The column `case` of the cylinders is the
+        index of the case (a row of the cases).
+    :rtype: tuple
+    """
+    folder = Path(folder)
+    shards = sorted(
+        (int(match.group(1)), match.group(0))
+        for match in map(_shard_pattern.match, os.listdir(folder))
+        if match
+    )
+    cases, cylinders = [], []
+    offset = 0
+    for _, name in shards:
+        shard_cases, shard_cylinders = _read_shard(folder, name)
+        shard_cylinders["case"] = shard_cylinders["case"] + offset
+        offset += len(shard_cases["case"])
+        cases.append(shard_cases)
+        cylinders.append(shard_cylinders)
+    if not cases:
+        return {}, {}
+    return _concatenate(cases), _concatenate(cylinders)
@@ -0,0 +1,174 @@
+import numpy as np
+
+from src.simplify import face_regions
+from src.mesh import format_floats
+
+emesh_header = """FoamFile
+{{
+    version     2.0;
+    format      ascii;
+    class       featureEdgeMesh;
+    location    "constant/triSurface";
+    object      {};
+}}
+// * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * //
+
+"""
+
+
+def edge_face_adjacency(faces):
+    """Find the edges of a triangulated surface and the triangles which share
+    each edge, sorting the edge keys (the pair of vertices of the edge, the
+    smallest first).
+
+    :param faces: A 2D array of 0-based triangles.
+    :type faces: np.ndarray
+    :return: A 4-tuple: the unique edges (2D array), the number of triangles
+        which share each edge, the triangles sorted by edge and the index of
+        the first of them for each edge. The triangles which share the i-th
+        edge are `edge_faces[starts[i] : starts[i] + counts[i]]`.
+    :rtype: tuple
+    """
+    faces = np.asarray(faces)
+    half_edges = np.concatenate(
+        [faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]]
+    )
+    keys = np.sort(half_edges, axis=1)
+    edge_faces = np.tile(np.arange(len(faces)), 3)
+
+    order = np.lexsort((keys[:, 1], keys[:, 0]))
+    keys = keys[order]
+    edge_faces = edge_faces[order]
+
+    new_edge = np.ones(len(keys), dtype=bool)
+    new_edge[1:] = np.any(keys[1:] != keys[:-1], axis=1)
+    starts = np.flatnonzero(new_edge)
+    counts = np.diff(np.append(starts, len(keys)))
+
+    return keys[starts], counts, edge_faces, starts
+
+
+def face_normals(vertices, faces):
+    """Unit normals of the given triangles (right-hand rule)."""
+    v = np.asarray(vertices)[faces]
+    normals = np.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0])
+    norms = np.linalg.norm(normals, axis=1)
+    norms[norms == 0] = 1
+    return normals / norms[:, None]
+
+
+def feature_edges(vertices, faces, included_angle=150, regions=None):
+    """Extract the feature edges of a triangulated surface: open edges,
+    non-manifold edges, edges where the angle between the normals of the two
+    triangles is bigger than `180 - included_angle` degrees (the same
+    convention of the OpenFOAM utility `surfaceFeatures`) and, if `regions`
+    is given, the boundaries between regions.
+
+    :param vertices: A 2D array of vertices.
+    :type vertices: np.ndarray
+    :param faces: A 2D array of 0-based triangles.
+    :type faces: np.ndarray
+    :param included_angle: Edges with a smaller included angle (in degrees)
+        are features, defaults to 150.
+    :type included_angle: float, optional
+    :param regions: The index of the region of each triangle.
+    :type regions: np.ndarray, optional
+    :return: A 2D array of feature edges (pairs of vertex indexes).
+    :rtype: np.ndarray
+    """
+    edges, counts, edge_faces, starts = edge_face_adjacency(faces)
+
+    is_feature = counts != 2
+
+    manifold = np.flatnonzero(counts == 2)
+    f0 = edge_faces[starts[manifold]]
+    f1 = edge_faces[starts[manifold] + 1]
+
+    normals = face_normals(vertices, faces)
+    cos_angle = np.einsum("ij,ij->i", normals[f0], normals[f1])
+    is_feature[manifold] = cos_angle < np.cos(
+        np.radians(180 - included_angle)
+    )
+
+    if regions is not None:
+        regions = np.asarray(regions)
+        is_feature[manifold] |= regions[f0] != regions[f1]
+
+    return edges[is_feature]
+
+
+def emesh_bytes(name, points, edges):
+    """Serialize a featureEdgeMesh (the format of the `.eMesh` files in
+    `constant/triSurface`). Only the points used by `edges` are written.
+
+    :param name: The name of the file (the `object` in the header).
+    :type name: str
+    :param points: A 2D array of points.
+    :type points: np.ndarray
+    :param edges: A 2D array of edges (pairs of indexes in `points`).
+    :type edges: np.ndarray
+    :rtype: bytes
+    """
+    used, edges = np.unique(np.asarray(edges, dtype=int), return_inverse=True)
+    edges = edges.reshape(-1, 2)
+    points = np.asarray(points)[used]
+
+    lines = [emesh_header.format(name)]
+    lines.append("// points:\n\n{}\n(".format(len(points)))
+    lines.extend("(" + format_floats(p) + ")" for p in points)
+    lines.append(")\n\n\n// edges:\n\n{}\n(".format(len(edges)))
+    lines.extend("({} {})".format(*e) for e in edges)
+    lines.append(")\n\n\n// " + "*" * 73 + " //\n")
+    return "\n".join(lines).encode()
+
+
+def write_emesh(path, points, edges):
+    """Write a featureEdgeMesh file (see :func:`emesh_bytes`).
+
+    :param path: The output path.
+    :type path: str
+    :param points: A 2D array of points.
+    :type points: np.ndarray
+    :param edges: A 2D array of edges (pairs of indexes in `points`).
+    :type edges: np.ndarray
+    """
+    with open(path, "wb") as f:
+        f.write(emesh_bytes(path.split("/")[-1], points, edges))
+
+
+def obj_feature_edges(obj, included_angle=150):
+    """The feature edges (see :func:`feature_edges`, the boundaries of
+    regions are features) of the given OBJ data."""
+    return feature_edges(
+        obj.vertices,
+        np.asarray(obj.polygons) - 1,
+        included_angle=included_angle,
+        regions=face_regions(obj),
+    )
+
+
+def cylinder_rim_edges(vertices):
+    """The feature edges of a cylinder whose axis is parallel to Y: the two
+    circles where the caps meet the lateral surface. They are known in
+    advance, no adjacency information is needed.
+
+    :param vertices: The vertices of the cylinder.
+    :type vertices: np.ndarray
+    :return: A 2D array of edges (pairs of indexes in `vertices`).
+    :rtype: np.ndarray
+    """
+    vertices = np.asarray(vertices)
+    center = (vertices.min(axis=0) + vertices.max(axis=0)) / 2
+    radial = vertices[:, [0, 2]] - center[[0, 2]]
+    radius = np.linalg.norm(radial, axis=1)
+    edges = []
+    for y in vertices[:, 1].min(), vertices[:, 1].max():
+        # on the rim, and not on the axis (e.g. the center of a cap): the caps
+        # of a truncated cone have different radii
+        on_cap = np.isclose(vertices[:, 1], y)
+        on_rim = radius > radius[on_cap].max() / 2
+        rim = np.flatnonzero(on_rim & on_cap)
+        angle = np.arctan2(radial[rim, 1], radial[rim, 0])
+        rim = rim[np.argsort(angle)]
+        edges.append(np.stack([rim, np.roll(rim, -1)], axis=1))
+    return np.concatenate(edges)
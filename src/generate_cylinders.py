@@ -1,5 +1,344 @@
+from functools import lru_cache
+from pathlib import Path
+
 import numpy as np
-from smithers.io.obj import ObjHandler
+
+from src.features import (
+    cylinder_rim_edges,
+    emesh_bytes,
+    face_normals,
+    write_emesh,
+)
+from src.mesh import TriMesh, format_floats, obj_bytes
+
+BASE_CYLINDER_PATH = str(
+    Path(__file__).resolve().parent.parent / "res" / "cylinder.obj"
+)
+# the number of segments of the stepped cylinders when the number of segments
+# is not computed from the size of the cells
+default_profile_segments = 64
+
+
+def _read_only(mesh):
+    # the cached meshes are shared, nobody should modify them
+    mesh.vertices.flags.writeable = False
+    mesh.faces.flags.writeable = False
+    return mesh
+
+
+@lru_cache(maxsize=1)
+def _read_base_cylinder():
+    return _read_only(TriMesh.read(BASE_CYLINDER_PATH, dtype=np.float64))
+
+
+def load_base_cylinder():
+    """Return a private copy of the base cylinder (`res/cylinder.obj`). The
+    file is parsed only once per process.
+
+    :return: The base cylinder.
+    :rtype: WavefrontOBJ
+    """
+    return _read_base_cylinder().to_obj()
+
+
+@lru_cache(maxsize=32)
+def _tessellate_cylinder(n_segments):
+    angles = 2 * np.pi * np.arange(n_segments) / n_segments
+    ring = np.stack(
+        [np.cos(angles) / 2, np.zeros(n_segments), np.sin(angles) / 2], axis=1
+    )
+    vertices = np.concatenate(
+        [ring, ring + [0, 1, 0], [[0, 0, 0], [0, 1, 0]]]
+    )
+
+    i = np.arange(n_segments)
+    j = (i + 1) % n_segments
+    top = n_segments
+    bottom_center, top_center = 2 * n_segments, 2 * n_segments + 1
+    # outward oriented triangles
+    polygons = np.concatenate(
+        [
+            np.stack([np.full(n_segments, bottom_center), i, j], axis=1),
+            np.stack([np.full(n_segments, top_center), top + j, top + i], axis=1),
+            np.stack([i, top + i, top + j], axis=1),
+            np.stack([i, top + j, j], axis=1),
+        ]
+    )
+
+    return _read_only(TriMesh(vertices, polygons, dtype=np.float64))
+
+
+def tessellate_cylinder(n_segments):
+    """Generate a cylinder with unit diameter and unit length along Y, whose
+    circular sections are regular polygons with `n_segments` sides. The caps
+    are triangulated as fans around their centers.
+
+    :param n_segments: The number of segments, a multiple of 4 (this way
+        the dimension of the cylinder along X and Z is exactly 1).
+    :type n_segments: int
+    :return: The cylinder (a private copy).
+    :rtype: WavefrontOBJ
+    """
+    if n_segments % 4 != 0:
+        raise ValueError("The number of segments must be a multiple of 4.")
+    return _tessellate_cylinder(n_segments).to_obj()
+
+
+def compute_cylinder_segments(
+    dimensions,
+    refinement_levels,
+    base_cell_size,
+    max_chord_error=0.1,
+    min_segments=8,
+):
+    """Compute the number of segments of each cylinder, such that the chord
+    error (the maximum distance between a side of the polygon and the
+    circle) is below a fraction of the size of the cells inside the cylinder,
+    using as few segments as possible.
+
+    The cells of the i-th cylinder have size
+    `base_cell_size / 2**refinement_levels[i]`. The chord error of a regular
+    polygon with :math:`n` sides inscribed in a circle of radius :math:`r`
+    is :math:`r (1 - \\cos(\\pi / n))`.
+
+    :param dimensions: A 2D array which represents the dimension of each
+        cylinder (see :func:`compute_cylinder_dimensions`). Elliptic sections
+        use the biggest radius.
+    :type dimensions: np.ndarray
+    :param refinement_levels: The refinement level of each cylinder, missing
+        values are taken as 0.
+    :type refinement_levels: list
+    :param base_cell_size: The size of the cells of blockMesh.
+    :type base_cell_size: float
+    :param max_chord_error: The maximum chord error, in terms of the size of
+        the cells of the cylinder. Defaults to 0.1.
+    :type max_chord_error: float, optional
+    :param min_segments: The minimum number of segments, defaults to 8.
+    :type min_segments: int, optional
+    :return: The number of segments (a multiple of 4) of each cylinder.
+    :rtype: list
+    """
+    dimensions = np.asarray(dimensions)
+    levels = np.zeros(len(dimensions))
+    n_of_levels = min(len(refinement_levels), len(dimensions))
+    levels[:n_of_levels] = refinement_levels[:n_of_levels]
+
+    radius = np.max(dimensions[:, [0, 2]], axis=1) / 2
+    chord_error = max_chord_error * base_cell_size / 2 ** levels
+
+    segments = np.pi / np.arccos(1 - np.minimum(chord_error / radius, 1))
+    segments = np.maximum(np.ceil(segments), min_segments)
+    # round up to a multiple of 4
+    return [int(n) for n in np.ceil(segments / 4) * 4]
+
+
+def compress_profile(breaks, radii, max_steps):
+    """Approximate a piecewise constant radial profile from above with at
+    most `max_steps` steps (contiguous groups of intervals, whose radius is
+    the largest in the group), minimizing the volume added to the solid of
+    revolution.
+
+    :param breaks: The `n + 1` boundaries (along Y) of the intervals.
+    :type breaks: np.ndarray
+    :param radii: The radius in each of the `n` intervals.
+    :type radii: np.ndarray
+    :param max_steps: The maximum number of steps.
+    :type max_steps: int
+    :return: A 2-tuple: the boundaries and the radii of the steps.
+    :rtype: tuple
+    """
+    breaks = np.asarray(breaks, dtype=float)
+    radii = np.asarray(radii, dtype=float)
+    n = len(radii)
+    widths = np.diff(breaks)
+    # the volume of the interval j is proportional to widths[j] * radii[j]**2
+    volume = np.concatenate([[0], np.cumsum(widths * radii**2)])
+    length = np.concatenate([[0], np.cumsum(widths)])
+
+    # cost[i, j]: the volume added if the intervals i..j-1 are one step
+    group_max = np.full((n + 1, n + 1), np.inf)
+    for i in range(n):
+        group_max[i, i + 1 :] = np.maximum.accumulate(radii[i:])
+    with np.errstate(invalid="ignore"):
+        cost = (
+            group_max**2 * (length[None, :] - length[:, None])
+            - (volume[None, :] - volume[:, None])
+        )
+    cost[np.tril_indices(n + 1)] = np.inf
+
+    # best[k, j]: the minimum volume added by k steps over the first j
+    # intervals
+    steps = min(max_steps, n)
+    best = np.full((steps + 1, n + 1), np.inf)
+    best[0, 0] = 0
+    choice = np.zeros((steps + 1, n + 1), dtype=int)
+    for k in range(1, steps + 1):
+        candidates = best[k - 1][:, None] + cost
+        choice[k] = np.argmin(candidates, axis=0)
+        best[k] = candidates[choice[k], np.arange(n + 1)]
+
+    k = int(np.argmin(best[:, n]))
+    bounds = [n]
+    while k > 0:
+        bounds.append(choice[k, bounds[-1]])
+        k -= 1
+    bounds = bounds[::-1]
+    values = np.array(
+        [radii[i:j].max() for i, j in zip(bounds[:-1], bounds[1:])]
+    )
+    # adding a step with the same radius costs nothing
+    distinct = np.append(values[1:] != values[:-1], True)
+    return breaks[[0] + list(np.array(bounds[1:])[distinct])], values[distinct]
+
+
+def surface_of_revolution(radii, ys, n_segments, center=(0, 0)):
+    """Revolve a polyline of the half plane `(radius, y)` around an axis
+    parallel to Y. The polyline must start and end on the axis (radius 0),
+    going from the lowest to the biggest Y coordinate: the surface is closed
+    and its triangles are oriented outwards.
+
+    :param radii: The distance from the axis of each point of the polyline.
+    :type radii: np.ndarray
+    :param ys: The Y coordinate of each point of the polyline.
+    :type ys: np.ndarray
+    :param n_segments: The number of segments of the circular sections, a
+        multiple of 4.
+    :type n_segments: int
+    :param center: The X and Z coordinates of the axis.
+    :type center: np.ndarray, optional
+    :rtype: src.mesh.TriMesh
+    """
+    points = np.stack([radii, ys], axis=1).astype(float)
+    # consecutive duplicated points would give degenerate triangles
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:] = np.any(points[1:] != points[:-1], axis=1)
+    points = points[keep]
+    if points[0, 0] != 0 or points[-1, 0] != 0:
+        raise ValueError("The polyline must start and end on the axis.")
+
+    angles = 2 * np.pi * np.arange(n_segments) / n_segments
+    directions = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+
+    vertices = []
+    rings = []
+    for radius, y in points:
+        if radius == 0:
+            rings.append(np.full(n_segments, len(vertices)))
+            vertices.append([center[0], y, center[1]])
+        else:
+            rings.append(len(vertices) + np.arange(n_segments))
+            xz = center + radius * directions
+            vertices.extend(
+                np.stack([xz[:, 0], np.full(n_segments, y), xz[:, 1]], axis=1)
+            )
+
+    faces = []
+    for lower, upper in zip(rings[:-1], rings[1:]):
+        next_lower, next_upper = np.roll(lower, -1), np.roll(upper, -1)
+        faces.append(np.stack([lower, upper, next_upper], axis=1))
+        faces.append(np.stack([lower, next_upper, next_lower], axis=1))
+    faces = np.concatenate(faces)
+    # the triangles which touch the axis collapse
+    faces = faces[
+        (faces[:, 0] != faces[:, 1])
+        & (faces[:, 1] != faces[:, 2])
+        & (faces[:, 2] != faces[:, 0])
+    ]
+    return TriMesh(np.array(vertices), faces, dtype=np.float64)
+
+
+def revolved_cylinder(ys, radii, n_segments, center=(0, 0)):
+    """A closed surface of revolution around an axis parallel to Y: the
+    lateral surface is obtained from the polyline `(ys, radii)` (`ys` must
+    not decrease, repeated values give flat steps), the caps are flat.
+    Straight cylinders, truncated cones and stepped cylinders are special
+    cases.
+
+    :param ys: The Y coordinate of each point of the lateral polyline.
+    :type ys: np.ndarray
+    :param radii: The distance from the axis of each point.
+    :type radii: np.ndarray
+    :param n_segments: The number of segments of the circular sections, a
+        multiple of 4.
+    :type n_segments: int
+    :param center: The X and Z coordinates of the axis.
+    :type center: np.ndarray, optional
+    :rtype: src.mesh.TriMesh
+    """
+    ys = np.asarray(ys, dtype=float)
+    radii = np.asarray(radii, dtype=float)
+    return surface_of_revolution(
+        np.concatenate([[0], radii, [0]]),
+        np.concatenate([ys[:1], ys, ys[-1:]]),
+        n_segments,
+        center,
+    )
+
+
+def step_polyline(breaks, radii):
+    """The lateral polyline (see :func:`revolved_cylinder`) of a stack of
+    cylinders: the i-th cylinder spans `breaks[i]` to `breaks[i + 1]` along
+    Y and has radius `radii[i]`."""
+    return np.repeat(breaks, 2)[1:-1], np.repeat(radii, 2)
+
+
+def stepped_cylinder(breaks, radii, n_segments, center=(0, 0)):
+    """A stack of coaxial cylinders (a single closed surface), see
+    :func:`step_polyline`."""
+    return revolved_cylinder(
+        *step_polyline(breaks, radii), n_segments=n_segments, center=center
+    )
+
+
+def taper_polyline(ys, radii, taper, full_from):
+    """Scale the radii of a lateral polyline linearly from `taper` at the
+    lowest Y coordinate to 1 at `full_from`, the radii above `full_from` are
+    not changed (a wake cone which contracts downstream of the propeller).
+
+    :param ys: The Y coordinate of each point of the polyline.
+    :type ys: np.ndarray
+    :param radii: The distance from the axis of each point.
+    :type radii: np.ndarray
+    :param taper: The scale factor at the lowest Y coordinate.
+    :type taper: float
+    :param full_from: The Y coordinate where the taper ends.
+    :type full_from: float
+    :return: The new polyline (a 2-tuple of arrays).
+    :rtype: tuple
+    """
+    ys = np.asarray(ys, dtype=float)
+    radii = np.asarray(radii, dtype=float)
+    if full_from <= ys[0]:
+        return ys, radii
+    if full_from < ys[-1] and full_from not in ys:
+        position = np.searchsorted(ys, full_from)
+        radius = profile_radii(ys, radii, [full_from])[0]
+        ys = np.insert(ys, position, full_from)
+        radii = np.insert(radii, position, radius)
+
+    factor = taper + (1 - taper) * (ys - ys[0]) / (full_from - ys[0])
+    return ys, radii * np.minimum(factor, 1)
+
+
+def profile_radii(ys, radii, y, side="right"):
+    """Evaluate the radius of a lateral polyline (see
+    :func:`revolved_cylinder`) at the given Y coordinates, which are clipped
+    to the range of the polyline. At a flat step the radius above the step
+    (`side="right"`) or below it (`side="left"`) is taken.
+    """
+    ys = np.asarray(ys, dtype=float)
+    radii = np.asarray(radii, dtype=float)
+    y = np.clip(np.asarray(y, dtype=float), ys[0], ys[-1])
+    if side == "right":
+        start = np.searchsorted(ys, y, side="right") - 1
+    else:
+        start = np.searchsorted(ys, y, side="left") - 1
+    start = np.clip(start, 0, len(ys) - 2)
+
+    length = ys[start + 1] - ys[start]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(length > 0, (y - ys[start]) / length, 0)
+    return radii[start] + t * (radii[start + 1] - radii[start])
 
 
 def compute_cylinder_dimensions(
@@ -45,7 +384,10 @@ def compute_cylinder_dimensions(
 
 
 def compute_cylinder_anchors(
-    take_available_y, outer_cylinder_y_dimension, propeller_boundary
+    take_available_y,
+    outer_cylinder_y_dimension,
+    propeller_boundary,
+    outer_anchor=None,
 ):
     """Generate a set of X,Y,Z anchors to be used during the generation of the
     cylinders. X and Z will be used as the center coordinate of the cylinder
@@ -98,6 +440,11 @@ def compute_cylinder_anchors(
         propeller (first row minimum, second row maximum, one column for each
         axis).
     :type propeller_boundary: np.ndarray
+    :param outer_anchor: The anchor of the outermost cylinder, by default
+        the end of the stem of the propeller. Several propellers in the same
+        domain share the outermost cylinder, in this case the anchor encloses
+        all of them.
+    :type outer_anchor: np.ndarray, optional
     :return: A 2D array which contains the X,Y,Z anchors (one row for each
         cylinder).
     :rtype: np.ndarray
@@ -105,13 +452,13 @@ def compute_cylinder_anchors(
 
     propeller_middle = np.median(propeller_boundary, axis=0)
 
-    outer_anchor = np.array(
-        [propeller_middle[0], propeller_boundary[1, 1], propeller_middle[2]]
-    )[None, :]
+    if outer_anchor is None:
+        outer_anchor = np.array(
+            [propeller_middle[0], propeller_boundary[1, 1], propeller_middle[2]]
+        )
+    outer_anchor = np.asarray(outer_anchor, dtype=float)[None, :]
 
-    outer_cylinder_y_min = (
-        propeller_boundary[1, 1] - outer_cylinder_y_dimension
-    )
+    outer_cylinder_y_min = outer_anchor[0, 1] - outer_cylinder_y_dimension
 
     middle_layer = np.repeat(
         np.array([propeller_middle[0], np.nan, propeller_middle[2]])[None, :],
@@ -121,9 +468,7 @@ def compute_cylinder_anchors(
 
     # space_left is the space between the outlet and the tip of the propeller
     # it is updated as soon a cylinder erases the space left
-    space_left = outer_cylinder_y_dimension - (
-        propeller_boundary[1, 1] - propeller_boundary[0, 1]
-    )
+    space_left = propeller_boundary[0, 1] - outer_cylinder_y_min
     for idx in range(len(take_available_y)):
         if idx == 0:
             base = propeller_boundary[0, 1]
@@ -138,11 +483,47 @@ def compute_cylinder_anchors(
     return np.concatenate([middle_layer, outer_anchor], axis=0)
 
 
+def classify_cylinder_faces(vertices, faces, rtol=1e-6):
+    """Classify the triangles of a cylinder whose axis is parallel to Y.
+
+    A triangle belongs to a cap if its normal is parallel to Y and its
+    centroid lies on the lowest or on the biggest Y coordinate, both up to a
+    tolerance relative to the length of the cylinder. This works with any
+    triangulation of the caps, and takes linear time.
+
+    :param vertices: The vertices of the cylinder.
+    :type vertices: np.ndarray
+    :param faces: A 2D array of 0-based triangles.
+    :type faces: np.ndarray
+    :param rtol: The relative tolerance, defaults to 1e-6.
+    :type rtol: float, optional
+    :return: The label of each triangle: 0 for the cap at the biggest Y
+        coordinate (inlet), 1 for the cap at the lowest Y coordinate
+        (outlet), 2 for the lateral surface (wall).
+    :rtype: np.ndarray
+    """
+    vertices = np.asarray(vertices)
+    y = vertices[:, 1]
+    min_y, max_y = y.min(), y.max()
+    tolerance = rtol * (max_y - min_y)
+
+    centroid_y = (y[faces[:, 0]] + y[faces[:, 1]] + y[faces[:, 2]]) / 3
+    on_cap = np.abs(face_normals(vertices, faces)[:, 1]) >= 1 - rtol
+
+    labels = np.full(len(faces), 2)
+    labels[on_cap & (np.abs(centroid_y - max_y) <= tolerance)] = 0
+    labels[on_cap & (np.abs(centroid_y - min_y) <= tolerance)] = 1
+    return labels
+
+
 def generate_cylinders_obj(
     dimensions,
     anchors,
     names,
     base_folder=".",
+    write_feature_edges=False,
+    segments=None,
+    inner_cylinders=True,
 ):
     """Generate .obj files which contain cylinder that can be used to
     bound volumes with different mesh resolutions.
@@ -166,95 +547,185 @@ def generate_cylinders_obj(
         individually for each cylinder. Defaults to
         ["innerCylinder", "middleCylinder", "outerCylinder"]
     :type regions: list, optional
+    :param write_feature_edges: If `True` the feature edges of the outermost
+        cylinder (the borders of the inlet and of the outlet) are written to
+        `base_folder/name.eMesh`. Defaults to `False`.
+    :type write_feature_edges: bool, optional
+    :param segments: The number of segments of each cylinder (see
+        :func:`compute_cylinder_segments`). By default the cylinders are
+        obtained from `res/cylinder.obj`.
+    :type segments: list, optional
+    :param inner_cylinders: If `False` only the outermost cylinder is
+        written, the other ones are expected to be analytic surfaces (see
+        :func:`searchable_cylinders`). Defaults to `True`.
+    :type inner_cylinders: bool, optional
     :return: A 2-tuple which contains the minimum and maximum Y coordinate of
         the outer cylinder.
     :rtype: tuple
     """
 
+    for name, cylinder in cylinder_meshes(
+        dimensions, anchors, names, segments, inner_cylinders
+    ):
+        with open(base_folder + "/" + name + ".obj", "wb") as f:
+            f.write(obj_bytes(cylinder))
+
+    # the last one is the outermost cylinder
+    if write_feature_edges:
+        write_emesh(
+            base_folder + "/" + name + ".eMesh",
+            cylinder.vertices,
+            cylinder_rim_edges(cylinder.vertices),
+        )
+    return cylinder.bounds[:, 1]
+
+
+def cylinder_meshes(
+    dimensions,
+    anchors,
+    names,
+    segments=None,
+    inner_cylinders=True,
+    profiles=None,
+    only=None,
+):
+    """Generate the cylinders described in :func:`generate_cylinders_obj` in
+    memory. If `profiles` is given, the cylinders whose item is not `None`
+    are surfaces of revolution (see :func:`revolved_cylinder`) around the
+    axis of the anchor, whose lateral surface follows the given
+    `(ys, radii)` polyline, e.g. truncated cones or stepped cylinders. The
+    outermost body gets the same regions of the outermost cylinder. If
+    `only` is given, only the cylinders whose name is in it are generated.
+
+    :return: A generator of 2-tuples: the name of the cylinder and its mesh
+        (:class:`src.mesh.TriMesh`). The outermost cylinder is the last.
+    :rtype: generator
+    """
     if dimensions.shape[0] != anchors.shape[0]:
         raise ValueError(
             """You probably supplied a wrong number of values to
             `compute_cylinder_anchors`"""
         )
 
-    base_cylinder = ObjHandler.read("res/cylinder.obj")
-    base_dimension = ObjHandler.dimension(base_cylinder)
-
     for expected_dimension, name, idx, anchor in zip(
         dimensions, names, range(len(dimensions)), anchors
     ):
-        scale_factors = expected_dimension / base_dimension
-        ObjHandler.scale(base_cylinder, scale_factors)
+        if not inner_cylinders and idx != len(dimensions) - 1:
+            continue
+        if only is not None and name not in only:
+            continue
+
+        if segments is not None and segments[idx] % 4 != 0:
+            raise ValueError("The number of segments must be a multiple of 4.")
+
+        if profiles is not None and profiles[idx] is not None:
+            ys, radii = profiles[idx]
+            cylinder = revolved_cylinder(
+                ys,
+                radii,
+                default_profile_segments if segments is None else segments[idx],
+                center=anchor[[0, 2]],
+            )
+        else:
+            # the base cylinders are cached and shared, each transformation
+            # returns a new mesh
+            if segments is None:
+                base_cylinder = _read_base_cylinder()
+            else:
+                base_cylinder = _tessellate_cylinder(segments[idx])
 
-        base_cylinder.regions.clear()
-        base_cylinder.regions_change_indexes.clear()
+            scale_factors = expected_dimension / base_cylinder.dimension
+            cylinder = base_cylinder.transformed(scale=scale_factors)
 
-        cylinder_middle = np.median(base_cylinder.vertices, axis=0)
+            cylinder_middle = np.median(cylinder.vertices, axis=0)
 
-        translation_vector = anchor - cylinder_middle
+            translation_vector = anchor - cylinder_middle
+            if idx != len(dimensions) - 1:
+                translation_vector[1] = anchor[1] - cylinder.bounds[0, 1]
+            else:
+                translation_vector[1] = anchor[1] - cylinder.bounds[1, 1]
+            cylinder = cylinder.transformed(translation=translation_vector)
 
         if idx != len(dimensions) - 1:
-            translation_vector[1] = anchor[1] - np.min(
-                base_cylinder.vertices[:, 1]
-            )
-            ObjHandler.translate(base_cylinder, translation_vector)
-
-            base_cylinder.regions.append(name)
-            base_cylinder.regions_change_indexes.append((0, 0))
+            cylinder = cylinder.with_regions([name], [0])
         else:
-            translation_vector[1] = anchor[1] - np.max(
-                base_cylinder.vertices[:, 1]
-            )
-            ObjHandler.translate(base_cylinder, translation_vector)
-
             # the outermost cylinder wants three regions:
             # outerCylinderWall, outerCylinderInlet, outerCylinderOutlet
+            labels = classify_cylinder_faces(cylinder.vertices, cylinder.faces)
+            counts = np.bincount(labels, minlength=3)
 
-            # first of all we find the two regions in which Y remains constant
-            min_y = np.min(base_cylinder.vertices[:, 1])
-            max_y = np.max(base_cylinder.vertices[:, 1])
+            cylinder = cylinder.with_regions(
+                [name + suffix for suffix in ["Inlet", "Outlet", "Wall"]],
+                [0, counts[0], counts[0] + counts[1]],
+                order=np.argsort(labels, kind="stable"),
+            )
 
-            poly = np.asarray(base_cylinder.polygons) - 1
-            poly_vertices_y = base_cylinder.vertices[poly.flatten()][:, 1]
+        yield name, cylinder
 
-            def find_plateau_polygons(constant_y):
-                return np.all(
-                    (poly_vertices_y == constant_y).reshape(-1, poly.shape[1]),
-                    axis=1,
-                )
 
-            left_bool_idxes = find_plateau_polygons(min_y)
-            right_bool_idxes = find_plateau_polygons(max_y)
-            walls_bool_idxes = np.logical_not(
-                np.logical_or(left_bool_idxes, right_bool_idxes)
-            )
+def cylinder_files(
+    dimensions,
+    anchors,
+    names,
+    feature_edges=False,
+    segments=None,
+    inner_cylinders=True,
+    profiles=None,
+    only=None,
+):
+    """The files written by :func:`generate_cylinders_obj`, in memory (see
+    also :func:`cylinder_meshes`).
 
-            left = poly[left_bool_idxes]
-            right = poly[right_bool_idxes]
-            walls = poly[walls_bool_idxes]
+    :return: A generator of 2-tuples: the name of the file and its content.
+    :rtype: generator
+    """
+    name = None
+    for name, cylinder in cylinder_meshes(
+        dimensions, anchors, names, segments, inner_cylinders, profiles, only
+    ):
+        yield name + ".obj", obj_bytes(cylinder)
+
+    # only the outermost cylinder has feature edges
+    if feature_edges and name == names[-1]:
+        yield name + ".eMesh", emesh_bytes(
+            name + ".eMesh",
+            cylinder.vertices,
+            cylinder_rim_edges(cylinder.vertices),
+        )
 
-            base_cylinder.regions.extend(
-                map(lambda s: name + s, ["Inlet", "Outlet", "Wall"])
-            )
-            base_cylinder.regions_change_indexes.append((0, 0))
-            base_cylinder.regions_change_indexes.append((right.shape[0], 1))
-            base_cylinder.regions_change_indexes.append(
-                (left.shape[0] + right.shape[0], 2)
-            )
 
-            # as always we increment the result by 1
-            base_cylinder.polygons = (
-                np.concatenate([right, left, walls], axis=0) + 1
-            )
+def searchable_cylinders(dimensions, anchors):
+    """Compute the parameters of the OpenFOAM analytic surfaces
+    (`searchableCylinder`) equivalent to the given cylinders, which must not
+    contain the outermost cylinder (the Y anchor is the lowest Y coordinate
+    of the cylinder, see :func:`compute_cylinder_anchors`).
+
+    :param dimensions: A 2D array which represents the dimension of each
+        cylinder.
+    :type dimensions: np.ndarray
+    :param anchors: A 2D array which represents the anchor of each cylinder.
+    :type anchors: np.ndarray
+    :return: A dictionary which contains the lists `cylinder_point1`,
+        `cylinder_point2` (the centers of the two caps, formatted as "x y z")
+        and `cylinder_radius`.
+    :rtype: dict
+    """
+    dimensions = np.asarray(dimensions)
+    anchors = np.asarray(anchors)
+    if not np.allclose(dimensions[:, 0], dimensions[:, 2]):
+        raise ValueError(
+            "searchableCylinder needs the same X and Z dimensions"
+        )
 
-        ObjHandler.write(base_cylinder, base_folder + "/" + name + ".obj")
+    point1 = np.array(anchors, dtype=float)
+    point2 = np.array(anchors, dtype=float)
+    point2[:, 1] += dimensions[:, 1]
 
-        if idx == len(dimensions) - 1:
-            return ObjHandler.boundary(base_cylinder, axis=1)
-        else:
-            # after scaling we unscale to reset che changes to the base cylinder
-            ObjHandler.scale(base_cylinder, 1 / scale_factors)
-            ObjHandler.translate(base_cylinder, -translation_vector)
+    return dict(
+        cylinder_point1=[format_floats(p) for p in point1],
+        cylinder_point2=[format_floats(p) for p in point2],
+        cylinder_radius=(dimensions[:, 0] / 2).tolist(),
+    )
 
 
 def adjust_dimensions(cylinder_dimensions, cylinder_anchors):
@@ -282,9 +753,14 @@ def adjust_dimensions(cylinder_dimensions, cylinder_anchors):
         cylinder_anchors[-1, 1] - cylinder_dimensions[-1, 1]
     )
 
+    # a relative tolerance, the boundaries of the cylinders which reach the
+    # end of the outermost one are computed with a roundoff error
+    tolerance = 1e-9 * cylinder_dimensions[-1, 1]
     if (
-        np.max(cylinder_boundaries_maxy) != cylinder_boundaries_maxy[-1]
-        or np.min(cylinder_boundaries_miny) != cylinder_boundaries_miny[-1]
+        np.max(cylinder_boundaries_maxy)
+        > cylinder_boundaries_maxy[-1] + tolerance
+        or np.min(cylinder_boundaries_miny)
+        < cylinder_boundaries_miny[-1] - tolerance
     ):
         raise ValueError(
             "The outer cylinder does not enclose the internal cylinders"
@@ -0,0 +1,385 @@
+"""A resumable queue of case generation jobs stored in a SQLite database.
+
+Each job is the specification of a case (destination, propellers and the
+parameters which override the defaults of `params.py`). Workers, possibly on
+several nodes which share the database, claim the jobs with a lease: a job
+whose worker disappeared (crash, preemption) becomes available again when
+its lease expires, therefore an interrupted sweep resumes where it stopped.
+For each job the database records the status, the timings and the SHA-256
+digest of every file written into the case.
+
+Usage:
+
+    python3 -m src.job_queue add path/to/db case propeller [--set key=value]
+    python3 -m src.job_queue work path/to/db [--lease SECONDS]
+    python3 -m src.job_queue status path/to/db
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from src.case import generate_case, params_from_module
+from src.openfoam_parametrizer import parametrized_files
+from src.server import parse_overrides
+
+schema = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_path       TEXT NOT NULL UNIQUE,
+    propeller       TEXT NOT NULL,
+    params          TEXT NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'pending',
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    worker          TEXT,
+    lease_expires   REAL,
+    started         REAL,
+    finished        REAL,
+    elapsed         REAL,
+    error           TEXT,
+    output_hashes   TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+# pending -> running -> done | failed. A running job whose lease expired can
+# be claimed again
+job_statuses = ["pending", "running", "done", "failed"]
+
+
+def default_worker_name():
+    return "{}:{}".format(socket.gethostname(), os.getpid())
+
+
+def hash_outputs(case, paths):
+    """Compute the SHA-256 digest of the given files of a case.
+
+    :param case: The root directory of the case.
+    :type case: str
+    :param paths: The paths of the files, relative to `case`.
+    :type paths: list
+    :return: A dictionary which maps each path to its hexadecimal digest.
+    :rtype: dict
+    """
+    hashes = {}
+    for path in sorted(paths):
+        digest = hashlib.sha256()
+        with open(os.path.join(case, path), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        hashes[path] = digest.hexdigest()
+    return hashes
+
+
+def case_files(case):
+    """The paths (relative to `case`) of the files which
+    :func:`src.case.generate_case` writes or renders: everything in
+    `constant/triSurface` and the parametrized files.
+    """
+    case = Path(case)
+    paths = [
+        str(path.relative_to(case))
+        for path in (case / "constant" / "triSurface").glob("*")
+        if path.is_file()
+    ]
+    paths.extend(
+        path for path in parametrized_files if (case / path).exists()
+    )
+    return paths
+
+
+class JobQueue:
+    def __init__(self, path, lease_seconds=3600):
+        """
+        :param path: The path of the SQLite database, created if needed.
+        :type path: str
+        :param lease_seconds: How long a claimed job belongs to its worker
+            without a renewal, defaults to one hour.
+        :type lease_seconds: float, optional
+        """
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        # autocommit, transactions are opened explicitly
+        self.connection = sqlite3.connect(
+            self.path, timeout=60, isolation_level=None
+        )
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(schema)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, case, propeller, params=None):
+        """Add a job. A job for the same case is not added twice, therefore
+        adding the jobs of a sweep again is harmless.
+
+        :param case: The root directory of the OpenFOAM case.
+        :type case: str
+        :param propeller: The path to the propeller, or a list of paths.
+        :type propeller: str
+        :param params: The parameters which override the defaults.
+        :type params: dict, optional
+        :return: The id of the job.
+        :rtype: int
+        """
+        if not isinstance(propeller, (list, tuple)):
+            propeller = [propeller]
+        case = os.path.abspath(str(case))
+        self.connection.execute(
+            "INSERT OR IGNORE INTO jobs (case_path, propeller, params) "
+            "VALUES (?, ?, ?)",
+            (
+                case,
+                json.dumps([os.path.abspath(str(p)) for p in propeller]),
+                json.dumps(params or {}, sort_keys=True),
+            ),
+        )
+        return self.connection.execute(
+            "SELECT id FROM jobs WHERE case_path = ?", (case,)
+        ).fetchone()["id"]
+
+    def claim(self, worker):
+        """Claim the first pending job, or a running job whose lease
+        expired. The claim is atomic: two workers never get the same job.
+
+        :param worker: The name of the worker.
+        :type worker: str
+        :return: The job (a dictionary with the keys `id`, `case`,
+            `propeller`, `params` and `attempts`), `None` if there is no job
+            left.
+        :rtype: dict
+        """
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.connection.execute(
+                "SELECT * FROM jobs WHERE status = 'pending' "
+                "OR (status = 'running' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is not None:
+                self.connection.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, "
+                    "lease_expires = ?, started = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    (worker, now + self.lease_seconds, now, row["id"]),
+                )
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+
+        if row is None:
+            return None
+        return dict(
+            id=row["id"],
+            case=row["case_path"],
+            propeller=json.loads(row["propeller"]),
+            params=json.loads(row["params"]),
+            attempts=row["attempts"] + 1,
+        )
+
+    def _update_owned(self, job_id, worker, **values):
+        # only the owner of the lease can change the job
+        assignments = ", ".join("{} = ?".format(key) for key in values)
+        cursor = self.connection.execute(
+            "UPDATE jobs SET {} WHERE id = ? AND worker = ? "
+            "AND status = 'running'".format(assignments),
+            tuple(values.values()) + (job_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def renew(self, job_id, worker):
+        """Extend the lease of a running job.
+
+        :return: `False` if the job does not belong to `worker` anymore.
+        :rtype: bool
+        """
+        return self._update_owned(
+            job_id, worker, lease_expires=time.time() + self.lease_seconds
+        )
+
+    def complete(self, job_id, worker, elapsed, output_hashes):
+        """Mark a job as done.
+
+        :return: `False` if the job does not belong to `worker` anymore.
+        :rtype: bool
+        """
+        return self._update_owned(
+            job_id,
+            worker,
+            status="done",
+            finished=time.time(),
+            elapsed=elapsed,
+            error=None,
+            output_hashes=json.dumps(output_hashes, sort_keys=True),
+        )
+
+    def fail(self, job_id, worker, elapsed, error):
+        """Mark a job as failed.
+
+        :return: `False` if the job does not belong to `worker` anymore.
+        :rtype: bool
+        """
+        return self._update_owned(
+            job_id,
+            worker,
+            status="failed",
+            finished=time.time(),
+            elapsed=elapsed,
+            error=error,
+        )
+
+    def retry_failed(self):
+        """Make the failed jobs pending again.
+
+        :return: The number of jobs.
+        :rtype: int
+        """
+        return self.connection.execute(
+            "UPDATE jobs SET status = 'pending' WHERE status = 'failed'"
+        ).rowcount
+
+    def counts(self):
+        """The number of jobs in each status."""
+        counts = dict.fromkeys(job_statuses, 0)
+        for row in self.connection.execute(
+            "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+        ):
+            counts[row["status"]] = row["n"]
+        return counts
+
+    def job(self, job_id):
+        """All the recorded information about a job."""
+        row = self.connection.execute(
+            "SELECT * FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        job = dict(row)
+        job["propeller"] = json.loads(job["propeller"])
+        job["params"] = json.loads(job["params"])
+        if job["output_hashes"] is not None:
+            job["output_hashes"] = json.loads(job["output_hashes"])
+        return job
+
+
+def execute_job(job, default_params):
+    """Generate the case of a job, as `script.py` does for a single case.
+
+    :return: The digests of the files of the case (see :func:`hash_outputs`).
+    :rtype: dict
+    """
+    params = dict(default_params)
+    params.update(job["params"])
+    generate_case(job["case"], job["propeller"], params)
+    return hash_outputs(job["case"], case_files(job["case"]))
+
+
+def _keep_lease(path, lease_seconds, job_id, worker, stop):
+    # a connection for this thread only
+    with JobQueue(path, lease_seconds) as queue:
+        while not stop.wait(lease_seconds / 3):
+            if not queue.renew(job_id, worker):
+                return
+
+
+def run_worker(
+    path, default_params, worker=None, lease_seconds=3600, log=print
+):
+    """Claim and execute jobs until the queue is empty. The lease of the
+    running job is renewed in the background.
+
+    :param path: The path of the SQLite database.
+    :type path: str
+    :param default_params: The parameters used for the values which are not
+        overridden by the jobs.
+    :type default_params: dict
+    :param worker: The name of the worker, defaults to `hostname:pid`.
+    :type worker: str, optional
+    :param lease_seconds: The duration of the leases.
+    :type lease_seconds: float, optional
+    :return: The number of jobs executed.
+    :rtype: int
+    """
+    if worker is None:
+        worker = default_worker_name()
+
+    executed = 0
+    with JobQueue(path, lease_seconds) as queue:
+        while (job := queue.claim(worker)) is not None:
+            stop = threading.Event()
+            keeper = threading.Thread(
+                target=_keep_lease,
+                args=(path, lease_seconds, job["id"], worker, stop),
+                daemon=True,
+            )
+            keeper.start()
+
+            start = time.perf_counter()
+            try:
+                hashes = execute_job(job, default_params)
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                error = "{}: {}".format(type(e).__name__, e)
+                queue.fail(job["id"], worker, elapsed, error)
+                log("Job {} failed: {}".format(job["id"], error))
+            else:
+                elapsed = time.perf_counter() - start
+                queue.complete(job["id"], worker, elapsed, hashes)
+                log("Job {} done in {:.3f}s".format(job["id"], elapsed))
+            finally:
+                stop.set()
+                keeper.join()
+            executed += 1
+    return executed
+
+
+if __name__ == "__main__":
+    import params
+
+    parser = argparse.ArgumentParser(prog="python3 -m src.job_queue")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add")
+    add_parser.add_argument("database")
+    add_parser.add_argument("case")
+    add_parser.add_argument("propeller", nargs="+")
+    add_parser.add_argument(
+        "--set", dest="overrides", action="append", default=[]
+    )
+
+    work_parser = subparsers.add_parser("work")
+    work_parser.add_argument("database")
+    work_parser.add_argument("--lease", type=float, default=3600)
+
+    status_parser = subparsers.add_parser("status")
+    status_parser.add_argument("database")
+
+    args = parser.parse_args()
+    if args.command == "add":
+        with JobQueue(args.database) as queue:
+            job_id = queue.add(
+                args.case, args.propeller, parse_overrides(args.overrides)
+            )
+        print("Job {}".format(job_id))
+    elif args.command == "work":
+        run_worker(
+            args.database, params_from_module(params), lease_seconds=args.lease
+        )
+    else:
+        with JobQueue(args.database) as queue:
+            print(json.dumps(queue.counts()))
@@ -0,0 +1,299 @@
+import numpy as np
+from smithers.io.obj import WavefrontOBJ
+from smithers.io.stlhandler import STLHandler
+
+
+def format_floats(values, separator=" "):
+    """Format numbers with a fixed representation: the shortest decimal
+    string which round-trips the value as a double (`repr` of a Python
+    `float`), therefore the output does not depend on the type of the values
+    (e.g. NumPy scalars) or on the version of NumPy.
+
+    :param values: A sequence of numbers (or an array, flattened).
+    :type values: iterable
+    :param separator: The separator between the values.
+    :type separator: str, optional
+    :rtype: str
+    """
+    return separator.join(
+        map(repr, np.asarray(values, dtype=np.float64).ravel().tolist())
+    )
+
+
+def obj_bytes(obj):
+    """Serialize a `WavefrontOBJ` (or a :class:`TriMesh`) to the same bytes
+    written by `smithers.io.obj.ObjHandler.write`, without touching the
+    disk.
+
+    :param obj: The OBJ data.
+    :type obj: WavefrontOBJ
+    :rtype: bytes
+    """
+    if isinstance(obj, TriMesh):
+        obj = obj.to_obj()
+
+    lines = ["# Wavefront OBJ file", "# Regions:"]
+    lines.extend(
+        "#     {}    {}".format(idx, name) for idx, name in enumerate(obj.regions)
+    )
+    lines.append("#")
+    lines.append("# points    : {}".format(len(obj.vertices)))
+    lines.append("# triangles : {}".format(len(obj.polygons)))
+    lines.append("#")
+
+    lines.extend(
+        "v " + format_floats(vertex)
+        for vertex in np.asarray(obj.vertices, dtype=np.float64)
+    )
+    lines.extend("vn " + format_floats(normal) for normal in obj.normals)
+
+    # the index of the first polygon of each region
+    changes = dict(obj.regions_change_indexes)
+    for idx, polygon in enumerate(np.asarray(obj.polygons).tolist()):
+        if idx in changes:
+            lines.append("g {}".format(obj.regions[changes[idx]]))
+        lines.append("f {} {} {}".format(*polygon))
+
+    return ("\n".join(lines) + "\n").encode()
+
+
+def fan_triangles(indices, counts):
+    """Split polygons into triangles which share their first vertex (a
+    polygon with n vertices gives n - 2 triangles).
+
+    :param indices: The vertices of all the polygons, one after the other.
+    :type indices: np.ndarray
+    :param counts: The number of vertices of each polygon.
+    :type counts: np.ndarray
+    :return: A 2-tuple: a 2D array of triangles, and the index of the first
+        triangle of each polygon (plus the number of triangles).
+    :rtype: tuple
+    """
+    starts = np.cumsum(counts) - counts
+    n_of_triangles = counts - 2
+    first_triangles = np.concatenate([[0], np.cumsum(n_of_triangles)])
+    polygon = np.repeat(np.arange(len(counts)), n_of_triangles)
+    # the index of each triangle inside its polygon
+    k = np.arange(first_triangles[-1]) - first_triangles[polygon]
+    first = starts[polygon]
+    triangles = np.stack(
+        [indices[first], indices[first + k + 1], indices[first + k + 2]],
+        axis=1,
+    )
+    return triangles, first_triangles
+
+
+class TriMesh:
+    """A compact triangulated surface: contiguous vertices (`float32` by
+    default) and 0-based triangles (`int32`), plus the regions as offsets
+    (the index of the first triangle of each region).
+
+    The bounding box is computed in double precision from the original
+    coordinates when the mesh is created, therefore it does not depend on
+    `dtype`. Use :meth:`promote` for other precision-critical computations.
+    """
+
+    __slots__ = (
+        "vertices",
+        "faces",
+        "region_names",
+        "region_offsets",
+        "bounds",
+    )
+
+    def __init__(
+        self,
+        vertices,
+        faces,
+        region_names=(),
+        region_offsets=None,
+        dtype=np.float32,
+    ):
+        """
+        :param vertices: A 2D array of vertices.
+        :type vertices: np.ndarray
+        :param faces: A 2D array of 0-based triangles.
+        :type faces: np.ndarray
+        :param region_names: The name of each region, in the order in which
+            the regions appear in `faces` (a name may be repeated).
+        :type region_names: list, optional
+        :param region_offsets: The index of the first triangle of each
+            region, defaults to a single region which starts at 0 (or no
+            region if `region_names` is empty).
+        :type region_offsets: np.ndarray, optional
+        :param dtype: The type of the vertices, defaults to `np.float32`.
+        :type dtype: np.dtype, optional
+        """
+        vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        self.bounds = np.stack([vertices.min(axis=0), vertices.max(axis=0)])
+        self.vertices = np.ascontiguousarray(vertices, dtype=dtype)
+        self.faces = np.ascontiguousarray(
+            np.asarray(faces).reshape(-1, 3), dtype=np.int32
+        )
+
+        self.region_names = list(region_names)
+        if region_offsets is None:
+            region_offsets = [0] if self.region_names else []
+        self.region_offsets = np.asarray(region_offsets, dtype=np.int32)
+        if len(self.region_offsets) != len(self.region_names):
+            raise ValueError("Expected an offset for each region.")
+
+    @classmethod
+    def from_obj(cls, obj, dtype=np.float32):
+        """Build a mesh from a `WavefrontOBJ` (1-based polygons)."""
+        return cls(
+            obj.vertices,
+            np.asarray(obj.polygons, dtype=np.int64) - 1,
+            region_names=[
+                obj.regions[idx] for _, idx in obj.regions_change_indexes
+            ],
+            region_offsets=[start for start, _ in obj.regions_change_indexes],
+            dtype=dtype,
+        )
+
+    @classmethod
+    def read(cls, path, dtype=np.float32):
+        """Read an OBJ or STL file. The OBJ parser understands the same
+        subset of the format of `smithers` (vertices, polygons, regions
+        declared in the header and started by `g`), converting all the
+        coordinates and the indices at once. The polygons are split into
+        triangles (see :func:`fan_triangles`).
+
+        :raises ValueError: If a face has less than 3 vertices.
+        """
+        extension = path.split(".")[-1]
+        if extension == "stl":
+            data = STLHandler.read(path)
+            return cls(data["points"], data["cells"], dtype=dtype)
+        elif extension != "obj":
+            raise ValueError(
+                "Files of type {} are not supported at the moment".format(
+                    extension
+                )
+            )
+
+        with open(path, "r") as f:
+            lines = f.read().splitlines()
+
+        declared = []
+        region_names = []
+        region_offsets = []
+        vertex_lines = []
+        face_lines = []
+        for line in lines:
+            if line.startswith("v "):
+                vertex_lines.append(line[2:])
+            elif line.startswith("f "):
+                face_lines.append(line[2:])
+            elif line.startswith("g "):
+                name = line.split()[1]
+                if declared and name not in declared:
+                    raise ValueError("Undeclared region {}".format(name))
+                region_names.append(name)
+                region_offsets.append(len(face_lines))
+            elif line.startswith("#"):
+                tokens = line.split()
+                # the header, e.g. "#     0    propellerTip"
+                if len(tokens) >= 3 and tokens[1].isnumeric():
+                    declared.append(tokens[2])
+
+        vertices = np.array(" ".join(vertex_lines).split(), dtype=np.float64)
+        face_text = " ".join(face_lines)
+        if "/" in face_text:
+            # only the index of the vertex, e.g. "f 1/1/1 2/2/2 3/3/3"
+            face_text = " ".join(
+                token.split("/")[0] for token in face_text.split()
+            )
+        indices = np.array(face_text.split(), dtype=np.int64) - 1
+
+        counts = np.array(
+            [len(line.split()) for line in face_lines], dtype=np.int64
+        )
+        if np.any(counts < 3):
+            raise ValueError(
+                "The face {} has less than 3 vertices".format(
+                    np.flatnonzero(counts < 3)[0] + 1
+                )
+            )
+        if np.all(counts == 3):
+            faces = indices
+        else:
+            faces, first_triangles = fan_triangles(indices, counts)
+            region_offsets = first_triangles[region_offsets]
+
+        return cls(
+            vertices,
+            faces,
+            region_names=region_names,
+            region_offsets=region_offsets,
+            dtype=dtype,
+        )
+
+    def to_obj(self):
+        """A `WavefrontOBJ` (double precision, 1-based polygons) which can be
+        written with `smithers.io.obj.ObjHandler.write`."""
+        obj = WavefrontOBJ()
+        obj.vertices = self.vertices.astype(np.float64)
+        obj.polygons = self.faces + 1
+        for start, name in zip(self.region_offsets, self.region_names):
+            if name not in obj.regions:
+                obj.regions.append(name)
+            obj.regions_change_indexes.append(
+                (int(start), obj.regions.index(name))
+            )
+        return obj
+
+    def promote(self):
+        """A copy of the mesh whose vertices are `float64`."""
+        return self.transformed(scale=1, translation=0, dtype=np.float64)
+
+    def transformed(self, scale=1, translation=0, dtype=None):
+        """A copy of the mesh whose vertices are `vertices * scale +
+        translation`. The triangles are shared (not copied).
+        """
+        if dtype is None:
+            dtype = self.vertices.dtype
+        vertices = self.vertices.astype(np.float64) * scale + translation
+        mesh = TriMesh.__new__(TriMesh)
+        mesh.bounds = np.sort(self.bounds * scale + translation, axis=0)
+        mesh.vertices = np.ascontiguousarray(vertices, dtype=dtype)
+        mesh.faces = self.faces
+        mesh.region_names = list(self.region_names)
+        mesh.region_offsets = self.region_offsets
+        return mesh
+
+    def with_regions(self, region_names, region_offsets, order=None):
+        """A copy of the mesh with different regions. If `order` is given
+        the triangles are reordered accordingly."""
+        mesh = TriMesh.__new__(TriMesh)
+        mesh.bounds = self.bounds
+        mesh.vertices = self.vertices
+        mesh.faces = self.faces if order is None else self.faces[order]
+        mesh.region_names = list(region_names)
+        mesh.region_offsets = np.asarray(region_offsets, dtype=np.int32)
+        return mesh
+
+    def face_regions(self):
+        """The index (in `region_names`) of the region of each triangle."""
+        # -1 for the triangles which precede the first region
+        regions = np.full(len(self.faces), -1)
+        ends = np.append(self.region_offsets[1:], len(self.faces))
+        for idx, (start, end) in enumerate(zip(self.region_offsets, ends)):
+            regions[start:end] = idx
+        return regions
+
+    @property
+    def dimension(self):
+        return self.bounds[1] - self.bounds[0]
+
+    @property
+    def nbytes(self):
+        return (
+            self.vertices.nbytes
+            + self.faces.nbytes
+            + self.region_offsets.nbytes
+            + self.bounds.nbytes
+        )
+
+    def __len__(self):
+        return len(self.faces)
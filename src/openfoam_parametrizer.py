@@ -1,3 +1,5 @@
+from functools import lru_cache
+from itertools import combinations
 from pathlib import Path
 from operator import itemgetter
 from src.steroid_dict import SteroidDict
@@ -30,7 +32,14 @@ geometry_member_template = """    @cylinder_names_noouter
             }
         }
     }"""
-geometry_fullstring = """@geometry_member
+searchable_geometry_member_template = """    @cylinder_names_noouter
+    {
+        type        searchableCylinder;
+        point1      (@cylinder_point1);
+        point2      (@cylinder_point2);
+        radius      @cylinder_radius;
+    }"""
+geometry_fullstring = """@cylinder_geometry
     outerCylinder
     {
         type        triSurfaceMesh;
@@ -51,46 +60,68 @@ geometry_fullstring = """@geometry_member
             }
         }
     }
-    propeller
+@propeller_geometry@propeller_lod_geometry"""
+
+propeller_geometry_member_template = """    @propeller_names
     {
         type        triSurfaceMesh;
-        file        "propeller.obj";
+        file        "@propeller_names.obj";
         regions
         {
             propellerStem
             {
-                 name       propellerStem;
+                 name       @{propeller_names}Stem;
             }
             propellerTip
             {
-                 name       propellerTip;
+                 name       @{propeller_names}Tip;
             }
         }
     }"""
 
-refinement_regions_template = """        @cylinder_names
+propeller_lod_geometry_member_template = """    @propeller_lod_names
+    {
+        type        triSurfaceMesh;
+        file        "@propeller_lod_names.obj";
+    }"""
+
+refinement_regions_template = """        @refinement_region_names
         {
             mode        @refinement_regions_mode;
-            levels      ((@refinement_regions_distance @refinement_values));
+            levels      ((@refinement_regions_distance @refinement_region_values));
+        }"""
+propeller_lod_refinement_regions_template = """        @propeller_lod_names
+        {
+            mode        distance;
+            levels      ((@propeller_lod_distances @propeller_lod_levels));
         }"""
-refinement_regions_fullstring = "@refinement_regions_list"
+refinement_regions_fullstring = (
+    "@refinement_regions_list@propeller_lod_refinement_regions"
+)
 
 features_fullstring = """        {
             file        "outerCylinder.eMesh";
             level       2;
         }
-        {
-            file        "propeller.eMesh";
+@propeller_features"""
+
+propeller_features_member_template = """        {
+            file        "@propeller_features_names.eMesh";
             level       4;
         }"""
 
-refinement_surfaces_fullstring = """        cylinder0
+cellzone_surfaces_member_template = """        @cellzone_cylinder_names
         {
             level   (0 0);
-            cellZone    cylinder0;
-            faceZone    cylinder0;
+            cellZone    @cellzone_cylinder_names;
+            faceZone    @cellzone_cylinder_names;
             cellZoneInside  inside;
-        }
+        }"""
+propeller_surfaces_member_template = """        @propeller_names
+        {
+            level   (@propeller_min_surf_ref @propeller_max_surf_ref);
+        }"""
+refinement_surfaces_fullstring = """@cellzone_surfaces
         outerCylinder
         {
             level   (@outer_cylinder_min_surf_ref @outer_cylinder_max_surf_ref);
@@ -114,39 +145,168 @@ refinement_surfaces_fullstring = """        cylinder0
                 }
             }
         }
-        propeller
-        {
-            level   (@propeller_min_surf_ref @propeller_max_surf_ref);
-        }"""
+@propeller_surfaces"""
 
 location_in_mesh_fullstring = "@location_in_mesh"
 
 block_mesh_dimensions_member_template = "    (@block_mesh_point_x @block_mesh_point_y @block_mesh_point_z)"
 block_mesh_dimensions_fullstring = """@block_mesh_dimensions_members"""
+block_mesh_blocks_fullstring = "hex (0 1 2 3 4 5 6 7) (@block_mesh_cells) simpleGrading (@block_mesh_simple_grading)"
 
-dictionary = SteroidDict()
-dictionary["cylinder_names_noouter"] = lambda dc: dc["cylinder_names"][:-1]
-dictionary.set_computable_template(
+# the computed values and the defaults, shared by every case rendered in this
+# process. It is never modified after the import: each case renders with its
+# own copy of the values (see `CaseRenderer`)
+definitions = SteroidDict()
+definitions["cylinder_names_noouter"] = lambda dc: dc["cylinder_names"][:-1]
+definitions.set_computable_template(
     "geometry_member", geometry_member_template, repetable=True
 )
-dictionary.set_computable_template(
+definitions.set_computable_template(
+    "searchable_geometry_member",
+    searchable_geometry_member_template,
+    repetable=True,
+)
+# analytic cylinders (searchableCylinder) instead of the OBJ files
+definitions["cylinder_geometry"] = lambda dc: (
+    dc["searchable_geometry_member"]
+    if dc["analytic_cylinders"]
+    else dc["geometry_member"]
+)
+definitions.set_computable_template(
     "refinement_regions_list", refinement_regions_template, repetable=True
 )
-dictionary.set_computable_template(
+definitions.set_computable_template(
     "block_mesh_dimensions_members", block_mesh_dimensions_member_template, repetable=True
 )
+definitions.set_computable_template(
+    "propeller_geometry", propeller_geometry_member_template, repetable=True
+)
+definitions.set_computable_template(
+    "propeller_features", propeller_features_member_template, repetable=True
+)
+definitions.set_computable_template(
+    "cellzone_surfaces", cellzone_surfaces_member_template, repetable=True
+)
+definitions.set_computable_template(
+    "propeller_surfaces", propeller_surfaces_member_template, repetable=True
+)
+definitions.set_computable_template(
+    "propeller_lod_geometry_members",
+    propeller_lod_geometry_member_template,
+    repetable=True,
+)
+definitions.set_computable_template(
+    "propeller_lod_refinement_regions_members",
+    propeller_lod_refinement_regions_template,
+    repetable=True,
+)
+# empty when there are no levels of detail of the propeller
+definitions["propeller_lod_geometry"] = lambda dc: (
+    "\n" + dc["propeller_lod_geometry_members"]
+    if dc["propeller_lod_names"]
+    else ""
+)
+definitions["propeller_lod_refinement_regions"] = lambda dc: (
+    "\n" + dc["propeller_lod_refinement_regions_members"]
+    if dc["propeller_lod_names"]
+    else ""
+)
+definitions["analytic_cylinders"] = False
+definitions["block_mesh_cells"] = None
+definitions["block_mesh_simple_grading"] = "1 1 1"
+definitions["propeller_lod_names"] = []
+definitions["propeller_lod_distances"] = []
+definitions["propeller_lod_levels"] = []
+definitions["propeller_names"] = ["propeller"]
+definitions["propeller_features_names"] = ["propeller"]
+definitions["cellzone_cylinder_names"] = ["cylinder0"]
+
+# the keys on which the computed values of `definitions` depend
+computed_dependencies = {
+    "cylinder_names_noouter": {"cylinder_names"},
+    "geometry_member": set(
+        CaseTemplate(geometry_member_template).get_identifiers()
+    ),
+    "searchable_geometry_member": set(
+        CaseTemplate(searchable_geometry_member_template).get_identifiers()
+    ),
+    "cylinder_geometry": {
+        "analytic_cylinders",
+        "geometry_member",
+        "searchable_geometry_member",
+    },
+    "refinement_regions_list": set(
+        CaseTemplate(refinement_regions_template).get_identifiers()
+    ),
+    "block_mesh_dimensions_members": set(
+        CaseTemplate(block_mesh_dimensions_member_template).get_identifiers()
+    ),
+    "propeller_geometry": set(
+        CaseTemplate(propeller_geometry_member_template).get_identifiers()
+    ),
+    "propeller_features": set(
+        CaseTemplate(propeller_features_member_template).get_identifiers()
+    ),
+    "cellzone_surfaces": set(
+        CaseTemplate(cellzone_surfaces_member_template).get_identifiers()
+    ),
+    "propeller_surfaces": set(
+        CaseTemplate(propeller_surfaces_member_template).get_identifiers()
+    ),
+    "propeller_lod_geometry_members": set(
+        CaseTemplate(propeller_lod_geometry_member_template).get_identifiers()
+    ),
+    "propeller_lod_refinement_regions_members": set(
+        CaseTemplate(
+            propeller_lod_refinement_regions_template
+        ).get_identifiers()
+    ),
+    "propeller_lod_geometry": {
+        "propeller_lod_names",
+        "propeller_lod_geometry_members",
+    },
+    "propeller_lod_refinement_regions": {
+        "propeller_lod_names",
+        "propeller_lod_refinement_regions_members",
+    },
+}
+
+# the dependencies of the computed values which choose between other values,
+# given the values of a case
+selected_dependencies = {
+    "cylinder_geometry": lambda dc: {
+        "analytic_cylinders",
+        "searchable_geometry_member"
+        if dc["analytic_cylinders"]
+        else "geometry_member",
+    },
+    "propeller_lod_geometry": lambda dc: {"propeller_lod_names"}
+    | ({"propeller_lod_geometry_members"} if dc["propeller_lod_names"] else set()),
+    "propeller_lod_refinement_regions": lambda dc: {"propeller_lod_names"}
+    | (
+        {"propeller_lod_refinement_regions_members"}
+        if dc["propeller_lod_names"]
+        else set()
+    ),
+}
 
+# the last item is the key which enables the replacement (None means always),
+# if the value of the key is empty the section of the template is kept
 full_strings = [
-    ('geometry', '{', geometry_fullstring),
-    ('refinementRegions', '{', refinement_regions_fullstring),
-    ('features', '(', features_fullstring),
-    ('refinementSurfaces', '{', refinement_surfaces_fullstring),
-    ('locationInMesh', '(', location_in_mesh_fullstring),
-    ('vertices', '(', block_mesh_dimensions_fullstring),
+    ('geometry', '{', geometry_fullstring, None),
+    ('refinementRegions', '{', refinement_regions_fullstring, None),
+    ('features', '(', features_fullstring, None),
+    ('refinementSurfaces', '{', refinement_surfaces_fullstring, None),
+    ('locationInMesh', '(', location_in_mesh_fullstring, None),
+    ('vertices', '(', block_mesh_dimensions_fullstring, None),
+    ('blocks', '(', block_mesh_blocks_fullstring, 'block_mesh_cells'),
 ]
+optional_full_strings = frozenset(t[3] for t in full_strings if t[3])
 
-def write_full_strings(s):
+def write_full_strings(s, enabled=frozenset()):
     for t in full_strings:
+        if t[3] is not None and t[3] not in enabled:
+            continue
         try:
             bounds = find_balanced(s, t[0], t[1])
         except ValueError:
@@ -156,24 +316,184 @@ def write_full_strings(s):
             s = s[:bounds[0]] + t[2] + s[bounds[1]:]
     return s
 
-def write(dc, file, destination):
-    s = file.read_text()
-    s = write_full_strings(s)
+@lru_cache(maxsize=64)
+def parse_template(s, enabled=frozenset()):
+    return CaseTemplate(write_full_strings(s, enabled))
+
+def enabled_full_strings(dc):
+    return frozenset(key for key in optional_full_strings if dc[key])
+
+def template_dependencies(s):
+    """Return the set of keys of the dictionary on which the rendering of the
+    template `s` depends, including the keys used by computed values."""
+    pending = set(
+        parse_template(s, optional_full_strings).get_identifiers()
+    )
+    pending.update(optional_full_strings)
+    dependencies = set()
+    while pending:
+        key = pending.pop()
+        if key not in dependencies:
+            dependencies.add(key)
+            pending.update(computed_dependencies.get(key, ()))
+    return dependencies
+
+def missing_values(s, dc):
+    """Return the set of keys without a value in `dc` which are needed to
+    render the template `s`, including the keys used by the computed values
+    (e.g. inside the repeatable templates, which are rendered as empty text
+    when a key is missing)."""
+    pending = set(parse_template(s, enabled_full_strings(dc)).get_identifiers())
+    visited = set()
+    missing = set()
+    while pending:
+        key = pending.pop()
+        if key in visited:
+            continue
+        visited.add(key)
+        if key in selected_dependencies:
+            pending.update(selected_dependencies[key](dc))
+        elif key in computed_dependencies:
+            pending.update(computed_dependencies[key])
+        elif key not in dc:
+            missing.add(key)
+    return missing
+
+def render(dc, file, text=None):
+    # `text` is the content of `file`, if it was already read
+    if text is None:
+        text = file.read_text()
+    template = parse_template(text, enabled_full_strings(dc))
+    return template.substitute(dc)
+
+def rendered_path(file):
+    # remove the .tmpl extension, relative to the root of the case
+    return file.parent.name + "/" + file.name.split(".")[0]
 
-    template = CaseTemplate(s)
+def write(dc, file, destination):
     # write the modifications to the file
-    content = template.substitute(dc)
-    # remove the .tmpl extension
-    file = file.with_name(file.name.split(".")[0])
+    content = render(dc, file)
     # write the new file to the destination
-    (destination / file.parent.name / file.name).write_text(content)
+    (destination / rendered_path(file)).write_text(content)
+
+class CaseRenderer:
+    """Renders the parametrized files of a single case. The renderer owns
+    its values, while the computed templates are shared with every other
+    renderer (see `definitions`), therefore many cases can be rendered
+    concurrently in one process.
+    """
+
+    def __init__(self, **kwargs):
+        """The keyword arguments are the values used to render the
+        templates, they override the defaults in `definitions`.
+        """
+        self.context = definitions.with_values(kwargs)
+
+    def render(self, file, text=None):
+        """Render the template at `file` (whose content is `text`, if it was
+        already read) and return the result."""
+        return render(self.context, file, text)
+
+    def write(self, file, destination):
+        """Render the template at `file` into `destination`."""
+        write(self.context, file, destination)
+
+def render_openfoam_configuration_dicts(
+    destination, files=None, templates=None, **kwargs
+):
+    """Render the parametrized files of the OpenFOAM case in `destination`
+    in memory. The templates are read from `destination`, unless their
+    texts are in `templates` (see `load_templates`).
+
+    :return: A generator of 2-tuples: the path of the file (relative to
+        `destination`) and its content.
+    :rtype: generator
+    """
+    if isinstance(destination, str):
+        destination = Path(destination)
+    if files is None:
+        files = parametrized_files
+
+    if templates is None:
+        templates = {}
+
+    renderer = CaseRenderer(**kwargs)
+    for path in files:
+        file = destination / path
+        yield rendered_path(file), renderer.render(
+            file, templates.get(path)
+        ).encode()
+
+def load_templates(destination, files=None):
+    """Read and parse in advance the parametrized files of the OpenFOAM case
+    in `destination`, with every combination of the optional replacements:
+    the parsed templates are cached (see `parse_template`), and the texts
+    can be passed to `render_openfoam_configuration_dicts`, therefore the
+    rendering does not need to wait for them.
+
+    :return: A dictionary which maps the path of each file to its text.
+    :rtype: dict
+    """
+    if isinstance(destination, str):
+        destination = Path(destination)
+    if files is None:
+        files = parametrized_files
 
-def generate_openfoam_configuration_dicts(destination, **kwargs):
+    keys = sorted(optional_full_strings)
+    texts = {}
+    for path in files:
+        texts[path] = (destination / path).read_text()
+        for n in range(len(keys) + 1):
+            for enabled in combinations(keys, n):
+                parse_template(texts[path], frozenset(enabled))
+    return texts
+
+
+def generate_openfoam_configuration_dicts(destination, files=None, **kwargs):
+    """Render the parametrized files of the OpenFOAM case in `destination`.
+
+    `files` is an optional subset of `parametrized_files`, by default all of
+    them are rendered. The keyword arguments are the values used to render
+    the templates.
+    """
     if isinstance(destination, str):
         destination = Path(destination)
+    if files is None:
+        files = parametrized_files
+
+    renderer = CaseRenderer(**kwargs)
+    for path in files:
+        renderer.write(destination / path, destination)
 
-    dictionary.update(kwargs)
+def find_template_errors(destination, files=None, **kwargs):
+    """Render the parametrized files of the OpenFOAM case in `destination` in
+    memory, without writing anything, and collect the errors (e.g. a
+    placeholder `@name` without a value, also inside the repeatable
+    templates, see `missing_values`).
 
-    for path in parametrized_files:
+    :return: A dictionary which maps the path of each file which cannot be
+        rendered to a description of the error.
+    :rtype: dict
+    """
+    if isinstance(destination, str):
+        destination = Path(destination)
+    if files is None:
+        files = parametrized_files
+
+    renderer = CaseRenderer(**kwargs)
+    errors = {}
+    for path in files:
         file = destination / path
-        write(dictionary, file, destination)
+        try:
+            missing = missing_values(file.read_text(), renderer.context)
+            if missing:
+                errors[path] = "no value for {}".format(
+                    ", ".join("@" + key for key in sorted(missing))
+                )
+            else:
+                renderer.render(file)
+        except KeyError as e:
+            errors[path] = "no value for @{}".format(e.args[0])
+        except (OSError, ValueError) as e:
+            errors[path] = "{}: {}".format(type(e).__name__, e)
+    return errors
@@ -0,0 +1,275 @@
+"""Generation of a case as a graph of stages executed concurrently.
+
+:func:`src.case.generate_case` executes its steps one after the other, while
+many of them are independent: the copy of the propeller, the computation of
+the geometry and the loading of the templates need nothing from each other,
+and the cylinders, the surfaces of the propeller and the dictionaries only
+need the geometry. :func:`run_stages` executes each stage of a dependency
+graph in an executor (threads by default) as soon as its dependencies are
+done, therefore the latency of a case approaches the longest chain of stages
+rather than the sum of all of them.
+
+The files are the same written by :func:`src.case.generate_case`.
+"""
+
+import asyncio
+import shutil
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from src.case import (
+    body_names,
+    case_outputs,
+    compute_case_geometry,
+    correct_location_in_mesh,
+    read_propeller_info,
+    render_outputs,
+    write_case_files,
+)
+from src.openfoam_parametrizer import load_templates, parametrized_files
+
+# a function and the names of the stages whose results are its arguments
+Stage = namedtuple("Stage", ["function", "dependencies"])
+
+# the stages of `case_stages` which write files
+writing_stages = (
+    "copy_propellers",
+    "propeller_surfaces",
+    "cylinders",
+    "dictionaries",
+)
+
+
+def stage_order(stages):
+    """A topological order of the stages (each stage comes after its
+    dependencies), ties are broken by the order of `stages`.
+
+    :param stages: A dictionary which maps the name of each stage to a
+        :class:`Stage`.
+    :type stages: dict
+    :raises ValueError: If a dependency is unknown or the graph has a cycle.
+    :rtype: list
+    """
+    for name, stage in stages.items():
+        unknown = [dep for dep in stage.dependencies if dep not in stages]
+        if unknown:
+            raise ValueError(
+                "Unknown dependencies {} of the stage {}".format(unknown, name)
+            )
+
+    order = []
+    done = set()
+    while len(order) < len(stages):
+        ready = [
+            name
+            for name, stage in stages.items()
+            if name not in done
+            and all(dep in done for dep in stage.dependencies)
+        ]
+        if not ready:
+            raise ValueError(
+                "The stages {} have cyclic dependencies".format(
+                    [name for name in stages if name not in done]
+                )
+            )
+        order.extend(ready)
+        done.update(ready)
+    return order
+
+
+async def run_stages(stages, executor=None, timings=None):
+    """Execute a graph of stages: each stage is executed in `executor` as
+    soon as all its dependencies are done, with their results as arguments.
+    If a stage fails, the stages which did not start are cancelled and the
+    exception is raised.
+
+    :param stages: A dictionary which maps the name of each stage to a
+        :class:`Stage`.
+    :type stages: dict
+    :param executor: A `concurrent.futures.Executor`, defaults to the default
+        executor of the event loop (threads).
+    :type executor: concurrent.futures.Executor, optional
+    :param timings: If given, the start and the end of each stage (seconds,
+        see `time.perf_counter`) are stored into it.
+    :type timings: dict, optional
+    :return: A dictionary which maps the name of each stage to its result.
+    :rtype: dict
+    """
+    loop = asyncio.get_running_loop()
+    tasks = {}
+
+    async def run(name):
+        stage = stages[name]
+        arguments = [await tasks[dep] for dep in stage.dependencies]
+        start = time.perf_counter()
+        result = await loop.run_in_executor(
+            executor, stage.function, *arguments
+        )
+        if timings is not None:
+            timings[name] = (start, time.perf_counter())
+        return result
+
+    for name in stage_order(stages):
+        tasks[name] = asyncio.ensure_future(run(name))
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        # wait for the stages which are running, their executor cannot stop
+        # them
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+    return {name: task.result() for name, task in tasks.items()}
+
+
+def case_stages(openfoam_folder, propeller_path, params, outputs=None):
+    """The stages of the generation of a case (see
+    :func:`src.case.generate_case`):
+
+    + `propeller_info`, `copy_propellers` and `templates` (reading and
+      parsing the templates, see
+      :func:`src.openfoam_parametrizer.load_templates`) need nothing;
+    + `geometry` needs `propeller_info`;
+    + `propeller_surfaces` (welded propellers, levels of detail and feature
+      edges) and `cylinders` need `geometry`;
+    + `dictionaries` needs `geometry` and `templates`.
+
+    :return: A dictionary which maps the name of each stage to a
+        :class:`Stage`. The result of `geometry` is the geometry of the case,
+        the results of the stages which write files are the relative paths
+        of the files written.
+    :rtype: dict
+    """
+    if outputs is None:
+        outputs = case_outputs
+    if isinstance(propeller_path, (str, Path)):
+        propeller_path = [propeller_path]
+    propeller_path = [str(path) for path in propeller_path]
+    # the propellers are copied as they are, unless they are welded
+    copy = (
+        "propeller" in outputs
+        and params.get("propeller_weld_tolerance") is None
+    )
+
+    def geometry(propeller_info):
+        geometry = compute_case_geometry(propeller_info, params)
+        correct_location_in_mesh(
+            geometry, propeller_path, propeller_info, params
+        )
+        geometry["propeller_welding"] = {}
+        return geometry
+
+    def copy_propellers():
+        copied = []
+        if not copy:
+            return copied
+        tri_surface = Path(openfoam_folder) / "constant" / "triSurface"
+        tri_surface.mkdir(parents=True, exist_ok=True)
+        for body, path in zip(
+            # the same names assigned by compute_case_geometry
+            body_names(len(propeller_path)),
+            propeller_path,
+        ):
+            target = tri_surface / (body + ".obj")
+            copied.append("constant/triSurface/" + body + ".obj")
+            if target.exists() and target.samefile(path):
+                continue
+            # a link to a shared file must not be modified
+            if target.is_symlink() or (
+                target.exists() and target.stat().st_nlink > 1
+            ):
+                target.unlink()
+            shutil.copyfile(path, str(target))
+        return copied
+
+    def write_outputs(selected):
+        selected = [output for output in selected if output in outputs]
+
+        def write(propeller_info, geometry, templates=None):
+            if not selected:
+                return []
+            return write_case_files(
+                openfoam_folder,
+                render_outputs(
+                    openfoam_folder,
+                    propeller_path,
+                    propeller_info,
+                    geometry,
+                    params,
+                    selected,
+                    templates,
+                ),
+            )
+
+        return write
+
+    surfaces = ["propeller_lods", "feature_edges"]
+    if not copy:
+        surfaces.insert(0, "propeller")
+    dictionaries = [path for path in parametrized_files if path in outputs]
+
+    return dict(
+        propeller_info=Stage(
+            lambda: [read_propeller_info(path) for path in propeller_path], ()
+        ),
+        copy_propellers=Stage(copy_propellers, ()),
+        templates=Stage(
+            lambda: load_templates(openfoam_folder, dictionaries), ()
+        ),
+        geometry=Stage(geometry, ("propeller_info",)),
+        propeller_surfaces=Stage(
+            write_outputs(surfaces), ("propeller_info", "geometry")
+        ),
+        cylinders=Stage(
+            write_outputs(["cylinders"]), ("propeller_info", "geometry")
+        ),
+        dictionaries=Stage(
+            write_outputs(dictionaries),
+            ("propeller_info", "geometry", "templates"),
+        ),
+    )
+
+
+async def generate_case_async(
+    openfoam_folder,
+    propeller_path,
+    params,
+    outputs=None,
+    executor=None,
+    written=None,
+):
+    """Generate a case as :func:`src.case.generate_case` does, executing the
+    independent stages concurrently (see :func:`case_stages`).
+
+    :param written: If given, the relative paths of the files written are
+        appended to it.
+    :type written: list, optional
+    :return: The geometry of the case.
+    :rtype: dict
+    """
+    results = await run_stages(
+        case_stages(openfoam_folder, propeller_path, params, outputs),
+        executor,
+    )
+    if written is not None:
+        for name in writing_stages:
+            written.extend(results[name])
+    return results["geometry"]
+
+
+def generate_case_pipelined(
+    openfoam_folder,
+    propeller_path,
+    params,
+    outputs=None,
+    executor=None,
+    written=None,
+):
+    """The synchronous version of :func:`generate_case_async`."""
+    return asyncio.run(
+        generate_case_async(
+            openfoam_folder, propeller_path, params, outputs, executor, written
+        )
+    )
@@ -1,35 +1,30 @@
-from smithers.io.stlhandler import STLHandler
-from smithers.io.obj import ObjHandler
 import numpy as np
 
+from src.features import edge_face_adjacency, face_normals
+from src.mesh import TriMesh
+
 
 class DataWrapper:
-    def __init__(self, path):
-        extension = path.split(".")[-1]
-        if extension == "stl":
-            self._points = np.asarray(STLHandler.read(path)["points"])
-        elif extension == "obj":
-            self._points = np.asarray(ObjHandler.read(path).vertices)
-        else:
-            raise ValueError(
-                "Files of type {} are not supported at the moment".format(
-                    extension
-                )
-            )
+    def __init__(self, path, dtype=np.float32):
+        # vertices are stored in single precision by default, the bounding
+        # box is computed in double precision while reading
+        self._mesh = TriMesh.read(path, dtype=dtype)
+
+    @property
+    def mesh(self):
+        return self._mesh
 
     @property
     def points(self):
-        return self._points
+        return self._mesh.vertices
+
+    @property
+    def bounds(self):
+        return self._mesh.bounds
 
 
 def min_max(data):
-    return np.concatenate(
-        [
-            np.min(data.points[:, None], axis=0),
-            np.max(data.points[:, None], axis=0),
-        ],
-        axis=0,
-    )
+    return data.bounds
 
 
 def dimension(data):
@@ -44,14 +39,174 @@ def diameter(data):
 
 
 def boundary(data):
-    return np.concatenate(
-        [
-            np.min(data.points, axis=0)[None, :],
-            np.max(data.points, axis=0)[None, :],
-        ],
-        axis=0,
-    )
+    return np.array(data.bounds)
 
 
 def middle_point(data):
     return np.median(boundary(data), axis=0)
+
+
+def surface_quality(data, base_cell_size=None, resolve_angle=30):
+    """Check the propeller surface before meshing: a surface with open or
+    non-manifold edges, or whose triangles are not oriented consistently,
+    does not enclose a volume and `snappy` produces a useless mesh.
+
+    The radius of curvature is estimated on each edge shared by two
+    triangles as their mean height on the edge over the angle between their
+    normals.
+    If `base_cell_size` is given, the levels of surface refinement are
+    suggested such that the cells span about `resolve_angle` degrees of
+    curvature, without becoming smaller than the shortest edge (the
+    tessellation cannot be resolved further): the median over the edges
+    gives `propeller_min_surf_ref`, the 5th percentile
+    `propeller_max_surf_ref`.
+
+    :param data: The propeller, read in double precision (the lengths of
+        the short edges and the areas of the thin triangles are lost in
+        single precision).
+    :type data: DataWrapper
+    :param base_cell_size: The size of the cells of blockMesh.
+    :type base_cell_size: float, optional
+    :param resolve_angle: The angle (in degrees) spanned by a cell on a
+        curved region, defaults to 30.
+    :type resolve_angle: float, optional
+    :return: A report: the number of `open_edges` (one triangle),
+        `non_manifold_edges` (more than two triangles), `inconsistent_edges`
+        (two triangles which traverse the edge in the same direction) and
+        `degenerate_faces` (zero area), `watertight`, the maximum and the
+        median aspect ratio of the triangles (1 for equilateral triangles),
+        the minimum and the median length of the edges, the minimum radius
+        of curvature and the suggested `propeller_min_surf_ref` and
+        `propeller_max_surf_ref` (`None` without `base_cell_size`).
+    :rtype: dict
+    """
+    vertices = np.asarray(data.mesh.vertices, dtype=np.float64)
+    faces = data.mesh.faces.astype(np.int64)
+    edges, counts, edge_faces, starts = edge_face_adjacency(faces)
+    manifold = counts == 2
+
+    # consistently oriented triangles traverse a shared edge in opposite
+    # directions, therefore each directed edge appears once
+    n = len(vertices)
+    directed = np.concatenate(
+        [faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]]
+    )
+    directed_keys, directed_counts = np.unique(
+        directed[:, 0] * n + directed[:, 1], return_counts=True
+    )
+    repeated = directed_keys[directed_counts > 1]
+    repeated_edges = np.sort(np.stack([repeated // n, repeated % n]), axis=0)
+    inconsistent = np.isin(
+        repeated_edges[0] * n + repeated_edges[1],
+        edges[manifold, 0] * n + edges[manifold, 1],
+    )
+
+    triangles = vertices[faces]
+    sides = np.linalg.norm(triangles[:, [1, 2, 0]] - triangles, axis=2)
+    areas = 0.5 * np.linalg.norm(
+        np.cross(
+            triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]
+        ),
+        axis=1,
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        aspect_ratios = np.where(
+            areas > 0, sides.max(axis=1) ** 2 * np.sqrt(3) / (4 * areas), np.inf
+        )
+
+    lengths = np.linalg.norm(
+        vertices[edges[:, 0]] - vertices[edges[:, 1]], axis=1
+    )
+
+    first = edge_faces[starts[manifold]]
+    second = edge_faces[starts[manifold] + 1]
+    normals = face_normals(vertices, faces)
+    angles = np.arccos(
+        np.clip(np.sum(normals[first] * normals[second], axis=1), -1, 1)
+    )
+    # the mean height of the two triangles on the shared edge
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distances = (areas[first] + areas[second]) / lengths[manifold]
+        radii = np.where(angles > 0, distances / angles, np.inf)
+
+    report = dict(
+        open_edges=int(np.count_nonzero(counts == 1)),
+        non_manifold_edges=int(np.count_nonzero(counts > 2)),
+        inconsistent_edges=int(np.count_nonzero(inconsistent)),
+        degenerate_faces=int(np.count_nonzero(areas == 0)),
+        max_aspect_ratio=float(aspect_ratios.max()),
+        median_aspect_ratio=float(np.median(aspect_ratios)),
+        min_edge_length=float(lengths.min()),
+        median_edge_length=float(np.median(lengths)),
+        min_curvature_radius=float(radii.min()) if len(radii) else np.inf,
+        suggested_min_surf_ref=None,
+        suggested_max_surf_ref=None,
+    )
+    report["watertight"] = (
+        report["open_edges"] == 0
+        and report["non_manifold_edges"] == 0
+        and report["inconsistent_edges"] == 0
+    )
+
+    if base_cell_size is not None and len(radii):
+        shortest = lengths[lengths > 0].min()
+        sizes = np.clip(
+            radii * np.radians(resolve_angle), shortest, base_cell_size
+        )
+
+        def level(size):
+            # cells of level L are base_cell_size / 2**L long
+            return int(np.ceil(np.log2(base_cell_size / size) - 1e-9))
+
+        report["suggested_min_surf_ref"] = level(np.median(sizes))
+        report["suggested_max_surf_ref"] = level(np.percentile(sizes, 5))
+    return report
+
+
+def radial_profile(data, n_bins=64, center=None):
+    """The envelope of the propeller around its axis (parallel to Y): the Y
+    range of the propeller is divided into `n_bins` bins, and for each bin
+    the maximum distance from the axis of the triangles which overlap the
+    bin is computed.
+
+    Each triangle contributes the largest distance of its vertices (an upper
+    bound, since the distance from the axis is convex along the triangle) to
+    every bin which it overlaps, therefore the envelope contains the
+    propeller even when a coarse triangle spans several bins.
+
+    :param data: The propeller.
+    :type data: DataWrapper
+    :param n_bins: The number of bins, defaults to 64.
+    :type n_bins: int, optional
+    :param center: The X and Z coordinates of the axis, defaults to the
+        middle of the bounding box.
+    :type center: np.ndarray, optional
+    :return: A 2-tuple: the edges of the bins (`n_bins + 1` values of Y) and
+        the radius of the envelope in each bin.
+    :rtype: tuple
+    """
+    if center is None:
+        center = middle_point(data)[[0, 2]]
+    vertices = np.asarray(data.mesh.vertices, dtype=np.float64)
+    faces = data.mesh.faces
+
+    y_min, y_max = data.bounds[:, 1]
+    edges = np.linspace(y_min, y_max, n_bins + 1)
+    bin_size = (y_max - y_min) / n_bins if y_max > y_min else 1
+
+    def bins(y):
+        return np.clip(((y - y_min) // bin_size).astype(np.int64), 0, n_bins - 1)
+
+    distances = np.linalg.norm(vertices[:, [0, 2]] - center, axis=1)
+    face_y = vertices[:, 1][faces]
+    first, last = bins(face_y.min(axis=1)), bins(face_y.max(axis=1))
+    spans = last - first + 1
+    offsets = np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans)
+
+    radii = np.zeros(n_bins)
+    np.maximum.at(
+        radii,
+        np.repeat(first, spans) + offsets,
+        np.repeat(distances[faces].max(axis=1), spans),
+    )
+    return edges, radii
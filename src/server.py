@@ -0,0 +1,174 @@
+"""A long-running generator which serves case generation jobs over a Unix
+socket.
+
+The server keeps everything which does not depend on the single case warm in
+memory: the imported modules, the base cylinder (`res/cylinder.obj`), the
+parsed dictionary templates and the statistics of the recently used
+propellers. Each connection is served by its own thread, which generates the
+cases of its jobs; at most `--workers` cases are generated at the same time,
+the other jobs wait for their turn.
+
+The protocol is line based: the client sends a JSON object per line
+
+    {"case": "path/to/case", "propeller": "path/to/propeller.obj",
+     "params": {"N_of_cylinders": 3, ...}}
+
+and the server answers with a JSON object per line, which contains the key
+`status` (`"ok"` or `"error"`) and either `elapsed` (seconds) or `error`.
+The values in `params` override the defaults taken from `params.py`.
+
+Usage:
+
+    python3 -m src.server serve path/to/socket [--workers N]
+    python3 -m src.server submit path/to/socket case propeller [key=value ...]
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from src.case import generate_case, params_from_module
+from src.generate_cylinders import load_base_cylinder
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.run_job(line)
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class CaseServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, address, default_params, workers=None):
+        """
+        :param address: The path of the Unix socket.
+        :type address: str
+        :param default_params: The parameters used for the values which are
+            not overridden by the jobs.
+        :type default_params: dict
+        :param workers: The maximum number of cases generated at the same
+            time, defaults to the number of CPUs.
+        :type workers: int, optional
+        """
+        if os.path.exists(address):
+            # a stale socket left by a server which was not closed properly
+            os.unlink(address)
+        super().__init__(address, JobHandler)
+
+        self.default_params = dict(default_params)
+        # the jobs are executed by the threads of the connections, this
+        # only bounds how many of them run at the same time
+        self.workers = threading.BoundedSemaphore(
+            workers or os.cpu_count() or 1
+        )
+
+        # parse the base cylinder now, and not during the first job
+        load_base_cylinder()
+
+    def run_job(self, line):
+        start = time.perf_counter()
+        try:
+            job = json.loads(line)
+            params = dict(self.default_params)
+            params.update(job.get("params", {}))
+
+            with self.workers:
+                generate_case(job["case"], job["propeller"], params)
+        except Exception as e:
+            return dict(
+                status="error", error="{}: {}".format(type(e).__name__, e)
+            )
+        return dict(status="ok", elapsed=time.perf_counter() - start)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def submit(address, case, propeller, params=None):
+    """Submit a job to a running :class:`CaseServer` and wait for its
+    completion.
+
+    :param address: The path of the Unix socket of the server.
+    :type address: str
+    :param case: The root directory of the OpenFOAM case.
+    :type case: str
+    :param propeller: The path to the propeller, or a list of paths.
+    :type propeller: str
+    :param params: The parameters which override the defaults of the server.
+    :type params: dict, optional
+    :return: The response of the server.
+    :rtype: dict
+    """
+    if not isinstance(propeller, (list, tuple)):
+        propeller = [propeller]
+    job = dict(
+        case=str(case),
+        propeller=[str(path) for path in propeller],
+        params=params or {},
+    )
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(address)
+        sock.sendall(json.dumps(job).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            response = json.loads(f.readline())
+
+    if response["status"] != "ok":
+        raise RuntimeError(response["error"])
+    return response
+
+
+def parse_overrides(overrides):
+    # values are parsed as JSON, e.g. N_of_cylinders=3 or
+    # take_available_y=[0.1,0.5]
+    params = {}
+    for item in overrides:
+        key, value = item.split("=", 1)
+        params[key] = json.loads(value)
+    return params
+
+
+if __name__ == "__main__":
+    import params
+
+    parser = argparse.ArgumentParser(prog="python3 -m src.server")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve")
+    serve_parser.add_argument("socket")
+    serve_parser.add_argument("--workers", type=int, default=None)
+
+    submit_parser = subparsers.add_parser("submit")
+    submit_parser.add_argument("socket")
+    submit_parser.add_argument("case")
+    submit_parser.add_argument("propeller")
+    submit_parser.add_argument("overrides", nargs="*")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        with CaseServer(
+            args.socket, params_from_module(params), args.workers
+        ) as server:
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+    else:
+        response = submit(
+            args.socket,
+            args.case,
+            args.propeller,
+            parse_overrides(args.overrides),
+        )
+        print("Done in {:.3f}s".format(response["elapsed"]))
@@ -0,0 +1,371 @@
+import numpy as np
+from smithers.io.obj import WavefrontOBJ
+
+from src.spatial_index import TriangleGrid
+
+
+def face_regions(obj):
+    """Return a 1D array which contains the index (in `obj.regions`) of the
+    region of each polygon of the given OBJ data.
+
+    :param obj: The OBJ data.
+    :type obj: WavefrontOBJ
+    :rtype: np.ndarray
+    """
+    n_of_faces = len(obj.polygons)
+    regions = np.zeros(n_of_faces, dtype=int)
+    for start, region_idx in obj.regions_change_indexes:
+        regions[start:] = region_idx
+    return regions
+
+
+def regions_change_indexes(regions):
+    """The inverse of :func:`face_regions`: compute the list of 2-tuples
+    (first polygon, region index) used by `WavefrontOBJ`.
+    """
+    if len(regions) == 0:
+        return []
+    starts = np.flatnonzero(np.diff(regions)) + 1
+    starts = np.concatenate([[0], starts])
+    return [(int(start), int(regions[start])) for start in starts]
+
+
+def cluster_vertices(vertices, cell_size):
+    """Vertex clustering: the vertices which fall into the same cell of a
+    uniform grid are replaced by their mean.
+
+    :param vertices: A 2D array of vertices (one row for each vertex).
+    :type vertices: np.ndarray
+    :param cell_size: The size of the cells of the grid.
+    :type cell_size: float
+    :return: A 2-tuple: the representative vertices and, for each original
+        vertex, the index of its representative.
+    :rtype: tuple
+    """
+    cells = np.floor((vertices - vertices.min(axis=0)) / cell_size).astype(
+        np.int64
+    )
+    shape = cells.max(axis=0) + 1
+    keys = (cells[:, 0] * shape[1] + cells[:, 1]) * shape[2] + cells[:, 2]
+    _, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+
+    counts = np.bincount(inverse)
+    representatives = np.stack(
+        [
+            np.bincount(inverse, weights=vertices[:, axis]) / counts
+            for axis in range(vertices.shape[1])
+        ],
+        axis=1,
+    )
+    return representatives, inverse
+
+
+def close_pairs(vertices, tolerance):
+    """Find the pairs of vertices which are closer than `tolerance` in each
+    coordinate. The vertices are sorted into a grid with cells of size
+    `tolerance`, and each vertex is compared only with the vertices of its
+    cell and of the neighbouring cells.
+
+    :param vertices: A 2D array of vertices.
+    :type vertices: np.ndarray
+    :param tolerance: The maximum difference of the coordinates.
+    :type tolerance: float
+    :return: A 2D array of pairs of indexes of vertices, the smallest first.
+    :rtype: np.ndarray
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    cells = np.floor(vertices / tolerance).astype(np.int64)
+
+    # a hash of the cells, linear in the cells (the products wrap around):
+    # the cells with the same key are searched together, which only adds
+    # some pairs of vertices to compare
+    weights = np.array([73856093, 19349663, 83492791], dtype=np.int64)
+    keys = cells @ weights
+    unique_keys, cell_of_vertex = np.unique(keys, return_inverse=True)
+    cell_of_vertex = cell_of_vertex.ravel()
+    # the vertices sorted by cell
+    order = np.argsort(cell_of_vertex, kind="stable")
+    keys = keys[order]
+    counts = np.bincount(cell_of_vertex, minlength=len(unique_keys))
+    starts = np.cumsum(counts) - counts
+
+    pairs = []
+    offsets = np.stack(
+        np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing="ij"), axis=-1
+    ).reshape(-1, 3)
+    # each couple of neighbouring cells is visited once, the cell itself
+    # (the 14th offset) included
+    for offset in offsets[13:]:
+        # the neighbouring cell of each vertex (-1 if it is empty), the keys
+        # are searched in order
+        neighbour_keys = keys + offset @ weights
+        neighbours = np.searchsorted(unique_keys, neighbour_keys)
+        neighbours[neighbours == len(unique_keys)] = 0
+        neighbours[unique_keys[neighbours] != neighbour_keys] = -1
+
+        # each vertex against all the vertices of the neighbouring cell
+        first = np.flatnonzero(neighbours != -1)
+        neighbour = neighbours[first]
+        first = np.repeat(order[first], counts[neighbour])
+        local = np.arange(len(first)) - np.repeat(
+            np.cumsum(counts[neighbour]) - counts[neighbour],
+            counts[neighbour],
+        )
+        second = order[np.repeat(starts[neighbour], counts[neighbour]) + local]
+
+        close = np.all(
+            np.abs(vertices[first] - vertices[second]) < tolerance, axis=1
+        )
+        if not np.any(offset):
+            # the pairs in the same cell are found twice
+            close &= first < second
+        pairs.append(np.stack([first[close], second[close]], axis=1))
+
+    return np.sort(np.concatenate(pairs), axis=1)
+
+
+def weld_vertices(vertices, tolerance):
+    """Merge the vertices which are closer than `tolerance` in each
+    coordinate (see :func:`close_pairs`), and the vertices close to them
+    (the groups are the connected components of the pairs). Unlike
+    :func:`cluster_vertices` the vertices do not move: each group of merged
+    vertices is represented by its first vertex, and the representatives
+    keep their original order.
+
+    :param vertices: A 2D array of vertices.
+    :type vertices: np.ndarray
+    :param tolerance: The vertices closer than this in each coordinate are
+        welded.
+    :type tolerance: float
+    :return: A 2-tuple: the indexes of the representative vertices and, for
+        each original vertex, the index (in the first item) of its
+        representative.
+    :rtype: tuple
+    """
+    pairs = close_pairs(vertices, tolerance)
+
+    # label propagation: each vertex gets the smallest index of its group
+    labels = np.arange(len(vertices))
+    while True:
+        previous = labels
+        labels = labels.copy()
+        np.minimum.at(labels, pairs[:, 1], labels[pairs[:, 0]])
+        np.minimum.at(labels, pairs[:, 0], labels[pairs[:, 1]])
+        # pointer jumping
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            break
+
+    first, inverse = np.unique(labels, return_inverse=True)
+    return first, inverse.ravel()
+
+
+def weld_obj(obj, tolerance):
+    """Weld the duplicated vertices of the given OBJ data (see
+    :func:`weld_vertices`), then drop the degenerate triangles (two equal
+    vertices), the duplicated triangles and the unused vertices. The regions
+    are preserved.
+
+    :param obj: The OBJ data.
+    :type obj: WavefrontOBJ
+    :param tolerance: The vertices closer than this (in each coordinate) are
+        welded.
+    :type tolerance: float
+    :return: A 2-tuple: the cleaned OBJ data and a report (a dictionary with
+        the keys `vertices` and `faces`, the number before and after).
+    :rtype: tuple
+    """
+    vertices = np.asarray(obj.vertices, dtype=float)
+    faces = np.asarray(obj.polygons) - 1
+
+    representatives, inverse = weld_vertices(vertices, tolerance)
+    new_faces, kept = remap_faces(faces, inverse)
+
+    # drop the vertices which are not used anymore (the order is preserved)
+    used, new_faces = np.unique(new_faces, return_inverse=True)
+    new_faces = new_faces.reshape(-1, 3)
+
+    cleaned = WavefrontOBJ()
+    cleaned.regions = list(obj.regions)
+    cleaned.regions_change_indexes = regions_change_indexes(
+        face_regions(obj)[kept]
+    )
+    cleaned.vertices = vertices[representatives[used]]
+    cleaned.polygons = new_faces + 1
+
+    report = dict(
+        vertices=(len(vertices), len(cleaned.vertices)),
+        faces=(len(faces), len(new_faces)),
+    )
+    return cleaned, report
+
+
+def remap_faces(faces, inverse):
+    """Replace the vertices of the triangles `faces` (0-based) according to
+    `inverse`, then drop the degenerate triangles and the duplicates.
+
+    :return: A 2-tuple: the new triangles and the indexes of the original
+        triangles which were kept.
+    :rtype: tuple
+    """
+    faces = inverse[faces]
+
+    non_degenerate = (
+        (faces[:, 0] != faces[:, 1])
+        & (faces[:, 1] != faces[:, 2])
+        & (faces[:, 0] != faces[:, 2])
+    )
+    kept = np.flatnonzero(non_degenerate)
+
+    # the same triangle, whatever the order of its vertices
+    _, first = np.unique(
+        np.sort(faces[kept], axis=1), axis=0, return_index=True
+    )
+    kept = kept[np.sort(first)]
+
+    return faces[kept], kept
+
+
+def surface_samples(vertices, faces):
+    """The points where the distance between two surfaces is measured (see
+    :func:`surface_distance`): the vertices used by the triangles and the
+    centroids of the triangles.
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    faces = np.asarray(faces).reshape(-1, 3)
+    return np.concatenate(
+        [vertices[np.unique(faces)], vertices[faces].mean(axis=1)]
+    )
+
+
+def surface_distance(grid, other_grid, max_distance=np.inf):
+    """The (symmetric) Hausdorff distance between two triangulated surfaces,
+    measured at the samples of each surface (see :func:`surface_samples`):
+    the largest distance between a sample of a surface and the other
+    surface.
+
+    :param grid: A :class:`src.spatial_index.TriangleGrid` over the
+        triangles of the first surface.
+    :type grid: src.spatial_index.TriangleGrid
+    :param other_grid: The same for the second surface.
+    :type other_grid: src.spatial_index.TriangleGrid
+    :param max_distance: If the distance is not smaller than this
+        `np.inf` is returned, the search stops earlier. Defaults to `np.inf`.
+    :type max_distance: float, optional
+    :rtype: float
+    """
+    return float(
+        max(
+            other_grid.distance(
+                surface_samples(grid.vertices, grid.faces), max_distance
+            ).max(),
+            grid.distance(
+                surface_samples(other_grid.vertices, other_grid.faces),
+                max_distance,
+            ).max(),
+        )
+    )
+
+
+def simplify(vertices, faces, max_error, max_iterations=8):
+    """Simplify a triangulated surface using vertex clustering, such that the
+    distance between the simplified and the original surface (see
+    :func:`surface_distance`) is smaller than `max_error`.
+
+    With cells of size `max_error / sqrt(3)` no vertex moves more than
+    `max_error`, but thin features may still collapse: the cells are halved
+    until the distance is small enough, then doubled as long as it stays
+    small enough. If no size of the cells works, the surface is returned
+    unchanged.
+
+    :param vertices: A 2D array of vertices.
+    :type vertices: np.ndarray
+    :param faces: A 2D array of 0-based triangles.
+    :type faces: np.ndarray
+    :param max_error: The maximum distance between the two surfaces.
+    :type max_error: float
+    :param max_iterations: The maximum number of times the cells are halved,
+        and then doubled, defaults to 8.
+    :type max_iterations: int, optional
+    :return: A 4-tuple: the new vertices, the new triangles, the indexes of
+        the original triangles which were kept and the distance between the
+        two surfaces.
+    :rtype: tuple
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    faces = np.asarray(faces).reshape(-1, 3)
+    grid = TriangleGrid(vertices, faces)
+
+    def cluster(cell_size):
+        representatives, inverse = cluster_vertices(vertices, cell_size)
+        new_faces, kept = remap_faces(faces, inverse)
+
+        # drop the vertices which are not used anymore
+        used, new_faces = np.unique(new_faces, return_inverse=True)
+        new_faces = new_faces.reshape(-1, 3)
+
+        new_vertices = representatives[used]
+        if len(new_faces):
+            # most of the samples are on the original surface, the smaller
+            # cells of the simplified one are searched faster
+            error = surface_distance(
+                grid,
+                TriangleGrid(new_vertices, new_faces, triangles_per_cell=4),
+                max_error,
+            )
+        else:
+            error = np.inf
+        return new_vertices, new_faces, kept, error
+
+    cell_size = max_error / np.sqrt(3)
+    result = cluster(cell_size)
+    for _ in range(max_iterations):
+        if result[3] < max_error:
+            break
+        cell_size /= 2
+        result = cluster(cell_size)
+    if result[3] >= max_error:
+        return vertices, faces, np.arange(len(faces)), 0.0
+
+    for _ in range(max_iterations):
+        candidate = cluster(cell_size * 2)
+        if candidate[3] >= max_error:
+            break
+        result = candidate
+        cell_size *= 2
+    return result
+
+
+def simplify_obj(obj, max_error):
+    """Simplify the given OBJ data (see :func:`simplify`), preserving its
+    regions.
+
+    :param obj: The OBJ data.
+    :type obj: WavefrontOBJ
+    :param max_error: The maximum distance between the simplified and the
+        original surface.
+    :type max_error: float
+    :return: A 2-tuple: the simplified OBJ data and a report (a dictionary
+        with the keys `vertices`, `faces`, `error`).
+    :rtype: tuple
+    """
+    faces = np.asarray(obj.polygons) - 1
+    vertices, new_faces, kept, error = simplify(
+        obj.vertices, faces, max_error
+    )
+
+    simplified = WavefrontOBJ()
+    simplified.regions = list(obj.regions)
+    simplified.regions_change_indexes = regions_change_indexes(
+        face_regions(obj)[kept]
+    )
+    simplified.vertices = vertices
+    simplified.polygons = new_faces + 1
+
+    report = dict(
+        vertices=(len(obj.vertices), len(vertices)),
+        faces=(len(faces), len(new_faces)),
+        error=error,
+    )
+    return simplified, report
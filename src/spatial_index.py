@@ -0,0 +1,455 @@
+import numpy as np
+
+
+class AABBIndex:
+    """An index of axis-aligned bounding boxes, sorted along the X axis (sort
+    and sweep). Overlap queries only compare boxes whose X intervals
+    intersect, instead of all the pairs.
+    """
+
+    def __init__(self, lower, upper):
+        """
+        :param lower: A 2D array which contains the lowest corner of each box
+            (one row for each box, one column for each axis).
+        :type lower: np.ndarray
+        :param upper: A 2D array which contains the biggest corner of each
+            box.
+        :type upper: np.ndarray
+        """
+        lower = np.asarray(lower, dtype=float)
+        upper = np.asarray(upper, dtype=float)
+        if lower.shape != upper.shape or lower.ndim != 2:
+            raise ValueError("Expected two 2D arrays with the same shape.")
+
+        self._order = np.argsort(lower[:, 0], kind="stable")
+        self._lower = lower[self._order]
+        self._upper = upper[self._order]
+
+    def __len__(self):
+        return len(self._order)
+
+    def _overlap(self, candidates, lower, upper):
+        return np.all(
+            (self._lower[candidates] <= upper) & (self._upper[candidates] >= lower),
+            axis=1,
+        )
+
+    def query(self, lower, upper):
+        """Return the indexes (sorted) of the boxes which overlap the given
+        box. Touching boxes overlap.
+        """
+        lower = np.asarray(lower, dtype=float)
+        upper = np.asarray(upper, dtype=float)
+        # the boxes which start after the end of the given box are excluded
+        end = np.searchsorted(self._lower[:, 0], upper[0], side="right")
+        candidates = np.arange(end)
+        hits = candidates[self._overlap(candidates, lower, upper)]
+        return np.sort(self._order[hits])
+
+    def overlapping_pairs(self):
+        """Return the list of pairs of indexes `(i, j)`, with `i < j`, of the
+        boxes which overlap.
+        """
+        ends = np.searchsorted(
+            self._lower[:, 0], self._upper[:, 0], side="right"
+        )
+        pairs = []
+        for position, end in enumerate(ends):
+            candidates = np.arange(position + 1, end)
+            hits = candidates[
+                self._overlap(
+                    candidates, self._lower[position], self._upper[position]
+                )
+            ]
+            for hit in self._order[hits]:
+                i, j = sorted((int(self._order[position]), int(hit)))
+                pairs.append((i, j))
+        return sorted(pairs)
+
+
+def point_triangle_distances(points, a, b, c):
+    """The distance between each point and the corresponding triangle (the
+    i-th point is paired with the i-th triangle).
+
+    :param points: A 2D array of points.
+    :type points: np.ndarray
+    :param a: A 2D array, the first vertex of each triangle.
+    :type a: np.ndarray
+    :param b: A 2D array, the second vertex of each triangle.
+    :type b: np.ndarray
+    :param c: A 2D array, the third vertex of each triangle.
+    :type c: np.ndarray
+    :rtype: np.ndarray
+    """
+    # the closest point is found by region, see Ericson, "Real-Time Collision
+    # Detection", 5.1.5
+    def dot(u, v):
+        return np.einsum("ij,ij->i", u, v)[:, None]
+
+    ab, ac = b - a, c - a
+    d1, d2 = dot(ab, points - a), dot(ac, points - a)
+    d3, d4 = dot(ab, points - b), dot(ac, points - b)
+    d5, d6 = dot(ab, points - c), dot(ac, points - c)
+    va, vb, vc = d3 * d6 - d5 * d4, d5 * d2 - d1 * d6, d1 * d4 - d3 * d2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denominator = va + vb + vc
+        closest = np.select(
+            [
+                (d1 <= 0) & (d2 <= 0),
+                (d3 >= 0) & (d4 <= d3),
+                (vc <= 0) & (d1 >= 0) & (d3 <= 0),
+                (d6 >= 0) & (d5 <= d6),
+                (vb <= 0) & (d2 >= 0) & (d6 <= 0),
+                (va <= 0) & (d4 >= d3) & (d5 >= d6),
+            ],
+            [
+                a,
+                b,
+                a + ab * d1 / (d1 - d3),
+                c,
+                a + ac * d2 / (d2 - d6),
+                b + (c - b) * (d4 - d3) / ((d4 - d3) + (d5 - d6)),
+            ],
+            default=a + ab * vb / denominator + ac * vc / denominator,
+        )
+    distances = np.linalg.norm(points - closest, axis=1)
+
+    # degenerate triangles, the closest vertex is good enough
+    invalid = np.isnan(distances)
+    if np.any(invalid):
+        distances[invalid] = np.min(
+            [
+                np.linalg.norm(points[invalid] - vertex[invalid], axis=1)
+                for vertex in (a, b, c)
+            ],
+            axis=0,
+        )
+    return distances
+
+
+class TriangleGrid:
+    """A uniform grid of cubic cells over the triangles of a surface. Only
+    the cells which overlap the bounding box of a triangle are stored,
+    sorted such that each column of cells parallel to the Y axis is
+    contiguous. The queries only test the triangles close to the query
+    point, even for surfaces with millions of triangles:
+
+    + :meth:`contains`: the parity of the number of intersections between
+      the surface and a ray parallel to +Y (the surface must be closed);
+    + :meth:`distance`: the distance from the surface, searching the
+      columns of cells around the point in rings, only until the closest
+      triangle found is closer than the columns not searched yet.
+    """
+
+    def __init__(self, vertices, faces, triangles_per_cell=16):
+        """
+        :param vertices: A 2D array of vertices.
+        :type vertices: np.ndarray
+        :param faces: A 2D array of 0-based triangles.
+        :type faces: np.ndarray
+        :param triangles_per_cell: The average number of triangles in a
+            (non empty) cell, defaults to 16.
+        :type triangles_per_cell: int, optional
+        """
+        self._vertices = np.asarray(vertices, dtype=np.float64)
+        self._faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+
+        a, b, c = (self._vertices[self._faces[:, i]] for i in range(3))
+        lower = np.minimum(np.minimum(a, b), c)
+        upper = np.maximum(np.maximum(a, b), c)
+        self._lower = lower.min(axis=0)
+        extent = upper.max(axis=0) - self._lower
+
+        # a surface of area A covers about A / h**2 cells of size h
+        mean_area = np.linalg.norm(np.cross(b - a, c - a), axis=1).mean() / 2
+        cell_size = np.sqrt(mean_area * triangles_per_cell)
+        if not cell_size > 0:
+            cell_size = max(extent.max(), 1)
+        self._shape = np.minimum(
+            np.maximum(np.ceil(extent / cell_size), 1), 1 << 20
+        ).astype(np.int64)
+        self._cell_size = np.maximum(extent / self._shape, cell_size * 1e-9)
+
+        first, last = self._cells(lower), self._cells(upper)
+        spans = last - first + 1
+        counts = np.prod(spans, axis=1)
+        triangles = np.repeat(np.arange(len(self._faces)), counts)
+        local = np.arange(len(triangles)) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        spans = np.repeat(spans, counts, axis=0)
+        cells = np.repeat(first, counts, axis=0) + np.stack(
+            [
+                local // (spans[:, 1] * spans[:, 2]),
+                local // spans[:, 2] % spans[:, 1],
+                local % spans[:, 2],
+            ],
+            axis=1,
+        )
+        keys = self._keys(cells)
+
+        order = np.argsort(keys)
+        self._triangles = triangles[order]
+        keys = keys[order]
+        # the non empty cells, and the position in `_triangles` of the
+        # first triangle of each of them
+        new_key = np.ones(len(keys), dtype=bool)
+        new_key[1:] = keys[1:] != keys[:-1]
+        self._keys_sorted = keys[new_key]
+        self._starts = np.append(np.flatnonzero(new_key), len(keys))
+
+        # the rays are moved by a tiny amount, therefore they do not hit the
+        # edges and the vertices of the surface (which would be counted
+        # twice)
+        self._ray_shift = 1e-9 * max(extent.max(), 1) * np.array(
+            [0.5772156649, 0, 0.7071067812]
+        )
+
+    def __len__(self):
+        return len(self._faces)
+
+    @property
+    def vertices(self):
+        return self._vertices
+
+    @property
+    def faces(self):
+        return self._faces
+
+    def _cells(self, points):
+        cells = np.floor((points - self._lower) / self._cell_size)
+        return np.clip(cells, 0, self._shape - 1).astype(np.int64)
+
+    def _keys(self, cells):
+        # Y varies fastest: each column of cells is contiguous
+        cells = np.asarray(cells)
+        return (
+            cells[..., 0] * self._shape[2] + cells[..., 2]
+        ) * self._shape[1] + cells[..., 1]
+
+    def _gather(self, begin, end):
+        # the triangles in the given slices of `_triangles`, and the index of
+        # the slice of each of them
+        counts = end - begin
+        owners = np.repeat(np.arange(len(counts)), counts)
+        positions = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        return self._triangles[np.repeat(begin, counts) + positions], owners
+
+    def _range_triangles(self, first_keys, last_keys):
+        # the triangles in the cells whose keys lie in the given (inclusive)
+        # ranges
+        begin = self._starts[np.searchsorted(self._keys_sorted, first_keys)]
+        end = self._starts[
+            np.searchsorted(self._keys_sorted, last_keys, side="right")
+        ]
+        return self._gather(begin, end)
+
+    def _ring_triangles(self, points, centers, rings, radii):
+        # the triangles in the columns of cells (parallel to Y) whose
+        # Chebyshev distance in XZ from `centers` (the column of each point,
+        # also outside the grid) is equal to `rings`, and the index of the
+        # point of each of them. Only the cells of each column which
+        # intersect the ball of radius `radii` around the point are searched
+        c = centers[:, [0, 2]]
+        r = rings[:, None]
+        lo, hi = c - r, c + r
+        boxes = [
+            # the two sides normal to X
+            (lo, np.stack([lo[:, 0], hi[:, 1]], axis=1)),
+            (np.stack([hi[:, 0], lo[:, 1]], axis=1), hi),
+            # the two sides normal to Z, without the corners
+            (
+                np.stack([lo[:, 0] + 1, lo[:, 1]], axis=1),
+                np.stack([hi[:, 0] - 1, lo[:, 1]], axis=1),
+            ),
+            (
+                np.stack([lo[:, 0] + 1, hi[:, 1]], axis=1),
+                np.stack([hi[:, 0] - 1, hi[:, 1]], axis=1),
+            ),
+        ]
+        # the ring 0 is a single column
+        boxes[1] = (boxes[1][0], np.where(r == 0, boxes[1][0] - 1, hi))
+
+        shape = self._shape[[0, 2]]
+        first = np.maximum(np.concatenate([box[0] for box in boxes]), 0)
+        last = np.minimum(np.concatenate([box[1] for box in boxes]), shape - 1)
+        spans = np.maximum(last - first + 1, 0)
+        counts = spans[:, 0] * spans[:, 1]
+        local = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        spans_z = np.repeat(spans[:, 1], counts)
+        columns = np.repeat(first, counts, axis=0)
+        columns[:, 0] += local // spans_z
+        columns[:, 1] += local % spans_z
+        owners = np.repeat(np.tile(np.arange(len(points)), len(boxes)), counts)
+
+        # the part of each column inside the ball
+        size = self._cell_size[[0, 2]]
+        column_lower = self._lower[[0, 2]] + columns * size
+        xz = points[owners][:, [0, 2]]
+        gaps = np.maximum(
+            np.maximum(column_lower - xz, xz - column_lower - size), 0
+        )
+        with np.errstate(invalid="ignore"):
+            half_heights = np.sqrt(
+                radii[owners] ** 2 - np.einsum("ij,ij->i", gaps, gaps)
+            )
+        inside = half_heights > 0
+        owners, columns = owners[inside], columns[inside]
+        y = points[owners, 1]
+        bottom, top = (
+            np.stack(
+                [
+                    columns[:, 0],
+                    np.clip(
+                        np.floor(
+                            (y + sign * half_heights[inside] - self._lower[1])
+                            / self._cell_size[1]
+                        ),
+                        0,
+                        self._shape[1] - 1,
+                    ).astype(np.int64),
+                    columns[:, 1],
+                ],
+                axis=1,
+            )
+            for sign in (-1, 1)
+        )
+
+        triangles, column_owners = self._range_triangles(
+            self._keys(bottom), self._keys(top)
+        )
+        return triangles, owners[column_owners]
+
+    def _ring_lower_bounds(self, points, centers, rings):
+        # a lower bound of the distance between the points and the columns
+        # of the grid whose Chebyshev distance in XZ from `centers` is at
+        # least `rings`: the columns outside the square of the closer ones,
+        # which is the union of (at most) 4 slabs of the grid
+        grid_lo = self._lower
+        grid_hi = self._lower + self._shape * self._cell_size
+        rings = rings[:, None]
+        inner_lo = self._lower + (centers - rings + 1) * self._cell_size
+        inner_hi = self._lower + (centers + rings) * self._cell_size
+
+        bounds = np.full(len(points), np.inf)
+        for axis in 0, 2:
+            for lower_slab in True, False:
+                slab_lo = np.tile(grid_lo, (len(points), 1))
+                slab_hi = np.tile(grid_hi, (len(points), 1))
+                if lower_slab:
+                    slab_hi[:, axis] = np.minimum(
+                        inner_lo[:, axis], grid_hi[axis]
+                    )
+                    empty = inner_lo[:, axis] <= grid_lo[axis]
+                else:
+                    slab_lo[:, axis] = np.maximum(
+                        inner_hi[:, axis], grid_lo[axis]
+                    )
+                    empty = inner_hi[:, axis] >= grid_hi[axis]
+                gaps = np.maximum(
+                    np.maximum(slab_lo - points, points - slab_hi), 0
+                )
+                distances = np.sqrt(np.einsum("ij,ij->i", gaps, gaps))
+                distances[empty] = np.inf
+                bounds = np.minimum(bounds, distances)
+        return bounds
+
+    def contains(self, points):
+        """Check which points lie inside the closed surface.
+
+        :param points: A 2D array of points.
+        :type points: np.ndarray
+        :rtype: np.ndarray
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        shifted = points + self._ray_shift
+        cells = self._cells(shifted)
+        top = cells.copy()
+        top[:, 1] = self._shape[1] - 1
+        triangles, owners = self._range_triangles(
+            self._keys(cells), self._keys(top)
+        )
+        # a triangle may be listed in several cells of a column
+        pairs = np.unique(owners * len(self._faces) + triangles)
+        owners, triangles = np.divmod(pairs, len(self._faces))
+
+        corners = self._vertices[self._faces[triangles]]
+        a, b, c = corners[:, 0], corners[:, 1], corners[:, 2]
+
+        def cross(u, v):
+            return u[:, 0] * v[:, 2] - u[:, 2] * v[:, 0]
+
+        ab, ac = b - a, c - a
+        ap = shifted[owners] - a
+        area = cross(ab, ac)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            wb = cross(ap, ac) / area
+            wc = cross(ab, ap) / area
+            wa = 1 - wb - wc
+            y = wa * a[:, 1] + wb * b[:, 1] + wc * c[:, 1]
+        # triangles parallel to the ray are never hit
+        hit = (area != 0) & (wa >= 0) & (wb >= 0) & (wc >= 0)
+        hit &= y > points[owners, 1]
+
+        return np.bincount(owners[hit], minlength=len(points)) % 2 == 1
+
+    def distance(self, points, max_distance=np.inf):
+        """The distance between each point and the surface. The rings of
+        columns of cells (parallel to Y) around the column of each point are
+        searched one after the other, until the columns not searched yet are
+        farther than the closest triangle found. In each column only the
+        cells closer than the closest triangle found are searched. All the
+        points are searched together.
+
+        :param points: A 2D array of points.
+        :type points: np.ndarray
+        :param max_distance: The points which are not closer than this to
+            the surface get `np.inf`, the search stops earlier. Defaults to
+            `np.inf` (the exact distance of every point).
+        :type max_distance: float, optional
+        :rtype: np.ndarray
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        distances = np.full(len(points), float(max_distance))
+        if len(self._faces):
+            # the cell of each point, also outside the grid
+            centers = np.floor(
+                (points - self._lower) / self._cell_size
+            ).astype(np.int64)
+            # the rings which do not reach the grid are skipped
+            rings = np.maximum(
+                np.maximum(-centers, centers - (self._shape - 1)), 0
+            )[:, [0, 2]].max(axis=1)
+
+            active = np.arange(len(points))
+            while len(active):
+                triangles, owners = self._ring_triangles(
+                    points[active],
+                    centers[active],
+                    rings[active],
+                    distances[active],
+                )
+                corners = self._vertices[self._faces[triangles]]
+                np.minimum.at(
+                    distances,
+                    active[owners],
+                    point_triangle_distances(
+                        points[active[owners]],
+                        corners[:, 0],
+                        corners[:, 1],
+                        corners[:, 2],
+                    ),
+                )
+                rings[active] += 1
+                bounds = self._ring_lower_bounds(
+                    points[active], centers[active], rings[active]
+                )
+                active = active[bounds < distances[active]]
+
+        distances[distances >= max_distance] = np.inf
+        return distances
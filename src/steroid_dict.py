@@ -15,6 +15,20 @@ class SteroidDict:
         self._compute_dict_ordered_keys = []
         self.update(dc)
 
+    def with_values(self, dc):
+        """A new dictionary which shares the computed values (the functions
+        and the templates) of this one, and contains a copy of its plain
+        values updated with `dc`. This dictionary is not modified.
+        """
+        other = SteroidDict.__new__(SteroidDict)
+        other._dictionary = dict(self._dictionary)
+        other._compute_dict = dict(self._compute_dict)
+        other._compute_dict_ordered_keys = list(
+            self._compute_dict_ordered_keys
+        )
+        other.update(dc)
+        return other
+
     def update(self, dc):
         for key, value in dc.items():
             self.__setitem__(key, value)
@@ -95,6 +109,9 @@ class SteroidDict:
                         else:
                             break
                 except KeyError:
+                    # the lists are exhausted (or empty). The keys without
+                    # any value are found before rendering, see
+                    # `src.openfoam_parametrizer.missing_values`
                     pass
 
                 return "\n".join(strings)
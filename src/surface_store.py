@@ -0,0 +1,240 @@
+"""A content-addressed store of triangulated surfaces shared by many cases.
+
+In a sweep every case gets its own copy of the propeller, and the variants
+which share `cylinder_scales` regenerate identical cylinders. With a
+:class:`SurfaceStore` each distinct file of `constant/triSurface` is stored
+once (under the SHA-256 digest of its content) and the files of the cases
+are links to it (symbolic or hard links).
+
+Cylinders are not even generated when an identical cylinder is already in
+the store: they are identified in advance by a key computed from their name,
+dimension, anchor, tessellation and profile (see :func:`cylinder_key`).
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from src.case import case_outputs, render_case, write_case_files
+from src.generate_cylinders import cylinder_files
+
+tri_surface = "constant/triSurface/"
+
+# changes whenever the way the cylinders are generated changes, such that
+# the stored cylinders are not reused
+cylinder_key_version = 1
+
+
+def cylinder_key(geometry, idx):
+    """A key which identifies the files of the idx-th cylinder of a case
+    before they are generated: the SHA-256 digest of its name, dimension,
+    anchor, number of segments (`None` for `res/cylinder.obj`) and profile.
+    """
+    profiles = geometry["cylinder_profiles"]
+    profile = None if profiles is None else profiles[idx]
+    segments = geometry["cylinder_segments"]
+    description = dict(
+        version=cylinder_key_version,
+        name=geometry["cylinder_names"][idx],
+        outer=idx == len(geometry["cylinder_names"]) - 1,
+        dimension=np.asarray(geometry["cylinder_dimensions"][idx]).tolist(),
+        anchor=np.asarray(geometry["cylinder_anchors"][idx]).tolist(),
+        segments=None if segments is None else int(segments[idx]),
+        profile=None
+        if profile is None
+        else [np.asarray(item).tolist() for item in profile],
+    )
+    # repr of floats is exact
+    return hashlib.sha256(
+        json.dumps(description, sort_keys=True).encode()
+    ).hexdigest()
+
+
+class SurfaceStore:
+    """A directory which contains files named after the SHA-256 digest of
+    their content (`objects/ab/cdef....obj`), and the digests of the files of
+    each cylinder key (`cylinders/<key>.json`, see :func:`cylinder_key`).
+    """
+
+    def __init__(self, root, link="symlink"):
+        """
+        :param root: The root directory of the store, created if needed.
+        :type root: str
+        :param link: How the files of the cases refer to the store:
+            `"symlink"` (relative symbolic links) or `"hardlink"` (the case
+            and the store must be on the same filesystem). The objects are
+            read-only, but a hard link shares the inode: writing a linked
+            file of a case in place (instead of replacing it, as
+            :func:`src.case.write_case_files` does) modifies the object for
+            every case.
+        :type link: str, optional
+        """
+        if link not in ("symlink", "hardlink"):
+            raise ValueError("Unknown type of link {}".format(link))
+        self.root = Path(root)
+        self.link = link
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+        (self.root / "cylinders").mkdir(exist_ok=True)
+
+    def object_path(self, digest, suffix=""):
+        return self.root / "objects" / digest[:2] / (digest[2:] + suffix)
+
+    def _write_atomic(self, path, content, mode=0o644):
+        # concurrent writers of the same object write the same content
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, str(path))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def put(self, content, suffix=""):
+        """Store some bytes, unless they are already in the store.
+
+        :return: The path of the object in the store.
+        :rtype: pathlib.Path
+        """
+        path = self.object_path(hashlib.sha256(content).hexdigest(), suffix)
+        if not path.exists():
+            # the objects are shared by many cases, read-only
+            self._write_atomic(path, content, mode=0o444)
+        return path
+
+    def link_into(self, object_path, target):
+        """Replace `target` (a file of a case) with a link to an object of
+        the store."""
+        target = Path(target)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.is_symlink() or target.exists():
+            target.unlink()
+        if self.link == "symlink":
+            target.symlink_to(
+                os.path.relpath(
+                    str(Path(object_path).resolve()),
+                    str(target.parent.resolve()),
+                )
+            )
+        else:
+            os.link(str(object_path), str(target))
+
+    def cylinder_files(self, key):
+        """The objects of the files of a cylinder key, as a dictionary (file
+        name: path in the store), `None` if the key is not in the store."""
+        path = self.root / "cylinders" / (key + ".json")
+        if not path.exists():
+            return None
+        files = {
+            name: self.root / "objects" / relative
+            for name, relative in json.loads(path.read_text()).items()
+        }
+        if not all(object_path.exists() for object_path in files.values()):
+            return None
+        return files
+
+    def put_cylinder_files(self, key, files):
+        """Record the objects (see :meth:`put`) of the files of a cylinder
+        key.
+
+        :param files: A dictionary, file name: path in the store.
+        :type files: dict
+        """
+        objects = self.root / "objects"
+        self._write_atomic(
+            self.root / "cylinders" / (key + ".json"),
+            json.dumps(
+                {
+                    name: Path(path).relative_to(objects).as_posix()
+                    for name, path in files.items()
+                },
+                sort_keys=True,
+            ).encode(),
+        )
+
+
+def generate_case_with_store(
+    openfoam_folder, propeller_path, params, store, written=None
+):
+    """Generate an OpenFOAM case (see :func:`src.case.generate_case`), but
+    the files of `constant/triSurface` are links to the objects of a
+    :class:`SurfaceStore`. The cylinders already in the store are not
+    generated again.
+
+    :param store: The store.
+    :type store: SurfaceStore
+    :param written: If given, the relative paths of the files written (or
+        linked) are appended to it.
+    :type written: list, optional
+    :return: A 2-tuple: the geometry of the case (see
+        :func:`src.case.compute_case_geometry`) and the names of the
+        cylinders which were generated (the others were found in the store).
+    :rtype: tuple
+    """
+    geometry, files = render_case(
+        openfoam_folder,
+        propeller_path,
+        params,
+        outputs=[output for output in case_outputs if output != "cylinders"],
+    )
+
+    if written is None:
+        written = []
+
+    def surfaces_into_store(files):
+        for path, content in files:
+            if path.startswith(tri_surface):
+                suffix = os.path.splitext(path)[1]
+                store.link_into(
+                    store.put(content, suffix), Path(openfoam_folder) / path
+                )
+                written.append(path)
+            else:
+                yield path, content
+
+    written.extend(
+        write_case_files(openfoam_folder, surfaces_into_store(files))
+    )
+
+    names = geometry["cylinder_names"]
+    if params.get("analytic_cylinders", False):
+        # only the outermost cylinder is a file
+        indexes = [len(names) - 1]
+    else:
+        indexes = range(len(names))
+    keys = {names[idx]: cylinder_key(geometry, idx) for idx in indexes}
+    stored = {name: store.cylinder_files(key) for name, key in keys.items()}
+    missing = [name for name, files in stored.items() if files is None]
+
+    if missing:
+        generated = {name: {} for name in missing}
+        for file_name, content in cylinder_files(
+            dimensions=geometry["cylinder_dimensions"],
+            anchors=geometry["cylinder_anchors"],
+            names=names,
+            feature_edges=True,
+            segments=geometry["cylinder_segments"],
+            profiles=geometry["cylinder_profiles"],
+            inner_cylinders=not params.get("analytic_cylinders", False),
+            only=missing,
+        ):
+            name, suffix = os.path.splitext(file_name)
+            generated[name][file_name] = store.put(content, suffix)
+        for name, files in generated.items():
+            store.put_cylinder_files(keys[name], files)
+            stored[name] = files
+
+    for files in stored.values():
+        for file_name, object_path in files.items():
+            store.link_into(
+                object_path,
+                Path(openfoam_folder) / (tri_surface + file_name),
+            )
+            written.append(tri_surface + file_name)
+    return geometry, missing
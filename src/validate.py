@@ -0,0 +1,179 @@
+"""Validation of case configurations without writing anything (dry run).
+
+:func:`validate_case` runs the same computations of
+:func:`src.case.generate_case` in memory: the geometry checks (dimensions and
+anchors of the cylinders, overlaps between the stacks of cylinders), the
+containment of the propellers in their cylinders (the clearance between the
+surfaces of the propellers and the walls of the cylinders must not be
+negative, and at least `min_cylinder_clearance` if given), the position
+of `locationInMesh` with respect to the propellers, the quality of the
+propeller surfaces (see :func:`src.read_spatial_info.surface_quality`) and
+the rendering of every parametrized file. Since the statistics and the
+quality reports of the propellers and the parsed templates are cached,
+thousands of variants of the parameters can be screened quickly before a
+sweep.
+"""
+
+import numpy as np
+
+from src.case import (
+    compute_base_cell_size,
+    compute_case_geometry,
+    correct_location_in_mesh,
+    location_in_mesh_margin,
+    openfoam_config_dict,
+    read_propeller_grid,
+    read_propeller_info,
+    read_propeller_quality,
+)
+from src.clearance import cylinder_clearances, location_in_mesh_errors
+from src.openfoam_parametrizer import find_template_errors, parametrized_files
+
+
+def containment_errors(clearances, geometry):
+    """Check that each propeller lies inside every inner cylinder of its
+    stack: its clearance (see :func:`src.clearance.cylinder_clearances`)
+    must not be negative.
+
+    :param clearances: The output of
+        :func:`src.clearance.cylinder_clearances`.
+    :type clearances: dict
+    :param geometry: The output of :func:`src.case.compute_case_geometry`.
+    :type geometry: dict
+    :return: The list of the problems found.
+    :rtype: list
+    """
+    # a propeller which touches a wall gets a roundoff error
+    tolerance = 1e-9 * geometry["cylinder_dimensions"][-1, 1]
+
+    errors = []
+    for idx, body in enumerate(geometry["cylinder_bodies"]):
+        name = geometry["cylinder_names"][idx]
+        if clearances[name] < -tolerance:
+            errors.append(
+                "{} does not contain {}".format(
+                    name, geometry["body_names"][body]
+                )
+            )
+
+    return errors
+
+
+def validate_case(openfoam_folder, propeller_path, params, files=None):
+    """Validate a case configuration without writing anything.
+
+    :param openfoam_folder: The root directory of the OpenFOAM case, the
+        templates are read from there.
+    :type openfoam_folder: str
+    :param propeller_path: The path to the OBJ file of the propeller, or a
+        list of paths.
+    :type propeller_path: str
+    :param params: The parameters of the case (see `params.py`).
+    :type params: dict
+    :param files: The parametrized files which should be rendered, defaults
+        to all of them.
+    :type files: list, optional
+    :return: A report: `valid` (bool), `errors` (a list of dictionaries with
+        the keys `stage`, `file` and `message`), `cylinder_names`,
+        `block_mesh_cells` (`None` if the geometry cannot be computed),
+        `location_in_mesh`, `clearances` (see
+        :func:`src.clearance.cylinder_clearances`) and `surface_quality`
+        (the report of
+        :func:`src.read_spatial_info.surface_quality` for each propeller).
+    :rtype: dict
+    """
+    if isinstance(propeller_path, (list, tuple)):
+        propeller_path = list(propeller_path)
+    else:
+        propeller_path = [propeller_path]
+
+    report = dict(
+        valid=False,
+        errors=[],
+        cylinder_names=None,
+        block_mesh_cells=None,
+        location_in_mesh=None,
+        clearances=None,
+        surface_quality=[],
+    )
+
+    def error(stage, message, file=None):
+        report["errors"].append(dict(stage=stage, file=file, message=message))
+
+    propeller_info = []
+    for path in propeller_path:
+        try:
+            propeller_info.append(read_propeller_info(str(path)))
+        except (OSError, ValueError) as e:
+            error("propeller", "{}: {}".format(type(e).__name__, e), str(path))
+    if report["errors"]:
+        return report
+
+    try:
+        geometry = compute_case_geometry(propeller_info, params)
+        correct_location_in_mesh(
+            geometry, propeller_path, propeller_info, params
+        )
+        context = openfoam_config_dict(str(openfoam_folder), geometry, params)
+    except KeyError as e:
+        error("geometry", "missing parameter {}".format(e.args[0]))
+        return report
+    except ValueError as e:
+        error("geometry", str(e))
+        return report
+
+    report["cylinder_names"] = geometry["cylinder_names"]
+    report["block_mesh_cells"] = geometry["block_mesh_cells"]
+
+    report["location_in_mesh"] = geometry["location_in_mesh"]
+
+    grids = [read_propeller_grid(path) for path in propeller_path]
+    report["clearances"] = cylinder_clearances(grids, geometry)
+    for message in containment_errors(report["clearances"], geometry):
+        error("containment", message)
+
+    location = np.array(geometry["location_in_mesh"].split(), dtype=float)
+    for message in location_in_mesh_errors(
+        location, grids, geometry, location_in_mesh_margin(propeller_info)
+    ):
+        error("location", message)
+
+    # a margin on top of the containment
+    min_clearance = params.get("min_cylinder_clearance")
+    if min_clearance is not None:
+        for idx, body in enumerate(geometry["cylinder_bodies"]):
+            name = geometry["cylinder_names"][idx]
+            clearance = report["clearances"][name]
+            if clearance < min_clearance * propeller_info[body]["diameter"]:
+                error(
+                    "clearance",
+                    "{} clears {} by {:.6g}".format(
+                        name, geometry["body_names"][body], clearance
+                    ),
+                )
+
+    for path, info in zip(propeller_path, propeller_info):
+        quality = read_propeller_quality(
+            path, compute_base_cell_size(params, info["diameter"])
+        )
+        report["surface_quality"].append(quality)
+        for key, description in (
+            ("open_edges", "open edges"),
+            ("non_manifold_edges", "non-manifold edges"),
+            ("inconsistent_edges", "inconsistently oriented edges"),
+        ):
+            if quality[key]:
+                error(
+                    "surface",
+                    "{} {}".format(quality[key], description),
+                    str(path),
+                )
+
+    template_errors = find_template_errors(
+        files=files or parametrized_files, **context
+    )
+    for path, message in template_errors.items():
+        error("template", message, path)
+
+    report["valid"] = not report["errors"]
+    return report
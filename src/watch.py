@@ -0,0 +1,247 @@
+"""Watch mode: keep an OpenFOAM case in sync with `params.py`, the propeller
+and the template dictionaries, regenerating only the outputs which are
+affected by each change.
+
+The dependencies of each output are found as follows:
+
++ the copy of the propeller depends on the propeller file, its levels of
+  detail and its feature edges also on the corresponding parameters;
++ the cylinders depend on their names, dimensions and anchors, which are
+  recomputed (in memory, which is cheap) after each change;
++ each parametrized file depends on the keys of the rendering context which
+  appear in it (see
+  :func:`src.openfoam_parametrizer.template_dependencies`), and on its own
+  content.
+
+For instance, a change of `refinement_values` only affects
+`system/snappyHexMeshDict`, while a change of `cylinder_scales` affects the
+cylinders, `system/blockMeshDict` and `system/snappyHexMeshDict`.
+"""
+
+import os
+import runpy
+import time
+from pathlib import Path
+
+from src.case import (
+    compute_case_geometry,
+    correct_location_in_mesh,
+    generate_case,
+    openfoam_config_dict,
+    params_from_namespace,
+    read_propeller_info,
+)
+from src.openfoam_parametrizer import parametrized_files, template_dependencies
+
+
+def _changed_keys(old, new):
+    # repr() compares lists, arrays and NaNs by value
+    return {
+        key
+        for key in set(old) | set(new)
+        if repr(old.get(key)) != repr(new.get(key))
+    }
+
+
+class CaseWatcher:
+    def __init__(
+        self,
+        openfoam_folder,
+        propeller_path,
+        params_path="params.py",
+        interval=0.1,
+        debounce=0.2,
+        log=print,
+    ):
+        """
+        :param openfoam_folder: The root directory of the OpenFOAM case.
+        :type openfoam_folder: str
+        :param propeller_path: The path to the propeller, or a list of paths
+            (see :func:`src.case.generate_case`).
+        :type propeller_path: str
+        :param params_path: The path to the parameters script, defaults to
+            "params.py".
+        :type params_path: str, optional
+        :param interval: Seconds between two polls of the watched files,
+            defaults to 0.1.
+        :type interval: float, optional
+        :param debounce: The watched files must be quiet for this many
+            seconds before the case is regenerated, defaults to 0.2.
+        :type debounce: float, optional
+        :param log: Called with a message after each regeneration, defaults
+            to `print`.
+        :type log: callable, optional
+        """
+        self.openfoam_path = Path(openfoam_folder)
+        if isinstance(propeller_path, (str, Path)):
+            propeller_path = [propeller_path]
+        self.propeller_paths = [str(path) for path in propeller_path]
+        self.params_path = str(params_path)
+        self.interval = interval
+        self.debounce = debounce
+        self.log = log
+
+        self.params = None
+        self.geometry = None
+        self.context = {}
+
+    def template_paths(self):
+        return {
+            str(self.openfoam_path / path): path for path in parametrized_files
+        }
+
+    def watched_files(self):
+        return (
+            [self.params_path]
+            + self.propeller_paths
+            + list(self.template_paths())
+        )
+
+    def snapshot(self):
+        mtimes = {}
+        for path in self.watched_files():
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                # the file is being replaced
+                mtimes[path] = None
+        return mtimes
+
+    def affected_outputs(self, changed_files):
+        """Compute the new state of the case and the outputs which must be
+        written, given the set of watched files which changed.
+
+        :return: A 4-tuple: the outputs, the parameters, the geometry and the
+            rendering context of the case.
+        :rtype: tuple
+        """
+        params = self.params
+        if params is None or self.params_path in changed_files:
+            params = params_from_namespace(runpy.run_path(self.params_path))
+
+        propeller_info = [
+            read_propeller_info(path) for path in self.propeller_paths
+        ]
+        geometry = compute_case_geometry(propeller_info, params)
+        correct_location_in_mesh(
+            geometry, self.propeller_paths, propeller_info, params
+        )
+        context = openfoam_config_dict(
+            str(self.openfoam_path), geometry, params
+        )
+
+        propeller_changed = not changed_files.isdisjoint(self.propeller_paths)
+
+        def changed_params(*keys):
+            old_params = self.params or {}
+            return propeller_changed or _changed_keys(
+                {key: old_params.get(key) for key in keys},
+                {key: params.get(key) for key in keys},
+            )
+
+        outputs = []
+        if changed_params("propeller_weld_tolerance"):
+            outputs.append("propeller")
+        if changed_params("propeller_lod_errors", "propeller_weld_tolerance"):
+            outputs.append("propeller_lods")
+
+        cylinder_keys = [
+            "cylinder_names",
+            "body_names",
+            "cylinder_dimensions",
+            "cylinder_anchors",
+            "cylinder_segments",
+            "cylinder_profiles",
+        ]
+        if (
+            self.geometry is None
+            or _changed_keys(
+                {key: self.geometry[key] for key in cylinder_keys},
+                {key: geometry[key] for key in cylinder_keys},
+            )
+            or _changed_keys(
+                {"analytic_cylinders": (self.params or {}).get(
+                    "analytic_cylinders"
+                )},
+                {"analytic_cylinders": params.get("analytic_cylinders")},
+            )
+        ):
+            outputs.append("cylinders")
+        if changed_params(
+            "propeller_lod_errors",
+            "propeller_features_lod",
+            "feature_included_angle",
+            "propeller_weld_tolerance",
+        ):
+            outputs.append("feature_edges")
+
+        changed_keys = _changed_keys(self.context, context)
+        for full_path, path in self.template_paths().items():
+            if full_path in changed_files or not changed_keys.isdisjoint(
+                template_dependencies(Path(full_path).read_text())
+            ):
+                outputs.append(path)
+
+        return outputs, params, geometry, context
+
+    def regenerate(self, changed_files):
+        """Regenerate the outputs affected by the given changed files.
+
+        :param changed_files: The watched files which changed.
+        :type changed_files: set
+        :return: The outputs which were written.
+        :rtype: list
+        """
+        outputs, params, geometry, context = self.affected_outputs(
+            changed_files
+        )
+        if outputs:
+            generate_case(
+                str(self.openfoam_path),
+                self.propeller_paths,
+                params,
+                outputs=outputs,
+            )
+
+        self.params = params
+        self.geometry = geometry
+        self.context = context
+        return outputs
+
+    def run(self):
+        """Generate the whole case, then watch the files forever."""
+        start = time.perf_counter()
+        self.regenerate(set(self.watched_files()))
+        self.log("Case generated in {:.3f}s".format(time.perf_counter() - start))
+
+        # our own writes to the template dictionaries are not changes
+        mtimes = self.snapshot()
+        while True:
+            time.sleep(self.interval)
+            current = self.snapshot()
+            if current == mtimes:
+                continue
+
+            # debouncing: wait until the files are quiet
+            while True:
+                time.sleep(self.debounce)
+                latest = self.snapshot()
+                if latest == current:
+                    break
+                current = latest
+
+            changed = {path for path in current if current[path] != mtimes[path]}
+            start = time.perf_counter()
+            try:
+                outputs = self.regenerate(changed)
+            except Exception as e:
+                # probably an half-edited file, wait for the next change
+                self.log("{}: {}".format(type(e).__name__, e))
+            else:
+                self.log(
+                    "Regenerated {} in {:.3f}s".format(
+                        ", ".join(outputs) or "nothing",
+                        time.perf_counter() - start,
+                    )
+                )
+            mtimes = self.snapshot()
@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from src.openfoam_parametrizer import parametrized_files
+
+case_params = dict(
+    refinement_values=[4, 3, 2, 1],
+    N_of_cylinders=4,
+    cylinder_scales=[
+        [1.1, np.nan, 1.1],
+        [2, np.nan, 2],
+        [3, np.nan, 3],
+        [5, 9, 5],
+    ],
+    take_available_y=[0.0001, 0.8, 0.9],
+    outer_cylinder_min_surf_ref=3,
+    outer_cylinder_max_surf_ref=4,
+    propeller_min_surf_ref=9,
+    propeller_max_surf_ref=10,
+    refinement_regions_mode="inside",
+    refinement_regions_distance="1.0",
+)
+
+block_mesh_dict = """vertices
+(
+);
+
+blocks
+(
+    hex (0 1 2 3 4 5 6 7) (20 20 20) simpleGrading (1 1 1)
+);
+"""
+
+snappy_hex_mesh_dict = """geometry
+{
+}
+
+castellatedMeshControls
+{
+    features
+    (
+    );
+
+    refinementSurfaces
+    {
+    }
+
+    refinementRegions
+    {
+    }
+
+    locationInMesh (0 0 0);
+}
+"""
+
+
+def box_triangles(lower, upper):
+    """Vertices and (0-based) triangles of an axis aligned box."""
+    lower, upper = np.asarray(lower, dtype=float), np.asarray(upper, dtype=float)
+    corners = np.array(
+        [[(i >> k) & 1 for k in range(3)] for i in range(8)], dtype=float
+    )
+    vertices = lower + corners * (upper - lower)
+    # outward oriented quads, split in two triangles each
+    quads = [
+        [0, 2, 3, 1],
+        [4, 5, 7, 6],
+        [0, 1, 5, 4],
+        [2, 6, 7, 3],
+        [0, 4, 6, 2],
+        [1, 3, 7, 5],
+    ]
+    triangles = []
+    for a, b, c, d in quads:
+        triangles.append([a, b, c])
+        triangles.append([a, c, d])
+    return vertices, np.array(triangles)
+
+
+def write_propeller(path):
+    """A crude propeller: a box-shaped blade (`propellerTip`) and a
+    box-shaped stem (`propellerStem`) which extends along +Y."""
+    tip_vertices, tip_triangles = box_triangles(
+        [-0.5, 0.0, -0.5], [0.5, 0.1, 0.5]
+    )
+    stem_vertices, stem_triangles = box_triangles(
+        [-0.05, 0.1, -0.05], [0.05, 0.6, 0.05]
+    )
+    lines = [
+        "# Wavefront OBJ file",
+        "# Regions:",
+        "#     0    propellerTip",
+        "#     1    propellerStem",
+        "#",
+    ]
+    for v in np.concatenate([tip_vertices, stem_vertices]):
+        lines.append("v {} {} {}".format(*v))
+    lines.append("g propellerTip")
+    for t in tip_triangles + 1:
+        lines.append("f {} {} {}".format(*t))
+    lines.append("g propellerStem")
+    for t in stem_triangles + 1 + len(tip_vertices):
+        lines.append("f {} {} {}".format(*t))
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def write_case(folder):
+    """A minimal OpenFOAM case which contains every parametrized file."""
+    (folder / "constant" / "triSurface").mkdir(parents=True)
+    (folder / "system").mkdir(parents=True)
+    for path in parametrized_files:
+        (folder / path).write_text("FoamFile\n{\n}\n")
+    (folder / "system/blockMeshDict").write_text(block_mesh_dict)
+    (folder / "system/snappyHexMeshDict").write_text(snappy_hex_mesh_dict)
+    return folder
+
+
+@pytest.fixture
+def propeller_path(tmp_path):
+    return write_propeller(tmp_path / "propeller.obj")
+
+
+@pytest.fixture
+def openfoam_case(tmp_path):
+    return write_case(tmp_path / "case")
+
+
+@pytest.fixture
+def params():
+    return {
+        key: [list(v) for v in value] if key == "cylinder_scales" else value
+        for key, value in case_params.items()
+    }
@@ -0,0 +1,165 @@
+import hashlib
+import io
+import json
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from src.archive import (
+    archive_case,
+    archive_format,
+    write_case_archive,
+    zstandard,
+)
+from src.case import generate_case
+
+
+def test_archive_format():
+    assert archive_format("case.tar.gz") == "tar.gz"
+    assert archive_format("case.TGZ") == "tar.gz"
+    assert archive_format("case.zip") == "zip"
+    with pytest.raises(ValueError):
+        archive_format("case.rar")
+
+
+def read_tar(path):
+    with tarfile.open(path, "r:*") as tar:
+        return {
+            member.name: tar.extractfile(member).read()
+            for member in tar.getmembers()
+        }
+
+
+def read_zip(path):
+    with zipfile.ZipFile(path) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+@pytest.mark.parametrize(
+    "extension, read",
+    [(".tar", read_tar), (".tar.gz", read_tar), (".zip", read_zip)],
+)
+def test_archive_case(
+    tmp_path, openfoam_case, propeller_path, params, extension, read
+):
+    (openfoam_case / "system" / "controlDict").write_text("endTime 1;\n")
+    archive_path = tmp_path / ("case" + extension)
+    archive_case(
+        str(archive_path), str(openfoam_case), str(propeller_path), params
+    )
+    members = read(str(archive_path))
+
+    prefix = openfoam_case.name + "/"
+    assert list(members)[-1] == prefix + "manifest.json"
+    manifest = json.loads(members[prefix + "manifest.json"])
+    assert manifest["cylinder_names"][-1] == "outerCylinder"
+    assert len(manifest["files"]) == len(members) - 1
+    for entry in manifest["files"]:
+        content = members[prefix + entry["path"]]
+        assert hashlib.sha256(content).hexdigest() == entry["sha256"]
+        assert len(content) == entry["size"]
+
+    origins = {entry["path"]: entry["origin"] for entry in manifest["files"]}
+    # copied unchanged
+    assert origins["system/controlDict"] == "case"
+    assert origins["system/snappyHexMeshDict"] == "generated"
+
+    # the same files written by generate_case
+    generate_case(str(openfoam_case), str(propeller_path), params)
+    for path in origins:
+        assert (openfoam_case / path).read_bytes() == members[prefix + path]
+
+
+def test_archive_case_stale_surfaces(
+    tmp_path, openfoam_case, propeller_path, params
+):
+    # left over by an earlier run with levels of detail
+    tri_surface = openfoam_case / "constant" / "triSurface"
+    tri_surface.mkdir(parents=True, exist_ok=True)
+    (tri_surface / "propellerLod0.obj").write_text("v 0 0 0\n")
+    (tri_surface / "propellerLod0.eMesh").write_text("0\n")
+    (tri_surface / "ground.stl").write_text("solid ground\n")
+
+    archive_path = tmp_path / "case.tar"
+    archive_case(
+        str(archive_path),
+        str(openfoam_case),
+        str(propeller_path),
+        params,
+        prefix="",
+    )
+    manifest = json.loads(read_tar(str(archive_path))["manifest.json"])
+    origins = {entry["path"]: entry["origin"] for entry in manifest["files"]}
+
+    assert "constant/triSurface/propellerLod0.obj" not in origins
+    assert "constant/triSurface/propellerLod0.eMesh" not in origins
+    assert origins["constant/triSurface/propeller.obj"] == "generated"
+    # not a surface of the generator
+    assert origins["constant/triSurface/ground.stl"] == "case"
+
+
+@pytest.mark.skipif(zstandard is None, reason="zstandard is not installed")
+def test_write_case_archive_zstd(tmp_path, openfoam_case):
+    archive_path = tmp_path / "case.tar.zst"
+    write_case_archive(
+        str(archive_path), str(openfoam_case), [("a.txt", b"a")], prefix=""
+    )
+    with open(archive_path, "rb") as f:
+        data = zstandard.ZstdDecompressor().stream_reader(f).read()
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        assert tar.extractfile("a.txt").read() == b"a"
+
+
+def test_write_case_archive_skips_itself(openfoam_case):
+    archive_path = openfoam_case / "case.tar"
+    manifest = write_case_archive(
+        str(archive_path), str(openfoam_case), [], include_case_files=True
+    )
+    assert "case.tar" not in [entry["path"] for entry in manifest["files"]]
+
+
+@pytest.mark.parametrize("extension", [".tar", ".tar.gz", ".zip"])
+def test_write_case_archive_reproducible(tmp_path, openfoam_case, extension):
+    contents = []
+    for name in "first", "second":
+        archive_path = tmp_path / (name + extension)
+        write_case_archive(
+            str(archive_path), str(openfoam_case), [("a.txt", b"a")]
+        )
+        contents.append(archive_path.read_bytes())
+    assert contents[0] == contents[1]
+
+
+@pytest.mark.parametrize("extension", [".tar", ".tar.gz", ".zip"])
+def test_archive_case_reproducible(
+    tmp_path, openfoam_case, propeller_path, params, extension
+):
+    (openfoam_case / "system" / "controlDict").write_text("endTime 1;\n")
+    allrun = openfoam_case / "Allrun"
+    allrun.write_text("#!/bin/sh\n")
+    allrun.chmod(0o700)
+    digests = []
+    for name, mtime in ("first", 1000000000), ("second", 2000000000):
+        # neither the times nor the permissions of the files of the case
+        # are recorded
+        for path in openfoam_case.rglob("*"):
+            os.utime(path, (mtime, mtime))
+        (openfoam_case / "system" / "controlDict").chmod(
+            0o600 if name == "first" else 0o664
+        )
+        archive_path = tmp_path / (name + extension)
+        archive_case(
+            str(archive_path), str(openfoam_case), str(propeller_path), params
+        )
+        digests.append(hashlib.sha256(archive_path.read_bytes()).hexdigest())
+    assert digests[0] == digests[1]
+
+    if extension == ".zip":
+        with zipfile.ZipFile(str(archive_path)) as archive:
+            info = archive.getinfo(openfoam_case.name + "/Allrun")
+            assert info.external_attr >> 16 & 0o777 == 0o755
+    else:
+        with tarfile.open(str(archive_path)) as tar:
+            assert tar.getmember(openfoam_case.name + "/Allrun").mode == 0o755
@@ -0,0 +1,351 @@
+import numpy as np
+import pytest
+from smithers.io.obj import ObjHandler
+
+from src.case import (
+    _read_propeller_data,
+    compute_block_mesh,
+    compute_case_geometry,
+    generate_case,
+    params_from_module,
+    read_propeller_info,
+    read_propeller_quality,
+    render_case,
+)
+from src.mesh import TriMesh
+import params as params_module
+
+
+def test_params_from_module():
+    dc = params_from_module(params_module)
+    assert dc["N_of_cylinders"] == params_module.N_of_cylinders
+    assert "np" not in dc
+    assert not any(key.startswith("_") for key in dc)
+
+
+def test_read_propeller_info(propeller_path):
+    info = read_propeller_info(propeller_path)
+    np.testing.assert_allclose(
+        info["boundary"], [[-0.5, 0, -0.5], [0.5, 0.6, 0.5]]
+    )
+    assert info["diameter"] == 1
+    # cached
+    assert read_propeller_info(propeller_path) is info
+
+
+def test_read_propeller_quality(propeller_path):
+    _read_propeller_data.cache_clear()
+    quality = read_propeller_quality(propeller_path, 0.1)
+    assert quality["watertight"]
+    assert quality["suggested_min_surf_ref"] is not None
+    # the propeller is read in double precision
+    assert quality["min_edge_length"] == 0.1
+    assert read_propeller_quality(propeller_path, 0.1) == quality
+    without_cells = read_propeller_quality(propeller_path)
+    assert without_cells["suggested_min_surf_ref"] is None
+    # parsed once for every base_cell_size
+    assert _read_propeller_data.cache_info().misses == 1
+
+
+def test_compute_case_geometry(propeller_path, params):
+    geometry = compute_case_geometry(read_propeller_info(propeller_path), params)
+
+    assert geometry["cylinder_names"] == [
+        "cylinder0",
+        "cylinder1",
+        "cylinder2",
+        "outerCylinder",
+    ]
+    np.testing.assert_allclose(geometry["block_mesh_point_y"][2], 0.6)
+    np.testing.assert_allclose(geometry["block_mesh_point_y"][0], 0.6 - 9)
+    np.testing.assert_allclose(geometry["block_mesh_point_x"][1], 2.6)
+
+
+def test_generate_case(openfoam_case, propeller_path, params):
+    generate_case(str(openfoam_case), str(propeller_path), params)
+
+    tri_surface = openfoam_case / "constant" / "triSurface"
+    outer = ObjHandler.read(str(tri_surface / "outerCylinder.obj"))
+    np.testing.assert_allclose(
+        ObjHandler.boundary(outer, axis=1), [0.6 - 9, 0.6]
+    )
+    assert (tri_surface / "propeller.obj").read_text() == (
+        propeller_path.read_text()
+    )
+
+    snappy = (openfoam_case / "system" / "snappyHexMeshDict").read_text()
+    assert '"cylinder2.obj"' in snappy
+    assert "@" not in snappy
+
+
+def test_generate_case_propeller_lods(openfoam_case, propeller_path, params):
+    params.update(
+        propeller_lod_errors=[0.2],
+        propeller_lod_refinement=[[0.1, 3]],
+        propeller_features_lod=0,
+    )
+    generate_case(str(openfoam_case), str(propeller_path), params)
+
+    lod = ObjHandler.read(
+        str(openfoam_case / "constant" / "triSurface" / "propellerLod0.obj")
+    )
+    assert lod.regions == ["propellerTip", "propellerStem"]
+
+    snappy = (openfoam_case / "system" / "snappyHexMeshDict").read_text()
+    assert '"propellerLod0.obj"' in snappy
+    assert '"propellerLod0.eMesh"' in snappy
+    assert "levels      ((0.1 3));" in snappy
+
+
+def test_generate_case_feature_edges(openfoam_case, propeller_path, params):
+    generate_case(str(openfoam_case), str(propeller_path), params)
+
+    tri_surface = openfoam_case / "constant" / "triSurface"
+    assert "featureEdgeMesh" in (tri_surface / "propeller.eMesh").read_text()
+    assert "featureEdgeMesh" in (
+        tri_surface / "outerCylinder.eMesh"
+    ).read_text()
+    assert not (tri_surface / "cylinder0.eMesh").exists()
+
+
+def test_generate_case_stl_propeller(
+    tmp_path, openfoam_case, propeller_path, params
+):
+    mesh = TriMesh.read(str(propeller_path), dtype=np.float64)
+    lines = ["solid propeller"]
+    for triangle in mesh.vertices[mesh.faces]:
+        lines.append("facet normal 0 0 0\nouter loop")
+        lines.extend("vertex {} {} {}".format(*v) for v in triangle)
+        lines.append("endloop\nendfacet")
+    lines.append("endsolid propeller")
+    stl_path = tmp_path / "propeller.stl"
+    stl_path.write_text("\n".join(lines) + "\n")
+
+    generate_case(str(openfoam_case), str(stl_path), params)
+
+    tri_surface = openfoam_case / "constant" / "triSurface"
+    emesh = (tri_surface / "propeller.eMesh").read_text()
+    # the 24 edges of the two boxes, without regions
+    assert "\n24\n(" in emesh
+
+
+def test_generate_case_weld_propeller(openfoam_case, propeller_path, params):
+    params.update(propeller_weld_tolerance=1e-6)
+    geometry = generate_case(str(openfoam_case), str(propeller_path), params)
+
+    propeller = ObjHandler.read(
+        str(openfoam_case / "constant" / "triSurface" / "propeller.obj")
+    )
+    assert propeller.regions == ["propellerTip", "propellerStem"]
+    assert geometry["propeller_welding"]["propeller"]["faces"] == (24, 24)
+
+
+def test_generate_case_adaptive_cylinders(openfoam_case, propeller_path, params):
+    params.update(base_cell_size=0.5, max_chord_error=0.1)
+    geometry = generate_case(str(openfoam_case), str(propeller_path), params)
+
+    tri_surface = openfoam_case / "constant" / "triSurface"
+    for name, n in zip(
+        geometry["cylinder_names"], geometry["cylinder_segments"]
+    ):
+        cylinder = ObjHandler.read(str(tri_surface / (name + ".obj")))
+        assert len(cylinder.vertices) == 2 * n + 2
+    # the innermost cylinder is refined more
+    assert geometry["cylinder_segments"][0] > geometry["cylinder_segments"][-1]
+
+
+def test_generate_case_stepped_cylinders(openfoam_case, propeller_path, params):
+    params.update(cylinder_profile_margins=[0.05, 0.3, 0.6])
+    geometry = generate_case(str(openfoam_case), str(propeller_path), params)
+
+    ys, radii = geometry["cylinder_profiles"][1]
+    # wide around the blade and its wake, narrow along the stem
+    np.testing.assert_allclose(np.unique(radii), [np.sqrt(0.005) + 0.3, 1])
+    assert ys[0] == geometry["cylinder_anchors"][1, 1]
+    assert geometry["cylinder_profiles"][-1] is None
+    # the stepped cylinders are nested
+    for inner, outer in zip(
+        geometry["cylinder_profiles"][:2], geometry["cylinder_profiles"][1:3]
+    ):
+        assert inner[1].max() <= outer[1].max()
+
+    cylinder = ObjHandler.read(
+        str(openfoam_case / "constant" / "triSurface" / "cylinder1.obj")
+    )
+    assert cylinder.regions == ["cylinder1"]
+    vertices = np.asarray(cylinder.vertices)
+    stem = vertices[vertices[:, 1] > 0.2]
+    np.testing.assert_allclose(
+        np.linalg.norm(stem[:, [0, 2]], axis=1).max(), radii[-1]
+    )
+
+    params.update(analytic_cylinders=True)
+    with pytest.raises(ValueError):
+        generate_case(str(openfoam_case), str(propeller_path), params)
+
+
+def test_generate_case_wake_cones(openfoam_case, propeller_path, params):
+    params.update(cylinder_taper=[0.5, 0.5, 0.5, 0.8])
+    geometry = generate_case(str(openfoam_case), str(propeller_path), params)
+
+    tri_surface = openfoam_case / "constant" / "triSurface"
+    outer = ObjHandler.read(str(tri_surface / "outerCylinder.obj"))
+    assert outer.regions == [
+        "outerCylinderInlet",
+        "outerCylinderOutlet",
+        "outerCylinderWall",
+    ]
+    vertices = np.asarray(outer.vertices)
+    radius = np.linalg.norm(vertices[:, [0, 2]], axis=1)
+    bottom = np.isclose(vertices[:, 1], 0.6 - 9)
+    # full above the propeller, narrow at the bottom
+    np.testing.assert_allclose(radius.max(), 2.5)
+    np.testing.assert_allclose(radius[bottom].max(), 0.8 * 2.5)
+    assert "featureEdgeMesh" in (tri_surface / "outerCylinder.eMesh").read_text()
+
+    ys, radii = geometry["cylinder_profiles"][0]
+    np.testing.assert_allclose(radii, [0.55 / 2, 1.1 / 2, 1.1 / 2])
+    np.testing.assert_allclose(ys[1], 0)
+
+    # the inner cylinders poke out of the narrow outer cylinder
+    params.update(cylinder_taper=[1, 1, 1, 0.1])
+    with pytest.raises(ValueError, match="inside"):
+        generate_case(str(openfoam_case), str(propeller_path), params)
+
+    params.update(cylinder_taper=[0.5, 1, 1, 1], analytic_cylinders=True)
+    with pytest.raises(ValueError):
+        generate_case(str(openfoam_case), str(propeller_path), params)
+
+
+def test_compute_block_mesh():
+    box, cells = compute_block_mesh(
+        np.array([4, 9, 4]), np.array([1, 0.6, 0]), base_cell_size=0.5
+    )
+    # 4.2 rounded up to a multiple of 0.5
+    np.testing.assert_allclose(box, [[-1.25, -8.4, -2.25], [3.25, 0.6, 2.25]])
+    assert cells == [9, 18, 9]
+
+    box, cells = compute_block_mesh(np.array([4, 9, 4]), np.array([0, 0, 0]))
+    np.testing.assert_allclose(box, [[-2.1, -9, -2.1], [2.1, 0, 2.1]])
+    assert cells is None
+
+
+def test_generate_case_block_mesh_cells(openfoam_case, propeller_path, params):
+    block_mesh = openfoam_case / "system" / "blockMeshDict"
+
+    generate_case(str(openfoam_case), str(propeller_path), params)
+    assert "(20 20 20) simpleGrading (1 1 1)" in block_mesh.read_text()
+
+    # a tenth of the diameter of the propeller
+    params.update(base_cell_size_diameters=0.1, block_mesh_grading=[1, 2, 1])
+    geometry = generate_case(str(openfoam_case), str(propeller_path), params)
+    assert geometry["base_cell_size"] == pytest.approx(0.1)
+    assert "hex (0 1 2 3 4 5 6 7) ({} {} {}) simpleGrading (1 2 1)".format(
+        *geometry["block_mesh_cells"]
+    ) in block_mesh.read_text()
+
+    x = geometry["block_mesh_point_x"]
+    assert (max(x) - min(x)) / geometry["block_mesh_cells"][0] == pytest.approx(
+        0.1
+    )
+
+
+def test_generate_case_analytic_cylinders(openfoam_case, propeller_path, params):
+    params.update(analytic_cylinders=True)
+    geometry = generate_case(str(openfoam_case), str(propeller_path), params)
+
+    tri_surface = openfoam_case / "constant" / "triSurface"
+    assert (tri_surface / "outerCylinder.obj").exists()
+    for name in geometry["cylinder_names"][:-1]:
+        assert not (tri_surface / (name + ".obj")).exists()
+
+    snappy = (openfoam_case / "system" / "snappyHexMeshDict").read_text()
+    assert snappy.count("type        searchableCylinder;") == len(
+        geometry["cylinder_names"]
+    ) - 1
+    assert 'file        "cylinder0.obj";' not in snappy
+    assert 'file        "outerCylinder.obj";' in snappy
+    # the cellZone refers to the analytic surface
+    assert "cellZone    cylinder0;" in snappy
+
+
+def test_generate_case_several_propellers(
+    tmp_path, openfoam_case, propeller_path, params
+):
+    # a second propeller, translated along X
+    second = tmp_path / "second.obj"
+    lines = []
+    for line in propeller_path.read_text().splitlines():
+        if line.startswith("v "):
+            x, y, z = map(float, line.split()[1:])
+            line = "v {} {} {}".format(x + 3, y, z)
+        lines.append(line)
+    second.write_text("\n".join(lines) + "\n")
+
+    params.update(
+        N_of_cylinders=3,
+        cylinder_scales=[[1.1, np.nan, 1.1], [2, np.nan, 2], [3, 9, 3]],
+        take_available_y=[0.1, 0.5],
+    )
+    geometry = generate_case(
+        str(openfoam_case), [str(propeller_path), str(second)], params
+    )
+
+    assert geometry["cylinder_names"] == [
+        "propeller0Cylinder0",
+        "propeller0Cylinder1",
+        "propeller1Cylinder0",
+        "propeller1Cylinder1",
+        "outerCylinder",
+    ]
+    # the outer cylinder encloses both propellers
+    np.testing.assert_allclose(geometry["cylinder_anchors"][-1], [1.5, 0.6, 0])
+    np.testing.assert_allclose(geometry["cylinder_dimensions"][-1, 0], 12)
+
+    tri_surface = openfoam_case / "constant" / "triSurface"
+    for name in ["propeller0", "propeller1", "propeller1Cylinder1"]:
+        assert (tri_surface / (name + ".obj")).exists()
+
+    snappy = (openfoam_case / "system" / "snappyHexMeshDict").read_text()
+    assert "name       propeller1Stem;" in snappy
+    assert "cellZone    propeller1Cylinder0;" in snappy
+    assert '"propeller1.eMesh"' in snappy
+    assert snappy.count("mode        inside;") == 5
+
+
+def test_compute_case_geometry_overlapping_propellers(propeller_path, params):
+    info = read_propeller_info(propeller_path)
+    with pytest.raises(ValueError, match="overlap"):
+        compute_case_geometry([info, info], params)
+
+
+def test_render_case(tmp_path, openfoam_case, propeller_path, params):
+    before = {
+        path: path.read_bytes()
+        for path in openfoam_case.rglob("*")
+        if path.is_file()
+    }
+    params.update(
+        propeller_lod_errors=[0.2], propeller_lod_refinement=[[0.1, 3]]
+    )
+    geometry, files = render_case(
+        str(openfoam_case), str(propeller_path), params
+    )
+    files = dict(files)
+
+    # nothing was written
+    assert {
+        path: path.read_bytes()
+        for path in openfoam_case.rglob("*")
+        if path.is_file()
+    } == before
+
+    assert "constant/triSurface/propellerLod0.obj" in files
+    assert "constant/triSurface/outerCylinder.eMesh" in files
+    for name in geometry["cylinder_names"]:
+        assert "constant/triSurface/{}.obj".format(name) in files
+
+    # the same files written by generate_case
+    generate_case(str(openfoam_case), str(propeller_path), params)
+    for path, content in files.items():
+        assert (openfoam_case / path).read_bytes() == content
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from src.case import (
+    compute_case_geometry,
+    correct_location_in_mesh,
+    read_propeller_grid,
+    read_propeller_info,
+)
+from src.clearance import (
+    cylinder_clearances,
+    cylinder_signed_distances,
+    find_location_in_mesh,
+    location_in_mesh_errors,
+    reentrant_rims,
+)
+from src.spatial_index import TriangleGrid
+from tests.conftest import box_triangles
+
+
+@pytest.fixture
+def geometry(propeller_path, params):
+    return compute_case_geometry(
+        [read_propeller_info(str(propeller_path))], params
+    )
+
+
+def test_cylinder_clearances(propeller_path, geometry):
+    grid = read_propeller_grid(str(propeller_path))
+    clearances = cylinder_clearances([grid], geometry)
+
+    assert list(clearances) == ["cylinder0", "cylinder1", "cylinder2"]
+    # the corners of the square blade stick out of the innermost cylinder
+    np.testing.assert_allclose(clearances["cylinder0"], 0.55 - np.sqrt(0.5))
+    # the stem reaches the top of the domain, the blade is 1 from the wall
+    # of cylinder1
+    np.testing.assert_allclose(clearances["cylinder1"], 1 - np.sqrt(0.5))
+
+
+def profile_geometry(ys, radii):
+    """A case with a single inner cylinder, whose lateral polyline is
+    `(ys, radii)`, from Y=0 to Y=2."""
+    return dict(
+        body_names=["propeller"],
+        cylinder_names=["cylinder0", "outerCylinder"],
+        cylinder_dimensions=np.array([[4.0, 2, 4], [10, 10, 10]]),
+        cylinder_anchors=np.array([[0.0, 0, 0], [0, 5, 0]]),
+        cylinder_bodies=np.array([0]),
+        cylinder_profiles=[
+            (np.array(ys, dtype=float), np.array(radii, dtype=float)),
+            None,
+        ],
+    )
+
+
+def test_cylinder_signed_distances_cone():
+    geometry = profile_geometry([0, 2], [0.5, 1.5])
+    # measured across the slanted wall, not along X
+    np.testing.assert_allclose(
+        cylinder_signed_distances([[0.5, 1, 0], [3, 1, 0]], geometry, 0),
+        [0.5 / np.sqrt(1.25), -2 / np.sqrt(1.25)],
+    )
+
+
+def test_cylinder_clearances_step():
+    # the cylinder widens from 1 to 2 at Y=1
+    geometry = profile_geometry([0, 1, 1, 2], [1, 1, 2, 2])
+    np.testing.assert_equal(reentrant_rims(geometry, 0), [[1, 1]])
+
+    # a thin slab from (0.5, 0.6) to (1.4, 1.5) on the XY plane, which
+    # passes 0.1 / sqrt(2) from the inner edge of the step, while its
+    # vertices are far from the walls
+    vertices, faces = box_triangles(
+        [0, 0, -0.05], [0.9 * np.sqrt(2), 0.02, 0.05]
+    )
+    rotation = np.array([[1, 1, 0], [-1, 1, 0], [0, 0, np.sqrt(2)]])
+    vertices = vertices @ rotation / np.sqrt(2) + [0.5, 0.6, 0]
+    grid = TriangleGrid(vertices, faces)
+
+    assert cylinder_signed_distances(vertices, geometry, 0).min() > 0.4
+    clearance = cylinder_clearances([grid], geometry)["cylinder0"]
+    # the closest points of the edge of the step are slightly off the XY
+    # plane
+    assert 0.0697 < clearance < 0.1 / np.sqrt(2)
+
+
+def test_location_in_mesh_errors(propeller_path, geometry):
+    grids = [read_propeller_grid(str(propeller_path))]
+    default = np.array(geometry["location_in_mesh"].split(), dtype=float)
+
+    assert location_in_mesh_errors(default, grids, geometry, 0.01) == []
+    assert location_in_mesh_errors(
+        np.array([0, 0.05, 0]), grids, geometry, 0.01
+    ) == ["locationInMesh is inside propeller"]
+    assert location_in_mesh_errors(
+        np.array([0, 0.105, 0.3]), grids, geometry, 0.01
+    ) == ["locationInMesh is too close to propeller"]
+    assert location_in_mesh_errors(
+        np.array([3, 0.3, 0]), grids, geometry, 0.01
+    ) == ["locationInMesh is outside of outerCylinder"]
+
+
+def test_find_location_in_mesh(propeller_path, geometry):
+    grids = [read_propeller_grid(str(propeller_path))]
+    default = find_location_in_mesh(grids, geometry, 0.01)
+    assert " ".join(map(str, default)) == geometry["location_in_mesh"]
+
+    geometry["location_in_mesh"] = "0 0.05 0"
+    location = find_location_in_mesh(grids, geometry, 0.01)
+    assert location_in_mesh_errors(location, grids, geometry, 0.01) == []
+
+
+def test_correct_location_in_mesh(propeller_path, params, geometry):
+    geometry["location_in_mesh"] = "0 0.05 0"
+    info = [read_propeller_info(str(propeller_path))]
+
+    correct_location_in_mesh(geometry, [str(propeller_path)], info, params)
+    assert geometry["location_in_mesh"] == "0 0.05 0"
+
+    params["correct_location_in_mesh"] = True
+    correct_location_in_mesh(geometry, [str(propeller_path)], info, params)
+    assert geometry["location_in_mesh"] != "0 0.05 0"
@@ -0,0 +1,102 @@
+import json
+
+import numpy as np
+import pytest
+
+import params as params_module
+from src.case import params_from_module
+from src.config import (
+    iter_jsonl_specs,
+    iter_specs,
+    params_schema,
+    read_toml_spec,
+    validate_params,
+)
+
+
+def test_schema_matches_params():
+    defaults = params_from_module(params_module)
+    assert set(params_schema) == set(defaults)
+    # the defaults are valid, apart from np.nan which does not exist in JSON
+    defaults["cylinder_scales"] = [
+        [None if np.isnan(item) else item for item in scale]
+        for scale in defaults["cylinder_scales"]
+    ]
+    validate_params(defaults)
+
+
+def test_validate_params():
+    params = validate_params({"cylinder_scales": [[1, None, 1], [2, 9, 2]]})
+    assert np.isnan(params["cylinder_scales"][0][1])
+
+    with pytest.raises(ValueError, match="Unknown parameter"):
+        validate_params({"N_of_cylindres": 3})
+    with pytest.raises(ValueError, match="N_of_cylinders must be"):
+        validate_params({"N_of_cylinders": "3"})
+    with pytest.raises(ValueError, match="block_mesh_grading"):
+        validate_params({"block_mesh_grading": [1, 1]})
+
+
+def test_read_toml_spec(tmp_path):
+    path = tmp_path / "case.toml"
+    path.write_text(
+        """case = "case0"
+propeller = ["a.obj", "/abs/b.obj"]
+
+[params]
+N_of_cylinders = 2
+cylinder_scales = [[1.1, nan, 1.1], [5, 9, 5]]
+"""
+    )
+    spec = read_toml_spec(str(path))
+
+    assert spec["case"] == str(tmp_path / "case0")
+    assert spec["propeller"] == [str(tmp_path / "a.obj"), "/abs/b.obj"]
+    assert spec["params"]["N_of_cylinders"] == 2
+    assert np.isnan(spec["params"]["cylinder_scales"][0][1])
+    assert len(list(iter_specs(str(path)))) == 1
+
+
+def test_iter_jsonl_specs_is_lazy(tmp_path):
+    path = tmp_path / "sweep.jsonl"
+    lines = [
+        json.dumps(dict(case="case0", propeller="p.obj")),
+        "",
+        json.dumps(
+            dict(case="case1", propeller="p.obj", params={"N_of_cylinders": 2})
+        ),
+        json.dumps(dict(case="case2", propeller="p.obj", params={"x": 1})),
+    ]
+    path.write_text("\n".join(lines) + "\n")
+
+    specs = iter_jsonl_specs(str(path))
+    assert next(specs)["params"] == {}
+    assert next(specs)["params"] == {"N_of_cylinders": 2}
+    # the invalid line is found only when it is read
+    with pytest.raises(ValueError, match="sweep.jsonl:4: Unknown parameter x"):
+        next(specs)
+
+
+def test_iter_jsonl_specs_report_errors(tmp_path):
+    path = tmp_path / "sweep.jsonl"
+    lines = [
+        json.dumps(dict(case="case0", propeller="p.obj")),
+        "{not json",
+        json.dumps(dict(case="case2", propeller="p.obj", params={"x": 1})),
+        json.dumps(dict(case="case3", propeller="p.obj")),
+    ]
+    path.write_text("\n".join(lines) + "\n")
+
+    specs = list(iter_specs(str(path), errors="report"))
+    assert [spec.get("line") for spec in specs] == [None, 2, 3, None]
+    assert specs[1]["error"].startswith(str(path) + ":2: ")
+    assert specs[2]["error"].endswith("sweep.jsonl:3: Unknown parameter x")
+    assert specs[3]["case"] == str(tmp_path / "case3")
+
+    with pytest.raises(ValueError):
+        iter_specs(str(path), errors="ignore")
+
+
+def test_unsupported_config():
+    with pytest.raises(ValueError):
+        iter_specs("params.yaml")
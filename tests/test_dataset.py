@@ -0,0 +1,153 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.case import compute_case_geometry, generate_case, read_propeller_info
+from src.dataset import (
+    DatasetWriter,
+    case_record,
+    cylinder_volumes,
+    estimated_cells,
+    pyarrow,
+    read_dataset,
+)
+from src.mesh import TriMesh, obj_bytes
+
+
+def test_cylinder_volumes(propeller_path, params):
+    geometry = compute_case_geometry(read_propeller_info(propeller_path), params)
+    volumes = cylinder_volumes(geometry)
+    np.testing.assert_allclose(volumes[-1], np.pi * 2.5**2 * 9)
+
+    # a cylinder above the propeller, a truncated cone below it
+    params.update(cylinder_taper=[1, 1, 1, 0.8])
+    geometry = compute_case_geometry(read_propeller_info(propeller_path), params)
+    np.testing.assert_allclose(
+        cylinder_volumes(geometry)[-1],
+        np.pi * 2.5**2 * 0.6 + np.pi * 8.4 / 3 * (2**2 + 2 * 2.5 + 2.5**2),
+    )
+
+
+def test_estimated_cells(propeller_path, params):
+    geometry = compute_case_geometry(read_propeller_info(propeller_path), params)
+    assert np.isnan(estimated_cells(geometry, params["refinement_values"]))
+
+    params.update(base_cell_size=0.5)
+    geometry = compute_case_geometry(read_propeller_info(propeller_path), params)
+    cells = estimated_cells(geometry, [0, 0, 0, 0])
+    assert cells == pytest.approx(np.prod(geometry["block_mesh_cells"]))
+    # the refined cylinders add cells
+    assert estimated_cells(geometry, params["refinement_values"]) > cells
+
+    # only the outermost cylinder, refined to the first level
+    outer = dict(geometry)
+    outer.update(
+        cylinder_bodies=np.array([], dtype=int),
+        cylinder_dimensions=geometry["cylinder_dimensions"][-1:],
+        cylinder_profiles=None,
+    )
+    volume = cylinder_volumes(outer)[0]
+    assert estimated_cells(outer, [2]) == pytest.approx(
+        cells + volume * (8**2 - 1) / 0.5**3
+    )
+
+
+@pytest.mark.parametrize(
+    "format",
+    [
+        "npz",
+        pytest.param(
+            "parquet",
+            marks=pytest.mark.skipif(
+                pyarrow is None, reason="pyarrow is not installed"
+            ),
+        ),
+    ],
+)
+def test_dataset(tmp_path, openfoam_case, propeller_path, params, format):
+    folder = tmp_path / "dataset"
+    geometries = []
+    with DatasetWriter(str(folder), batch_size=2, format=format) as writer:
+        for base_cell_size in [None, 0.5, 0.25]:
+            params.update(base_cell_size=base_cell_size)
+            geometry = generate_case(
+                str(openfoam_case), str(propeller_path), params
+            )
+            geometries.append(geometry)
+            writer.append(
+                case_record(
+                    str(openfoam_case),
+                    str(propeller_path),
+                    params,
+                    geometry,
+                    elapsed=0.1,
+                    output_sizes=[10, 20],
+                )
+            )
+    # 2 + 1 records
+    assert len(list(folder.iterdir())) == (2 if format == "npz" else 4)
+
+    # appended to the same dataset
+    params.update(N_of_cylinders=3, take_available_y=[0.1, 0.5])
+    params["cylinder_scales"] = [[1.1, np.nan, 1.1], [2, np.nan, 2], [5, 9, 5]]
+    params["refinement_values"] = [3, 2, 1]
+    geometry = compute_case_geometry(read_propeller_info(propeller_path), params)
+    with DatasetWriter(str(folder), format=format) as writer:
+        writer.append(case_record("other", str(propeller_path), params, geometry))
+
+    cases, cylinders = read_dataset(str(folder))
+    assert cases["case"].tolist() == [str(openfoam_case)] * 3 + ["other"]
+    np.testing.assert_allclose(cases["diameter"], 1)
+    np.testing.assert_allclose(cases["boundary_max"][0], [0.5, 0.6, 0.5])
+    np.testing.assert_allclose(
+        cases["param_base_cell_size"], [np.nan, 0.5, 0.25, 0.25]
+    )
+    assert cases["output_bytes"].tolist() == [30, 30, 30, -1]
+    assert cases["welded_faces"].tolist() == [-1] * 4
+    assert cases["block_mesh_cells"][0].tolist() == [-1, -1, -1]
+    assert cases["block_mesh_cells"][1].tolist() == list(
+        geometries[1]["block_mesh_cells"]
+    )
+    np.testing.assert_allclose(
+        cases["location_in_mesh"][2],
+        [float(x) for x in geometries[2]["location_in_mesh"].split()],
+    )
+    assert json.loads(cases["params"][3])["N_of_cylinders"] == 3
+
+    # 4 cylinders for the first cases, 3 for the last one
+    assert cylinders["case"].tolist() == [0] * 4 + [1] * 4 + [2] * 4 + [3] * 3
+    assert cylinders["name"][-1] == "outerCylinder"
+    np.testing.assert_allclose(
+        cylinders["dimension"][4:8], geometries[1]["cylinder_dimensions"]
+    )
+    np.testing.assert_allclose(
+        cylinders["anchor"][:4], geometries[0]["cylinder_anchors"]
+    )
+    assert cylinders["segments"][:4].tolist() == [-1] * 4
+    assert cylinders["segments"][4:8].tolist() == geometries[1][
+        "cylinder_segments"
+    ]
+
+
+def test_case_record_welding(tmp_path, openfoam_case, propeller_path, params):
+    # a triangle soup: each triangle has its own vertices
+    mesh = TriMesh.read(str(propeller_path), dtype=np.float64)
+    soup = TriMesh(
+        mesh.vertices[mesh.faces.ravel()],
+        np.arange(3 * len(mesh.faces)),
+        mesh.region_names,
+        mesh.region_offsets,
+        dtype=np.float64,
+    )
+    soup_path = tmp_path / "soup.obj"
+    soup_path.write_bytes(obj_bytes(soup.to_obj()))
+
+    params.update(propeller_weld_tolerance=1e-6)
+    geometry = generate_case(str(openfoam_case), str(soup_path), params)
+    record = case_record(
+        str(openfoam_case), str(soup_path), params, geometry
+    )["cases"]
+    # 2 boxes of 12 triangles, 8 vertices each
+    assert record["welded_vertices"] == 72 - 16
+    assert record["welded_faces"] == 0
@@ -0,0 +1,73 @@
+import numpy as np
+
+from src.features import (
+    cylinder_rim_edges,
+    edge_face_adjacency,
+    feature_edges,
+    obj_feature_edges,
+    write_emesh,
+)
+from src.generate_cylinders import load_base_cylinder
+from src.mesh import TriMesh
+from tests.conftest import box_triangles
+
+
+def test_edge_face_adjacency():
+    faces = np.array([[0, 1, 2], [2, 1, 3]])
+    edges, counts, edge_faces, starts = edge_face_adjacency(faces)
+
+    np.testing.assert_equal(
+        edges, [[0, 1], [0, 2], [1, 2], [1, 3], [2, 3]]
+    )
+    np.testing.assert_equal(counts, [1, 1, 2, 1, 1])
+    shared = edge_faces[starts[2] : starts[2] + counts[2]]
+    assert set(shared) == {0, 1}
+
+
+def test_feature_edges_box():
+    vertices, faces = box_triangles([0, 0, 0], [1, 2, 3])
+    edges = feature_edges(vertices, faces)
+
+    # the diagonals of the faces are not features
+    assert len(edges) == 12
+    lengths = np.linalg.norm(vertices[edges[:, 0]] - vertices[edges[:, 1]], axis=1)
+    np.testing.assert_allclose(np.sort(lengths), [1] * 4 + [2] * 4 + [3] * 4)
+
+
+def test_feature_edges_open_and_regions():
+    # two coplanar triangles
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [0, 0, 1], [1, 0, 1]])
+    faces = np.array([[0, 1, 2], [2, 1, 3]])
+
+    assert len(feature_edges(vertices, faces)) == 4
+    assert len(feature_edges(vertices, faces, regions=[0, 1])) == 5
+
+
+def test_cylinder_rim_edges():
+    cylinder = load_base_cylinder()
+    edges = cylinder_rim_edges(cylinder.vertices)
+
+    assert len(edges) == 120
+    y = cylinder.vertices[edges, 1]
+    # each edge lies on a cap
+    np.testing.assert_equal(y[:, 0], y[:, 1])
+    # each vertex of the rim is used by two edges
+    np.testing.assert_equal(np.bincount(edges.ravel()), 2)
+
+
+def test_write_emesh(tmp_path):
+    points = np.array([[0, 0, 0], [9, 9, 9], [1, 0, 0]])
+    path = str(tmp_path / "a.eMesh")
+    write_emesh(path, points, np.array([[0, 2]]))
+
+    text = open(path).read()
+    assert "class       featureEdgeMesh;" in text
+    assert "object      a.eMesh;" in text
+    assert "2\n(\n(0.0 0.0 0.0)\n(1.0 0.0 0.0)\n)" in text
+    assert "1\n(\n(0 1)\n)" in text
+
+
+def test_obj_feature_edges(propeller_path):
+    obj = TriMesh.read(str(propeller_path), dtype=np.float64).to_obj()
+    # the edges of the two boxes
+    assert len(obj_feature_edges(obj)) == 24
@@ -2,8 +2,21 @@ from src.generate_cylinders import (
     compute_cylinder_dimensions,
     generate_cylinders_obj,
     compute_cylinder_anchors,
-    adjust_dimensions
+    adjust_dimensions,
+    classify_cylinder_faces,
+    compute_cylinder_segments,
+    load_base_cylinder,
+    tessellate_cylinder,
+    searchable_cylinders,
+    compress_profile,
+    stepped_cylinder,
+    revolved_cylinder,
+    taper_polyline,
+    profile_radii,
+    cylinder_meshes,
 )
+from src.spatial_index import TriangleGrid
+from src.features import edge_face_adjacency
 import numpy as np
 import pytest
 from smithers.io.obj import ObjHandler
@@ -90,6 +103,50 @@ def test_generate_cylinders():
     np.testing.assert_allclose(ObjHandler.boundary(big), [[-0.9, -1.7, -0.9],[1.1, 0.3, 1.1]])
 
 
+# ---------------------------------
+# test classification of the faces
+# ---------------------------------
+
+
+def test_classify_cylinder_faces():
+    cylinder = load_base_cylinder()
+    faces = np.asarray(cylinder.polygons) - 1
+    labels = classify_cylinder_faces(cylinder.vertices, faces)
+
+    np.testing.assert_equal(np.bincount(labels), [58, 58, 120])
+    cap_y = cylinder.vertices[faces[labels == 0], 1]
+    np.testing.assert_allclose(cap_y, np.max(cylinder.vertices[:, 1]))
+
+
+def test_classify_cylinder_faces_perturbed():
+    cylinder = load_base_cylinder()
+    faces = np.asarray(cylinder.polygons) - 1
+    vertices = cylinder.vertices * 3.7 + 0.1
+    vertices[:, 1] += np.random.default_rng(0).uniform(
+        -1e-12, 1e-12, len(vertices)
+    )
+
+    labels = classify_cylinder_faces(vertices, faces)
+    np.testing.assert_equal(np.bincount(labels), [58, 58, 120])
+
+
+def test_classify_cylinder_faces_fan():
+    # square cylinder, caps triangulated as a fan around a center vertex
+    angles = np.arange(4) * np.pi / 2
+    ring = np.stack([np.cos(angles), np.zeros(4), np.sin(angles)], axis=1)
+    vertices = np.concatenate(
+        [ring, ring + [0, 2, 0], [[0, 0, 0], [0, 2, 0]]]
+    )
+    bottom = [[8, (i + 1) % 4, i] for i in range(4)]
+    top = [[9, 4 + i, 4 + (i + 1) % 4] for i in range(4)]
+    walls = [[i, (i + 1) % 4, 4 + i] for i in range(4)]
+
+    labels = classify_cylinder_faces(
+        vertices, np.array(top + walls + bottom)
+    )
+    np.testing.assert_equal(labels, [0] * 4 + [2] * 4 + [1] * 4)
+
+
 # ------------------------------------------------
 # check that the appropriate expections are thrown
 # ------------------------------------------------
@@ -240,3 +297,169 @@ def test_adjust_dimension_anchors_dont_change():
 
     adjust_dimensions(dimension, anchors)
     np.testing.assert_allclose(anchors,anchors_copy)
+
+
+# ---------------------------
+# test adaptive tessellation
+# ---------------------------
+
+
+def test_tessellate_cylinder():
+    cylinder = tessellate_cylinder(12)
+
+    assert len(cylinder.vertices) == 2 * 12 + 2
+    assert len(cylinder.polygons) == 4 * 12
+    np.testing.assert_allclose(ObjHandler.dimension(cylinder), [1, 1, 1])
+
+    with raises(ValueError):
+        tessellate_cylinder(10)
+
+
+def test_compute_cylinder_segments():
+    segments = compute_cylinder_segments(
+        dimensions=[[1, 1, 1], [2, 1, 2], [10, 1, 10]],
+        refinement_levels=[3, 2],
+        base_cell_size=0.8,
+        max_chord_error=0.1,
+    )
+
+    for n, radius, level in zip(segments, [0.5, 1, 5], [3, 2, 0]):
+        assert n % 4 == 0
+        chord_error = radius * (1 - np.cos(np.pi / n))
+        assert chord_error <= 0.1 * 0.8 / 2**level
+        # as few segments as possible
+        assert radius * (1 - np.cos(np.pi / (n - 4))) > 0.1 * 0.8 / 2**level
+
+
+def test_compute_cylinder_segments_min():
+    segments = compute_cylinder_segments(
+        dimensions=[[1, 1, 1]], refinement_levels=[0], base_cell_size=100
+    )
+    assert segments == [8]
+
+
+def test_generate_cylinders_segments(tmp_path):
+    anchors = np.array([[0.1, -0.07, 0.1], [0.1, 0.3, 0.1]])
+
+    generate_cylinders_obj(
+        dimensions=np.array([[1, 1, 1], [2, 2, 2]]),
+        anchors=anchors,
+        names=["smol", "big"],
+        base_folder=str(tmp_path),
+        segments=[16, 24],
+    )
+
+    smol = ObjHandler.read(str(tmp_path / "smol.obj"))
+    big = ObjHandler.read(str(tmp_path / "big.obj"))
+
+    assert len(smol.vertices) == 2 * 16 + 2
+    assert len(big.vertices) == 2 * 24 + 2
+    np.testing.assert_allclose(
+        ObjHandler.boundary(big), [[-0.9, -1.7, -0.9], [1.1, 0.3, 1.1]]
+    )
+    assert big.regions == ["bigInlet", "bigOutlet", "bigWall"]
+    assert [start for start, _ in big.regions_change_indexes] == [0, 24, 48]
+
+
+def test_searchable_cylinders():
+    dimensions = np.array([[2, 3, 2], [4, 5, 4]])
+    anchors = np.array([[1, -1, 0], [1, -3, 0]])
+    cylinders = searchable_cylinders(dimensions, anchors)
+
+    assert cylinders["cylinder_point1"] == ["1.0 -1.0 0.0", "1.0 -3.0 0.0"]
+    assert cylinders["cylinder_point2"] == ["1.0 2.0 0.0", "1.0 2.0 0.0"]
+    np.testing.assert_allclose(cylinders["cylinder_radius"], [1, 2])
+
+
+def test_searchable_cylinders_elliptic():
+    with raises(ValueError):
+        searchable_cylinders(np.array([[2, 3, 1]]), np.zeros((1, 3)))
+
+
+def test_generate_cylinders_only_outer(tmp_path):
+    dimensions = np.array([[1, 1, 1], [3, 3, 3]], dtype=float)
+    anchors = np.array([[0, -1, 0], [0, 1, 0]], dtype=float)
+    generate_cylinders_obj(
+        dimensions,
+        anchors,
+        names=["inner", "outer"],
+        base_folder=str(tmp_path),
+        inner_cylinders=False,
+    )
+    assert not (tmp_path / "inner.obj").exists()
+    assert (tmp_path / "outer.obj").exists()
+
+
+def test_compress_profile():
+    breaks, radii = compress_profile(
+        np.arange(7.0), [5, 5, 4, 1, 1, 1.2], max_steps=2
+    )
+    np.testing.assert_equal(breaks, [0, 3, 6])
+    np.testing.assert_equal(radii, [5, 1.2])
+
+    # equal radii are merged
+    breaks, radii = compress_profile(
+        np.arange(7.0), [5, 5, 4, 1, 1, 1.2], max_steps=10
+    )
+    np.testing.assert_equal(breaks, [0, 2, 3, 5, 6])
+    np.testing.assert_equal(radii, [5, 4, 1, 1.2])
+
+
+def test_stepped_cylinder():
+    mesh = stepped_cylinder([0, 1, 2, 3], [2, 1, 0.5], 16, center=(1, 1))
+
+    # closed and oriented
+    _, counts, _, _ = edge_face_adjacency(mesh.faces)
+    assert np.all(counts == 2)
+    np.testing.assert_allclose(mesh.bounds, [[-1, 0, -1], [3, 3, 3]])
+
+    grid = TriangleGrid(mesh.vertices, mesh.faces)
+    inside = grid.contains(
+        [[1, 0.5, 1], [2.5, 0.5, 1], [2.5, 1.5, 1], [1.4, 2.5, 1.1]]
+    )
+    assert inside.tolist() == [True, True, False, True]
+
+
+def test_taper_polyline():
+    ys, radii = taper_polyline([0, 1, 1, 3], [2, 2, 1, 1], 0.5, 2)
+    np.testing.assert_allclose(ys, [0, 1, 1, 2, 3])
+    np.testing.assert_allclose(radii, [1, 1.5, 0.75, 1, 1])
+
+    np.testing.assert_allclose(
+        profile_radii(ys, radii, [0.5, 1, 2.5]), [1.25, 0.75, 1]
+    )
+    np.testing.assert_allclose(
+        profile_radii(ys, radii, [1], side="left"), [1.5]
+    )
+
+
+def test_revolved_cylinder_frustum():
+    mesh = revolved_cylinder([0, 4], [1, 2], 32)
+
+    _, counts, _, _ = edge_face_adjacency(mesh.faces)
+    assert np.all(counts == 2)
+    np.testing.assert_allclose(mesh.bounds, [[-2, 0, -2], [2, 4, 2]])
+
+    grid = TriangleGrid(mesh.vertices, mesh.faces)
+    assert grid.contains([[0, 0.5, 1.2], [0, 3.5, 1.2]]).tolist() == [
+        False,
+        True,
+    ]
+
+
+def test_cylinder_meshes_outer_frustum():
+    dimensions = np.array([[1, 1, 1], [4, 4, 4]])
+    anchors = np.array([[0, 0, 0], [0, 2, 0]])
+    profiles = [None, (np.array([-2, 2]), np.array([1, 2]))]
+    meshes = dict(
+        cylinder_meshes(dimensions, anchors, ["inner", "outer"], profiles=profiles)
+    )
+
+    outer = meshes["outer"]
+    assert outer.region_names == ["outerInlet", "outerOutlet", "outerWall"]
+    regions = outer.face_regions()
+    centroids = outer.vertices[outer.faces].mean(axis=1)
+    # the inlet is the top cap, the outlet the (narrow) bottom cap
+    np.testing.assert_allclose(centroids[regions == 0, 1], 2, atol=1e-6)
+    np.testing.assert_allclose(centroids[regions == 1, 1], -2, atol=1e-6)
+    assert np.all(np.abs(centroids[regions == 2, 1]) < 2)
@@ -0,0 +1,123 @@
+"""Golden digests of the files rendered for a matrix of configurations.
+
+Any change to the rendering (e.g. a faster implementation) must produce
+exactly the same bytes. If the output changes on purpose, regenerate the
+digests with
+
+    UPDATE_GOLDEN=1 python -m pytest tests/test_golden.py
+"""
+
+import hashlib
+import itertools
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.case import render_case
+from tests.conftest import case_params, write_case, write_propeller
+
+golden_path = Path(__file__).resolve().parent / "golden_digests.json"
+
+cylinder_variants = {
+    "default": {},
+    "segments": dict(base_cell_size=0.5),
+    "analytic": dict(analytic_cylinders=True),
+    "stepped": dict(cylinder_profile_margins=[0.05, 0.3, 0.6]),
+    "cones": dict(cylinder_taper=[0.5, 0.6, 0.7, 0.8]),
+    "three": dict(
+        N_of_cylinders=3,
+        cylinder_scales=[[1.5, np.nan, 1.5], [2.5, np.nan, 2.5], [4, 8, 4]],
+        take_available_y=[0.2, 0.6],
+        base_cell_size_diameters=0.2,
+    ),
+}
+propeller_variants = {
+    "plain": {},
+    "lods": dict(
+        propeller_lod_errors=[0.05, 0.2],
+        propeller_lod_refinement=[[0.1, 3], [0.5, 2]],
+        propeller_features_lod=1,
+    ),
+    "weld": dict(propeller_weld_tolerance=1e-6, feature_included_angle=120),
+}
+location_variants = {
+    "fixed": {},
+    "corrected": dict(correct_location_in_mesh=True),
+}
+
+
+def configurations():
+    for (c, cylinders), (p, propeller), (l, location) in itertools.product(
+        cylinder_variants.items(),
+        propeller_variants.items(),
+        location_variants.items(),
+    ):
+        params = dict(case_params)
+        params.update(cylinders)
+        params.update(propeller)
+        params.update(location)
+        yield "{}-{}-{}".format(c, p, l), params, 1
+
+    params = dict(case_params)
+    params.update(cylinder_variants["three"])
+    yield "three-plain-fixed-two", params, 2
+
+
+@pytest.fixture(scope="module")
+def case(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("golden")
+    first = write_propeller(folder / "first.obj")
+    # a second propeller, translated along X
+    second = folder / "second.obj"
+    lines = []
+    for line in first.read_text().splitlines():
+        if line.startswith("v "):
+            x, y, z = map(float, line.split()[1:])
+            line = "v {} {} {}".format(x + 4, y, z)
+        lines.append(line)
+    second.write_text("\n".join(lines) + "\n")
+    return write_case(folder / "case"), [str(first), str(second)]
+
+
+def digests(case, n_of_propellers, params):
+    openfoam_case, propellers = case
+    _, files = render_case(
+        str(openfoam_case), propellers[:n_of_propellers], params
+    )
+    return {
+        path: hashlib.sha256(content).hexdigest() for path, content in files
+    }
+
+
+def test_golden_digests(case):
+    rendered = {
+        name: digests(case, n_of_propellers, params)
+        for name, params, n_of_propellers in configurations()
+    }
+
+    if os.environ.get("UPDATE_GOLDEN"):
+        golden_path.write_text(
+            json.dumps(rendered, indent=1, sort_keys=True) + "\n"
+        )
+    golden = json.loads(golden_path.read_text())
+
+    assert sorted(rendered) == sorted(golden)
+    changed = [
+        "{}: {}".format(name, path)
+        for name in sorted(golden)
+        for path in sorted(set(golden[name]) | set(rendered[name]))
+        if golden[name].get(path) != rendered[name].get(path)
+    ]
+    assert not changed, "The output changed:\n" + "\n".join(changed)
+
+
+def test_rendering_is_repeatable(case):
+    # the caches shared by the cases are not modified
+    name, params, n_of_propellers = next(configurations())
+    first = digests(case, n_of_propellers, params)
+    for _, other, n in itertools.islice(configurations(), 1, None, 5):
+        digests(case, n, other)
+    assert digests(case, n_of_propellers, params) == first
@@ -0,0 +1,72 @@
+import time
+
+from src.job_queue import JobQueue, run_worker
+
+
+def test_claim_is_exclusive(tmp_path, propeller_path):
+    with JobQueue(tmp_path / "jobs.db") as queue:
+        first = queue.add(tmp_path / "case0", propeller_path)
+        second = queue.add(tmp_path / "case1", propeller_path, {"a": 1})
+        # the same case is not added twice
+        assert queue.add(tmp_path / "case0", propeller_path) == first
+
+        with JobQueue(tmp_path / "jobs.db") as other:
+            job = queue.claim("worker0")
+            other_job = other.claim("worker1")
+            assert other.claim("worker1") is None
+
+        assert job["id"] == first
+        assert other_job["id"] == second
+        assert other_job["params"] == {"a": 1}
+        assert queue.counts()["running"] == 2
+
+        # only the owner can complete the job
+        assert not queue.complete(first, "worker1", 1.0, {})
+        assert queue.complete(first, "worker0", 1.0, {"a": "b"})
+        assert queue.job(first)["output_hashes"] == {"a": "b"}
+
+
+def test_expired_lease(tmp_path, propeller_path):
+    with JobQueue(tmp_path / "jobs.db", lease_seconds=0.05) as queue:
+        job_id = queue.add(tmp_path / "case", propeller_path)
+        assert queue.claim("crashed")["id"] == job_id
+        assert queue.claim("worker") is None
+
+        time.sleep(0.1)
+        job = queue.claim("worker")
+        assert job["id"] == job_id
+        assert job["attempts"] == 2
+        # the crashed worker lost the job
+        assert not queue.fail(job_id, "crashed", 1.0, "late")
+
+
+def test_run_worker(tmp_path, openfoam_case, propeller_path, params):
+    database = tmp_path / "jobs.db"
+    with JobQueue(database) as queue:
+        good = queue.add(openfoam_case, propeller_path)
+        bad = queue.add(
+            tmp_path / "missing", propeller_path, {"N_of_cylinders": 2}
+        )
+
+    messages = []
+    assert run_worker(database, params, log=messages.append) == 2
+    assert len(messages) == 2
+
+    with JobQueue(database) as queue:
+        assert queue.counts() == dict(pending=0, running=0, done=1, failed=1)
+
+        job = queue.job(good)
+        assert job["status"] == "done"
+        assert job["elapsed"] > 0
+        assert "constant/triSurface/outerCylinder.obj" in job["output_hashes"]
+        assert "system/snappyHexMeshDict" in job["output_hashes"]
+
+        assert queue.job(bad)["error"].startswith("ValueError")
+        assert queue.retry_failed() == 1
+        assert queue.counts()["pending"] == 1
+
+    # the completed job is not executed again
+    assert run_worker(database, params, log=messages.append) == 1
+    with JobQueue(database) as queue:
+        assert queue.job(bad)["attempts"] == 2
+        assert queue.job(good)["attempts"] == 1
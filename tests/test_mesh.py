@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from smithers.io.obj import ObjHandler
+
+from src.mesh import TriMesh, format_floats, obj_bytes
+
+
+def test_read_obj(propeller_path):
+    mesh = TriMesh.read(str(propeller_path))
+    obj = ObjHandler.read(str(propeller_path))
+
+    assert mesh.vertices.dtype == np.float32
+    assert mesh.faces.dtype == np.int32
+    assert mesh.vertices.flags.c_contiguous
+    np.testing.assert_allclose(mesh.vertices, obj.vertices, rtol=1e-6)
+    np.testing.assert_equal(mesh.faces, np.asarray(obj.polygons) - 1)
+
+    assert mesh.region_names == ["propellerTip", "propellerStem"]
+    np.testing.assert_equal(mesh.region_offsets, [0, 12])
+    np.testing.assert_equal(mesh.face_regions(), [0] * 12 + [1] * 12)
+
+    # computed in double precision
+    np.testing.assert_equal(mesh.bounds, [[-0.5, 0, -0.5], [0.5, 0.6, 0.5]])
+
+
+def test_read_obj_polygons(tmp_path):
+    path = tmp_path / "quads.obj"
+    path.write_text(
+        "v 0 0 0\nv 1 0 0\nv 1 1 0\nv 0 1 0\nv 0 0 1\n"
+        "g first\nf 1 2 3 4\n"
+        "g second\nf 1 2 5\nf 4/4 3/3 2/2 1/1 5/5\n"
+    )
+    mesh = TriMesh.read(str(path))
+
+    np.testing.assert_equal(
+        mesh.faces,
+        [[0, 1, 2], [0, 2, 3], [0, 1, 4], [3, 2, 1], [3, 1, 0], [3, 0, 4]],
+    )
+    assert mesh.region_names == ["first", "second"]
+    np.testing.assert_equal(mesh.region_offsets, [0, 2])
+
+    path.write_text("v 0 0 0\nv 1 0 0\nf 1 2 3\nf 1 2\n")
+    with pytest.raises(ValueError, match="The face 2"):
+        TriMesh.read(str(path))
+
+
+def test_to_obj(tmp_path, propeller_path):
+    mesh = TriMesh.read(str(propeller_path), dtype=np.float64)
+    ObjHandler.write(mesh.to_obj(), str(tmp_path / "copy.obj"))
+
+    copy = TriMesh.read(str(tmp_path / "copy.obj"), dtype=np.float64)
+    np.testing.assert_equal(copy.vertices, mesh.vertices)
+    np.testing.assert_equal(copy.faces, mesh.faces)
+    assert copy.region_names == mesh.region_names
+
+
+def test_transformed():
+    mesh = TriMesh([[0, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 1, 2]])
+    moved = mesh.transformed(scale=[2, 3, 4], translation=[1, 1, 1])
+
+    np.testing.assert_allclose(moved.vertices, [[1, 1, 1], [3, 1, 1], [1, 4, 1]])
+    np.testing.assert_allclose(moved.bounds, [[1, 1, 1], [3, 4, 1]])
+    assert moved.faces is mesh.faces
+    assert moved.vertices.dtype == np.float32
+    assert mesh.promote().vertices.dtype == np.float64
+
+
+def test_compact():
+    vertices = np.random.default_rng(0).random((1000, 3))
+    faces = np.arange(3000).reshape(-1, 3) % 1000
+    mesh = TriMesh(vertices, faces)
+
+    assert mesh.vertices.nbytes + mesh.faces.nbytes == (
+        vertices.nbytes + faces.astype(np.int64).nbytes
+    ) / 2
+    with pytest.raises(AttributeError):
+        mesh.normals = None
+
+
+def test_wrong_regions():
+    with pytest.raises(ValueError):
+        TriMesh(np.zeros((3, 3)), [[0, 1, 2]], ["a", "b"], [0])
+
+
+def test_unsupported_extension():
+    with pytest.raises(ValueError):
+        TriMesh.read("propeller.ply")
+
+
+def test_obj_bytes(tmp_path, propeller_path):
+    obj = ObjHandler.read(str(propeller_path))
+    obj.vertices = obj.vertices * 1.1
+    ObjHandler.write(obj, str(tmp_path / "copy.obj"))
+
+    assert obj_bytes(obj) == (tmp_path / "copy.obj").read_bytes()
+    assert obj_bytes(TriMesh.from_obj(obj, dtype=np.float64)) == obj_bytes(obj)
+
+
+def test_format_floats():
+    assert format_floats([0.1, 2, np.float64(1e-20)]) == "0.1 2.0 1e-20"
+    # float32 values are formatted as the double they represent
+    assert format_floats(np.float32([0.5, 0.1])) == "0.5 0.10000000149011612"
+    assert format_floats(np.zeros((1, 2)), ",") == "0.0,0.0"
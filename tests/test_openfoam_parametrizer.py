@@ -1,18 +1,18 @@
-from src.openfoam_parametrizer import dictionary
+from concurrent.futures import ThreadPoolExecutor
 
-dictionary['cylinder_names'] = ['cylinder0', 'outerCylinder']
-dictionary['cylinders_intersecting_propeller'] = ['cylinder0']
+from src.openfoam_parametrizer import (
+    CaseRenderer,
+    definitions,
+    generate_openfoam_configuration_dicts,
+)
 
 
 def test_searchable_surface_list():
-    dictionary["cylinder_names"] = [
-        "cylinder0",
-        "cylinder1",
-        "cylinder2",
-        "outerCylinder",
-    ]
-
-    assert dictionary['searchable_surface_list'] == """    cylinder0
+    renderer = CaseRenderer(
+        cylinder_names=["cylinder0", "cylinder1", "cylinder2", "outerCylinder"]
+    )
+
+    assert renderer.context["geometry_member"] == """    cylinder0
     {
         type        triSurfaceMesh;
         file        "cylinder0.obj";
@@ -48,3 +48,39 @@ def test_searchable_surface_list():
             }
         }
     }"""
+
+
+
+def test_renderers_are_independent():
+    first = CaseRenderer(cylinder_names=["a", "outerCylinder"])
+    second = CaseRenderer(cylinder_names=["b", "c", "outerCylinder"])
+
+    assert first.context["cylinder_names_noouter"] == ["a"]
+    assert second.context["cylinder_names_noouter"] == ["b", "c"]
+    # the shared definitions are not modified
+    assert "cylinder_names" not in definitions
+    assert CaseRenderer().context["block_mesh_cells"] is None
+
+
+def test_concurrent_rendering(tmp_path):
+    template = "locationInMesh (0 0 0);\nnumberOfSubdomains @n;\n"
+
+    def render_case(i):
+        case = tmp_path / "case{}".format(i)
+        (case / "system").mkdir(parents=True)
+        (case / "system" / "decomposeParDict").write_text(template)
+        generate_openfoam_configuration_dicts(
+            case,
+            files=["system/decomposeParDict"],
+            location_in_mesh="{} {} {}".format(i, i, i),
+            n=i,
+        )
+        return (case / "system" / "decomposeParDict").read_text()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(render_case, range(64)))
+
+    for i, result in enumerate(results):
+        assert result == (
+            "locationInMesh ({0} {0} {0});\nnumberOfSubdomains {0};\n"
+        ).format(i)
@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import pytest
+
+from src.case import generate_case
+from src.job_queue import case_files
+from src.pipeline import (
+    Stage,
+    case_stages,
+    generate_case_pipelined,
+    run_stages,
+    stage_order,
+)
+from tests.conftest import write_case
+
+
+def test_stage_order():
+    stages = dict(
+        c=Stage(None, ("a", "b")), a=Stage(None, ()), b=Stage(None, ("a",))
+    )
+    assert stage_order(stages) == ["a", "b", "c"]
+
+    with pytest.raises(ValueError, match="Unknown"):
+        stage_order(dict(a=Stage(None, ("d",))))
+    with pytest.raises(ValueError, match="cyclic"):
+        stage_order(dict(a=Stage(None, ("b",)), b=Stage(None, ("a",))))
+
+
+def test_run_stages_overlap():
+    def slow(value):
+        def function(*args):
+            time.sleep(0.2)
+            return value + sum(args)
+
+        return function
+
+    stages = dict(
+        a=Stage(slow(1), ()),
+        b=Stage(slow(2), ()),
+        c=Stage(slow(3), ("a", "b")),
+    )
+    timings = {}
+    start = time.perf_counter()
+    results = asyncio.run(run_stages(stages, timings=timings))
+    elapsed = time.perf_counter() - start
+
+    assert results == dict(a=1, b=2, c=6)
+    # a and b are executed at the same time
+    assert elapsed < 0.55
+    assert timings["c"][0] >= max(timings["a"][1], timings["b"][1])
+
+
+def test_run_stages_failure():
+    executed = []
+
+    def fail():
+        raise RuntimeError("failed")
+
+    stages = dict(
+        a=Stage(fail, ()),
+        b=Stage(lambda a: executed.append("b"), ("a",)),
+    )
+    with pytest.raises(RuntimeError, match="failed"):
+        asyncio.run(run_stages(stages))
+    assert executed == []
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        {},
+        dict(propeller_lod_errors=[0.2], propeller_lod_refinement=[[0.1, 3]]),
+        dict(propeller_weld_tolerance=1e-6, base_cell_size=0.5),
+    ],
+)
+def test_generate_case_pipelined(tmp_path, propeller_path, params, extra):
+    params.update(extra)
+    sequential = write_case(tmp_path / "sequential")
+    pipelined = write_case(tmp_path / "pipelined")
+
+    generate_case(str(sequential), str(propeller_path), params)
+    written = []
+    geometry = generate_case_pipelined(
+        str(pipelined), str(propeller_path), params, written=written
+    )
+    assert sorted(written) == sorted(case_files(str(pipelined)))
+
+    assert geometry["cylinder_names"][-1] == "outerCylinder"
+    files = sorted(
+        path.relative_to(sequential)
+        for path in sequential.rglob("*")
+        if path.is_file()
+    )
+    assert files == sorted(
+        path.relative_to(pipelined)
+        for path in pipelined.rglob("*")
+        if path.is_file()
+    )
+    for path in files:
+        assert (sequential / path).read_bytes() == (
+            pipelined / path
+        ).read_bytes()
+
+
+def test_case_stages_templates(tmp_path, propeller_path, params):
+    case = write_case(tmp_path / "case")
+    stages = case_stages(str(case), str(propeller_path), params)
+    # the dictionaries are rendered from the texts of the templates stage,
+    # the files are not read again
+    stages["templates"] = Stage(
+        lambda: {"system/decomposeParDict": "numberOfSubdomains 3;\n"}, ()
+    )
+    (case / "system" / "decomposeParDict").unlink()
+    results = asyncio.run(run_stages(stages))
+
+    assert "system/decomposeParDict" in results["dictionaries"]
+    assert (case / "system" / "decomposeParDict").read_text() == (
+        "numberOfSubdomains 3;\n"
+    )
@@ -0,0 +1,106 @@
+import numpy as np
+
+from src.mesh import TriMesh, obj_bytes
+from src.read_spatial_info import DataWrapper, radial_profile, surface_quality
+from tests.conftest import box_triangles
+
+
+def write_surface(path, vertices, faces):
+    path.write_bytes(obj_bytes(TriMesh(vertices, faces, ["body"])))
+    return DataWrapper(str(path))
+
+
+def test_surface_quality_watertight(propeller_path):
+    quality = surface_quality(DataWrapper(str(propeller_path)))
+
+    assert quality["watertight"]
+    assert quality["open_edges"] == 0
+    assert quality["degenerate_faces"] == 0
+    np.testing.assert_allclose(quality["min_edge_length"], 0.1, rtol=1e-6)
+    assert quality["max_aspect_ratio"] >= quality["median_aspect_ratio"] >= 1
+    assert quality["suggested_max_surf_ref"] is None
+
+
+def test_surface_quality_open_edges(tmp_path):
+    vertices, faces = box_triangles([0, 0, 0], [1, 1, 1])
+    quality = surface_quality(
+        write_surface(tmp_path / "open.obj", vertices, faces[1:])
+    )
+
+    assert not quality["watertight"]
+    assert quality["open_edges"] == 3
+    assert quality["inconsistent_edges"] == 0
+
+
+def test_surface_quality_orientation(tmp_path):
+    vertices, faces = box_triangles([0, 0, 0], [1, 1, 1])
+    faces[0] = faces[0, ::-1]
+    quality = surface_quality(
+        write_surface(tmp_path / "flipped.obj", vertices, faces)
+    )
+
+    assert quality["open_edges"] == 0
+    assert quality["inconsistent_edges"] == 3
+
+
+def test_surface_quality_non_manifold(tmp_path):
+    vertices, faces = box_triangles([0, 0, 0], [1, 1, 1])
+    # a fin attached to the edge 0-1 of the box
+    vertices = np.concatenate([vertices, [[0.5, -1, -1]]])
+    faces = np.concatenate([faces, [[0, 1, 8]]])
+    quality = surface_quality(
+        write_surface(tmp_path / "fin.obj", vertices, faces)
+    )
+
+    assert quality["non_manifold_edges"] == 1
+    assert quality["open_edges"] == 2
+
+
+def tube(radius, n=64):
+    """An open tube of the given radius around the Y axis."""
+    phi = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    ring = np.stack([radius * np.cos(phi), np.zeros(n), radius * np.sin(phi)])
+    vertices = np.concatenate([ring.T, ring.T + [0, 1, 0]])
+    a = np.arange(n)
+    b = (a + 1) % n
+    faces = np.concatenate(
+        [np.stack([a, b, b + n], axis=1), np.stack([a, b + n, a + n], axis=1)]
+    )
+    return vertices, faces
+
+
+def test_surface_quality_suggested_levels(tmp_path):
+    wide = surface_quality(write_surface(tmp_path / "wide.obj", *tube(1)), 1)
+    narrow = surface_quality(
+        write_surface(tmp_path / "narrow.obj", *tube(0.25)), 1
+    )
+
+    assert 0 <= wide["suggested_min_surf_ref"] <= wide["suggested_max_surf_ref"]
+    # a surface four times more curved needs cells four times smaller
+    assert (
+        narrow["suggested_max_surf_ref"] == wide["suggested_max_surf_ref"] + 2
+    )
+
+    # cells smaller than the shortest edge do not resolve anything else: a
+    # hexagonal tube has edges of length 1, shorter than 30 degrees of arc
+    coarse = surface_quality(
+        write_surface(tmp_path / "coarse.obj", *tube(1, n=6)), 48
+    )
+    assert coarse["suggested_max_surf_ref"] == 6
+
+
+def test_radial_profile(propeller_path):
+    edges, radii = radial_profile(DataWrapper(str(propeller_path)), 12)
+
+    np.testing.assert_allclose(edges, np.linspace(0, 0.6, 13), atol=1e-7)
+    # the blade, then the stem (the top of the blade lies on the border of
+    # the bins)
+    np.testing.assert_allclose(radii[:2], np.sqrt(0.5), rtol=1e-6)
+    np.testing.assert_allclose(radii[3:], np.sqrt(0.005), rtol=1e-6)
+
+
+def test_radial_profile_long_triangles(tmp_path):
+    # the triangles of the tube span all the bins
+    data = write_surface(tmp_path / "tube.obj", *tube(1, n=8))
+    _, radii = radial_profile(data, 10)
+    np.testing.assert_allclose(radii, 1, rtol=1e-6)
@@ -0,0 +1,47 @@
+import threading
+
+import numpy as np
+
+import pytest
+
+from src.server import CaseServer, submit
+
+
+@pytest.fixture
+def server(tmp_path, params):
+    address = str(tmp_path / "server.sock")
+    server = CaseServer(address, params, workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_submit(server, openfoam_case, propeller_path):
+    response = submit(
+        server.server_address,
+        openfoam_case,
+        propeller_path,
+        params={
+            "N_of_cylinders": 3,
+            "cylinder_scales": [[1.1, np.nan, 1.1], [2, np.nan, 2], [5, 9, 5]],
+            "take_available_y": [0.1, 0.5],
+        },
+    )
+
+    assert response["status"] == "ok"
+    tri_surface = openfoam_case / "constant" / "triSurface"
+    assert (tri_surface / "cylinder1.obj").exists()
+    assert not (tri_surface / "cylinder2.obj").exists()
+
+
+def test_submit_error(server, openfoam_case, propeller_path):
+    with pytest.raises(RuntimeError, match="Unexpected number of cylinders"):
+        submit(
+            server.server_address,
+            openfoam_case,
+            propeller_path,
+            params={"N_of_cylinders": 2},
+        )
@@ -0,0 +1,145 @@
+import numpy as np
+from smithers.io.obj import ObjHandler
+
+from src.simplify import (
+    close_pairs,
+    cluster_vertices,
+    face_regions,
+    regions_change_indexes,
+    remap_faces,
+    simplify,
+    simplify_obj,
+    weld_obj,
+    weld_vertices,
+)
+from tests.conftest import box_triangles
+
+
+def grid_surface(n):
+    """A flat n x n grid of vertices on the XZ plane, triangulated."""
+    x, z = np.meshgrid(np.linspace(0, 1, n), np.linspace(0, 1, n))
+    vertices = np.stack([x.ravel(), np.zeros(n * n), z.ravel()], axis=1)
+    idx = np.arange(n * n).reshape(n, n)
+    a, b = idx[:-1, :-1].ravel(), idx[:-1, 1:].ravel()
+    c, d = idx[1:, :-1].ravel(), idx[1:, 1:].ravel()
+    faces = np.concatenate(
+        [np.stack([a, b, d], axis=1), np.stack([a, d, c], axis=1)]
+    )
+    return vertices, faces
+
+
+def test_cluster_vertices():
+    vertices = np.array([[0, 0, 0], [0.1, 0, 0], [1, 1, 1], [1.1, 1, 1]])
+    representatives, inverse = cluster_vertices(vertices, 0.5)
+
+    assert len(representatives) == 2
+    np.testing.assert_allclose(representatives[inverse[0]], [0.05, 0, 0])
+    assert inverse[2] == inverse[3]
+
+
+def test_remap_faces_drops_degenerate_and_duplicates():
+    faces = np.array([[0, 1, 2], [2, 1, 0], [0, 0, 1], [1, 2, 3]])
+    new_faces, kept = remap_faces(faces, np.arange(4))
+
+    np.testing.assert_equal(kept, [0, 3])
+    np.testing.assert_equal(new_faces, [[0, 1, 2], [1, 2, 3]])
+
+
+def test_simplify_error_bound():
+    vertices, faces = grid_surface(101)
+    new_vertices, new_faces, kept, error = simplify(vertices, faces, 0.05)
+
+    assert error <= 0.05
+    assert len(new_faces) < len(faces) / 10
+    assert new_faces.max() == len(new_vertices) - 1
+    assert len(kept) == len(new_faces)
+
+
+def test_simplify_thin_feature():
+    # a needle thinner than the error: the clusters of size max_error would
+    # collapse it, although no vertex would move more than max_error
+    vertices, faces = box_triangles([0, 0, 0], [0.02, 1, 0.02])
+    new_vertices, new_faces, _, error = simplify(vertices, faces, 0.05)
+
+    assert len(new_faces) > 0
+    assert error < 0.05
+    np.testing.assert_allclose(new_vertices[:, 1].max(), 1, atol=0.05)
+
+
+def test_regions_change_indexes():
+    regions = np.array([0, 0, 1, 1, 1, 0])
+    assert regions_change_indexes(regions) == [(0, 0), (2, 1), (5, 0)]
+
+
+def test_simplify_obj_keeps_regions(propeller_path):
+    obj = ObjHandler.read(str(propeller_path))
+    simplified, report = simplify_obj(obj, 1e-6)
+
+    assert simplified.regions == ["propellerTip", "propellerStem"]
+    np.testing.assert_equal(face_regions(simplified), face_regions(obj))
+    assert report["faces"] == (24, 24)
+    assert report["error"] < 1e-12
+
+
+def test_weld_vertices():
+    vertices = np.array(
+        [[0, 0, 0], [1, 0, 0], [1e-9, 0, 0], [1, 1, 0], [1, 1e-9, 0]]
+    )
+    kept, inverse = weld_vertices(vertices, 1e-6)
+
+    np.testing.assert_equal(kept, [0, 1, 3])
+    np.testing.assert_equal(inverse, [0, 1, 0, 2, 1])
+
+
+def test_weld_vertices_cell_boundary():
+    # pairs of vertices 1e-12 apart, across the boundaries between the cells
+    # of a grid of size 1e-6 (or of a shifted one)
+    vertices = np.array(
+        [
+            [5e-6 - 1e-12, 0, 0],
+            [5.5e-6 - 1e-12, 1, 0],
+            [5e-6, 0, 0],
+            [5.5e-6, 1, 0],
+        ]
+    )
+    kept, inverse = weld_vertices(vertices, 1e-6)
+
+    np.testing.assert_equal(kept, [0, 1])
+    np.testing.assert_equal(inverse, [0, 1, 0, 1])
+
+
+def test_close_pairs():
+    rng = np.random.default_rng(0)
+    vertices = rng.random((200, 3)) - 0.5
+    pairs = close_pairs(vertices, 0.2)
+
+    expected = [
+        (i, j)
+        for i in range(len(vertices))
+        for j in range(i + 1, len(vertices))
+        if np.all(np.abs(vertices[i] - vertices[j]) < 0.2)
+    ]
+    assert sorted(map(tuple, pairs.tolist())) == expected
+
+
+def test_weld_obj(propeller_path):
+    obj = ObjHandler.read(str(propeller_path))
+    n_vertices = len(obj.vertices)
+
+    # duplicate the vertices of the first triangle (a seam), and append a
+    # degenerate triangle and a copy of the last triangle
+    polygons = np.asarray(obj.polygons)
+    obj.vertices = np.concatenate(
+        [obj.vertices, np.asarray(obj.vertices)[polygons[0] - 1] + 1e-9]
+    )
+    polygons[0] = np.arange(n_vertices + 1, n_vertices + 4)
+    obj.polygons = np.concatenate(
+        [polygons, [[1, 1, 2], polygons[-1]]]
+    )
+    welded, report = weld_obj(obj, 1e-6)
+
+    assert report["vertices"] == (n_vertices + 3, n_vertices)
+    assert report["faces"] == (26, 24)
+    assert welded.regions == ["propellerTip", "propellerStem"]
+    assert face_regions(welded).tolist() == [0] * 12 + [1] * 12
+    assert np.asarray(welded.polygons).max() == n_vertices
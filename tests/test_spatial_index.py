@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from src.spatial_index import AABBIndex, TriangleGrid, point_triangle_distances
+from tests.conftest import box_triangles
+
+
+def brute_force_pairs(lower, upper):
+    pairs = []
+    for i in range(len(lower)):
+        for j in range(i + 1, len(lower)):
+            if np.all(lower[i] <= upper[j]) and np.all(lower[j] <= upper[i]):
+                pairs.append((i, j))
+    return pairs
+
+
+def test_overlapping_pairs():
+    rng = np.random.default_rng(42)
+    lower = rng.uniform(0, 10, (200, 3))
+    upper = lower + rng.uniform(0, 1, (200, 3))
+
+    index = AABBIndex(lower, upper)
+    assert len(index) == 200
+    assert index.overlapping_pairs() == brute_force_pairs(lower, upper)
+
+
+def test_query():
+    lower = np.array([[0, 0, 0], [2, 0, 0], [5, 5, 5]])
+    upper = np.array([[1, 1, 1], [3, 1, 1], [6, 6, 6]])
+    index = AABBIndex(lower, upper)
+
+    np.testing.assert_equal(index.query([0.5, 0.5, 0.5], [2.5, 0.5, 0.5]), [0, 1])
+    np.testing.assert_equal(index.query([1, 1, 1], [1, 1, 1]), [0])
+    assert len(index.query([10, 10, 10], [11, 11, 11])) == 0
+
+
+def test_wrong_shape():
+    with pytest.raises(ValueError):
+        AABBIndex([[0, 0, 0]], [[1, 1]])
+
+
+def test_point_triangle_distances():
+    a = np.zeros((4, 3))
+    b = np.tile([1.0, 0, 0], (4, 1))
+    c = np.tile([0, 0, 1.0], (4, 1))
+    points = np.array(
+        [[0.2, 1, 0.2], [-1, 0, -1], [2, 0, 0], [1, 0, 1]]
+    )
+    np.testing.assert_allclose(
+        point_triangle_distances(points, a, b, c),
+        [1, np.sqrt(2), 1, np.sqrt(2) / 2],
+    )
+
+
+def test_triangle_grid_contains():
+    vertices, faces = box_triangles([0, 0, 0], [1, 2, 1])
+    grid = TriangleGrid(vertices, faces)
+    assert len(grid) == 12
+
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-0.5, 2.5, (1000, 3))
+    inside = np.all((points > 0) & (points < [1, 2, 1]), axis=1)
+    np.testing.assert_equal(grid.contains(points), inside)
+    # the rays through the edges and the vertices of the box
+    assert grid.contains([[0.5, 1, 0.5], [0, -1, 0], [1, 0.5, 1]]).tolist() == [
+        True,
+        False,
+        False,
+    ]
+
+
+def test_triangle_grid_distance():
+    # a soup of small triangles
+    rng = np.random.default_rng(1)
+    vertices = np.repeat(rng.uniform(0, 1, (2000, 3)), 3, axis=0)
+    vertices += rng.normal(0, 0.02, vertices.shape)
+    faces = np.arange(len(vertices)).reshape(-1, 3)
+    grid = TriangleGrid(vertices, faces)
+
+    # inside and around the surface, and far from it
+    points = np.concatenate(
+        [rng.uniform(-1, 2, (50, 3)), rng.normal(0, 100, (10, 3))]
+    )
+    a, b, c = (vertices[faces[:, i]] for i in range(3))
+    expected = np.array(
+        [
+            point_triangle_distances(
+                np.tile(point, (len(a), 1)), a, b, c
+            ).min()
+            for point in points
+        ]
+    )
+    np.testing.assert_allclose(grid.distance(points), expected)
+
+    # only the points closer than max_distance
+    distances = grid.distance(points, max_distance=0.05)
+    close = expected < 0.05
+    assert 0 < close.sum() < len(points)
+    np.testing.assert_allclose(distances[close], expected[close])
+    assert np.all(np.isinf(distances[~close]))
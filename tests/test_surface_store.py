@@ -0,0 +1,83 @@
+import os
+
+import pytest
+from smithers.io.obj import ObjHandler
+
+from src.case import generate_case
+from src.job_queue import case_files
+from src.surface_store import SurfaceStore, generate_case_with_store
+from tests.conftest import write_case
+
+
+def test_surface_store_put(tmp_path):
+    store = SurfaceStore(str(tmp_path / "store"))
+    path = store.put(b"abc", ".obj")
+    assert store.put(b"abc", ".obj") == path
+    assert path.read_bytes() == b"abc"
+    assert path.suffix == ".obj"
+    assert store.put(b"abd", ".obj") != path
+
+
+@pytest.mark.parametrize("link", ["symlink", "hardlink"])
+def test_generate_case_with_store(tmp_path, propeller_path, params, link):
+    store = SurfaceStore(str(tmp_path / "store"), link=link)
+    first = write_case(tmp_path / "first")
+    second = write_case(tmp_path / "second")
+
+    _, generated = generate_case_with_store(
+        str(first), str(propeller_path), params, store
+    )
+    assert generated[-1] == "outerCylinder"
+
+    # the cylinders of the second case are found in the store
+    stale = second / "constant" / "triSurface" / "stale.eMesh"
+    stale.write_text("")
+    written = []
+    _, generated = generate_case_with_store(
+        str(second), str(propeller_path), params, store, written=written
+    )
+    assert generated == []
+    assert "constant/triSurface/cylinder0.obj" in written
+    assert sorted(written) == sorted(
+        set(case_files(str(second))) - {"constant/triSurface/stale.eMesh"}
+    )
+    stale.unlink()
+
+    # a different outer cylinder, the same inner cylinders
+    params.update(cylinder_scales=params["cylinder_scales"][:3] + [[6, 9, 6]])
+    third = write_case(tmp_path / "third")
+    _, generated = generate_case_with_store(
+        str(third), str(propeller_path), params, store
+    )
+    assert generated == ["outerCylinder"]
+
+    tri_surface = second / "constant" / "triSurface"
+    names = sorted(os.listdir(str(tri_surface)))
+    assert "cylinder0.obj" in names and "propeller.eMesh" in names
+    for name in names:
+        path = tri_surface / name
+        if link == "symlink":
+            assert path.is_symlink()
+        else:
+            assert path.stat().st_nlink >= 2
+        assert os.path.samefile(
+            str(path), str(first / "constant" / "triSurface" / name)
+        )
+    assert ObjHandler.read(str(tri_surface / "outerCylinder.obj")).regions[
+        -1
+    ] == "outerCylinderWall"
+
+    # the same content as generate_case, which does not modify the store
+    params.update(cylinder_scales=params["cylinder_scales"][:3] + [[5, 9, 5]])
+    before = {
+        path: path.read_bytes() for path in (tmp_path / "store").rglob("*.obj")
+    }
+    linked = {name: (tri_surface / name).read_bytes() for name in names}
+    generate_case(str(second), str(propeller_path), params)
+    assert {
+        name: (tri_surface / name).read_bytes() for name in names
+    } == linked
+    assert not (tri_surface / "cylinder0.obj").is_symlink()
+    assert {
+        path: path.read_bytes() for path in (tmp_path / "store").rglob("*.obj")
+    } == before
@@ -0,0 +1,143 @@
+import numpy as np
+import pytest
+
+from src.validate import validate_case
+
+
+@pytest.fixture
+def params(params):
+    # the corners of the square blade of the test propeller stick out of a
+    # cylinder 1.1 diameters wide
+    params["cylinder_scales"][0] = [1.5, np.nan, 1.5]
+    return params
+
+
+def snapshot(folder):
+    return {
+        path: path.read_bytes() for path in folder.rglob("*") if path.is_file()
+    }
+
+
+def test_validate_case(openfoam_case, propeller_path, params):
+    before = snapshot(openfoam_case)
+    report = validate_case(str(openfoam_case), str(propeller_path), params)
+
+    assert report["valid"], report["errors"]
+    assert report["errors"] == []
+    assert report["cylinder_names"][-1] == "outerCylinder"
+    assert report["surface_quality"][0]["watertight"]
+    # nothing was written
+    assert snapshot(openfoam_case) == before
+
+
+def test_validate_case_geometry(openfoam_case, propeller_path, params):
+    params.update(take_available_y=[0.1])
+    report = validate_case(str(openfoam_case), str(propeller_path), params)
+
+    assert not report["valid"]
+    assert report["errors"][0]["stage"] == "geometry"
+    assert report["cylinder_names"] is None
+
+
+def test_validate_case_containment(openfoam_case, propeller_path, params):
+    # the innermost cylinder is thinner than the propeller
+    params["cylinder_scales"] = [[0.5, np.nan, 0.5]] + params[
+        "cylinder_scales"
+    ][1:]
+    report = validate_case(str(openfoam_case), str(propeller_path), params)
+
+    assert not report["valid"]
+    assert report["errors"] == [
+        dict(
+            stage="containment",
+            file=None,
+            message="cylinder0 does not contain propeller",
+        )
+    ]
+
+
+def test_validate_case_template(openfoam_case, propeller_path, params):
+    path = openfoam_case / "system" / "decomposeParDict"
+    path.write_text("numberOfSubdomains @n_of_subdomains;\n")
+
+    report = validate_case(str(openfoam_case), str(propeller_path), params)
+    assert not report["valid"]
+    assert report["errors"] == [
+        dict(
+            stage="template",
+            file="system/decomposeParDict",
+            message="no value for @n_of_subdomains",
+        )
+    ]
+    # the template was not rendered
+    assert path.read_text() == "numberOfSubdomains @n_of_subdomains;\n"
+
+
+def test_validate_case_repeatable_template(
+    openfoam_case, propeller_path, params
+):
+    # only used by the repeatable templates of snappyHexMeshDict
+    del params["refinement_regions_mode"]
+    del params["propeller_min_surf_ref"]
+
+    report = validate_case(str(openfoam_case), str(propeller_path), params)
+    assert not report["valid"]
+    assert report["errors"] == [
+        dict(
+            stage="template",
+            file="system/snappyHexMeshDict",
+            message="no value for @propeller_min_surf_ref, "
+            "@refinement_regions_mode",
+        )
+    ]
+
+
+def test_validate_case_missing_propeller(openfoam_case, tmp_path, params):
+    report = validate_case(
+        str(openfoam_case), str(tmp_path / "missing.obj"), params
+    )
+    assert not report["valid"]
+    assert report["errors"][0]["stage"] == "propeller"
+
+
+def test_validate_case_open_surface(openfoam_case, propeller_path, params):
+    # drop the last triangle of the stem
+    lines = propeller_path.read_text().splitlines()
+    propeller_path.write_text("\n".join(lines[:-1]) + "\n")
+
+    report = validate_case(str(openfoam_case), str(propeller_path), params)
+    assert not report["valid"]
+    assert report["errors"] == [
+        dict(stage="surface", file=str(propeller_path), message="3 open edges")
+    ]
+    assert not report["surface_quality"][0]["watertight"]
+
+
+def test_validate_case_clearance(openfoam_case, propeller_path, params):
+    report = validate_case(str(openfoam_case), str(propeller_path), params)
+    assert report["valid"]
+    assert report["clearances"]["cylinder0"] > 0
+
+    params.update(min_cylinder_clearance=0.1)
+    report = validate_case(str(openfoam_case), str(propeller_path), params)
+    assert not report["valid"]
+    assert [error["message"] for error in report["errors"]] == [
+        "cylinder0 clears propeller by 0.00084"
+    ]
+
+
+def test_validate_case_crossing(openfoam_case, propeller_path, params):
+    # the bounding box of the propeller fits in the cylinder, but the
+    # corners of the blade cross its wall
+    params["cylinder_scales"][0] = [1.1, np.nan, 1.1]
+    report = validate_case(str(openfoam_case), str(propeller_path), params)
+
+    assert not report["valid"]
+    assert report["clearances"]["cylinder0"] < 0
+    assert report["errors"] == [
+        dict(
+            stage="containment",
+            file=None,
+            message="cylinder0 does not contain propeller",
+        )
+    ]
@@ -0,0 +1,95 @@
+from src.watch import CaseWatcher
+
+params_script = """import numpy as np
+
+refinement_values = {refinement_values}
+N_of_cylinders = 4
+cylinder_scales = [
+    [{inner_scale}, np.nan, {inner_scale}],
+    [2, np.nan, 2],
+    [3, np.nan, 3],
+    [{outer_scale}, 9, {outer_scale}],
+]
+take_available_y = [0.0001, 0.8, 0.9]
+outer_cylinder_min_surf_ref = 3
+outer_cylinder_max_surf_ref = 4
+propeller_min_surf_ref = 9
+propeller_max_surf_ref = 10
+refinement_regions_mode = 'inside'
+refinement_regions_distance = '1.0'
+"""
+
+
+def write_params(
+    path, refinement_values=[4, 3, 2, 1], inner_scale=1.1, outer_scale=5
+):
+    path.write_text(
+        params_script.format(
+            refinement_values=refinement_values,
+            inner_scale=inner_scale,
+            outer_scale=outer_scale,
+        )
+    )
+
+
+def make_watcher(tmp_path, openfoam_case, propeller_path):
+    params_path = tmp_path / "params.py"
+    write_params(params_path)
+    watcher = CaseWatcher(openfoam_case, propeller_path, params_path)
+    watcher.regenerate(set(watcher.watched_files()))
+    return watcher, params_path
+
+
+def test_first_run_generates_everything(tmp_path, openfoam_case, propeller_path):
+    watcher = CaseWatcher(
+        openfoam_case, propeller_path, tmp_path / "params.py"
+    )
+    write_params(tmp_path / "params.py")
+    outputs = watcher.regenerate(set(watcher.watched_files()))
+
+    assert "propeller" in outputs
+    assert "cylinders" in outputs
+    assert "system/snappyHexMeshDict" in outputs
+    assert (openfoam_case / "constant/triSurface/outerCylinder.obj").exists()
+
+
+def test_refinement_values_only_affect_snappy(
+    tmp_path, openfoam_case, propeller_path
+):
+    watcher, params_path = make_watcher(tmp_path, openfoam_case, propeller_path)
+
+    write_params(params_path, refinement_values=[5, 4, 3, 2])
+    outputs = watcher.regenerate({str(params_path)})
+
+    assert outputs == ["system/snappyHexMeshDict"]
+    snappy = (openfoam_case / "system/snappyHexMeshDict").read_text()
+    assert "((1.0 5))" in snappy
+
+
+def test_cylinder_scales_affect_cylinders_and_block_mesh(
+    tmp_path, openfoam_case, propeller_path
+):
+    watcher, params_path = make_watcher(tmp_path, openfoam_case, propeller_path)
+
+    write_params(params_path, outer_scale=6)
+    outputs = watcher.regenerate({str(params_path)})
+    # the location in mesh depends only on the two innermost cylinders
+    assert set(outputs) == {"cylinders", "system/blockMeshDict"}
+
+    write_params(params_path, inner_scale=1.2, outer_scale=6)
+    outputs = watcher.regenerate({str(params_path)})
+    assert set(outputs) == {"cylinders", "system/snappyHexMeshDict"}
+
+
+def test_template_change(tmp_path, openfoam_case, propeller_path):
+    watcher, _ = make_watcher(tmp_path, openfoam_case, propeller_path)
+
+    template = openfoam_case / "system/decomposeParDict"
+    outputs = watcher.regenerate({str(template)})
+
+    assert outputs == ["system/decomposeParDict"]
+
+
+def test_nothing_changed(tmp_path, openfoam_case, propeller_path):
+    watcher, params_path = make_watcher(tmp_path, openfoam_case, propeller_path)
+    assert watcher.regenerate({str(params_path)}) == []